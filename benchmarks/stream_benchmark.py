@@ -0,0 +1,352 @@
+'''
+End-to-end Stream benchmark.
+
+Runs a Stream for every combination of input, resolution, fps and output, and records for each run:
+    read_fps/write_fps: frames read/written per second while writing.
+    dropped: frames read but never written.
+    latency: capture to write latency percentiles, in milliseconds.
+    cpu/cpu_children: cpu time per second of wall time, of the benchmark process and of encoders it waited on.
+    peak_rss_mb: peak resident memory of the benchmark process.
+Every run happens in a fresh process, so peak memory is per run.
+
+The raw_video and ffmpeg_video inputs read --video transcoded once per resolution and fps (to rgb24 raw video
+and to h264 respectively), long enough to cover the warmup and the measured window, and are read at --fps.
+A fixed length file can not cover an unthrottled run, so --fps 0 only applies to the synthetic input.
+
+Examples:
+    python benchmarks/stream_benchmark.py --res 640x480 1920x1080 --fps 30 60 --output results.json
+    python benchmarks/stream_benchmark.py --outputs raw mkv --event-driven --frame-pool 64
+    python benchmarks/stream_benchmark.py --inputs video --video tests/resources/test.mp4
+    python benchmarks/stream_benchmark.py --inputs raw_video ffmpeg_video --video tests/resources/test.mp4 --res 1920x1080
+    python benchmarks/stream_benchmark.py --baseline results.json
+
+With --baseline, results are compared against a saved run and the script exits with 1 if any
+matching case regressed by more than --tolerance, and by more than the metric's absolute floor in COMPARED
+(frames per second, frames, milliseconds, cpu seconds per second).
+'''
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# run from a checkout, without installing the package
+sys.path.insert(0, str(Path(__file__).absolute().parents[1]))
+from senseye_cameras import Stream
+
+INPUTS = ('synthetic', 'video', 'raw_video', 'ffmpeg_video')
+# inputs read from --video transcoded to the case's res and fps: path suffix
+TRANSCODED = {
+    'raw_video': '.raw',
+    'ffmpeg_video': '.mp4',
+}
+# output name: (output type, path suffix)
+OUTPUTS = {
+    'raw': ('raw', '.raw'),
+    'avi': ('file', '.avi'),
+    'mp4': ('file', '.mp4'),
+    'mkv': ('file', '.mkv'),
+    'h264_pipe': ('h264_pipe', None),
+}
+PERCENTILES = (50, 95, 99)
+# metric: (whether higher is better, smallest absolute change that can count as a regression)
+COMPARED = {
+    'write_fps': (True, 1),
+    'dropped': (False, 5),
+    'latency_p50': (False, 1),
+    'latency_p99': (False, 2),
+    'cpu': (False, 0.05),
+}
+
+
+def case_name(case):
+    if case['input'] == 'video':
+        return f'video-{case["output"]}'
+    w, h = case['res']
+    return f'{case["input"]}-{w}x{h}@{case["fps"]}-{case["output"]}'
+
+
+def source_path(case, options):
+    '''Path of the transcoded video a case reads.'''
+    w, h = case['res']
+    return str(Path(options['source_dir'], f'{case["input"]}-{w}x{h}@{case["fps"]}{TRANSCODED[case["input"]]}'))
+
+
+def transcode(case, options):
+    '''Transcodes --video to the case's res and fps, looped to last the whole run. Done once per path.'''
+    path = source_path(case, options)
+    if Path(path).exists():
+        return path
+    w, h = case['res']
+    seconds = options['warmup'] + options['duration'] + 1
+    if case['input'] == 'raw_video':
+        codec = ['-f', 'rawvideo', '-pix_fmt', 'rgb24']
+    else:
+        codec = ['-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p']
+    subprocess.run(
+        [
+            'ffmpeg', '-y', '-loglevel', 'error', '-stream_loop', '-1', '-i', options['video'], '-t', str(seconds),
+            '-an', '-vf', f'scale={w}:{h}', '-r', str(case['fps']), *codec, path,
+        ],
+        check=True,
+    )
+    return path
+
+
+def rusage():
+    '''Returns (cpu seconds, children cpu seconds, peak rss in MB) of this process.'''
+    if resource is None:
+        return None, None, None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on linux and in bytes on macos
+    rss = usage.ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+    return usage.ru_utime + usage.ru_stime, children.ru_utime + children.ru_stime, rss
+
+
+def run_case(case, options):
+    '''Runs a single case, in a child process. Returns the case's metrics.'''
+    if case['input'] == 'synthetic':
+        input_type, input_id = 'synthetic', 0
+        input_config = {
+            'res': case['res'], 'pixel_format': options['pixel_format'], 'pattern': options['pattern'],
+            'fps': case['fps'], 'throttle': case['fps'] > 0,
+        }
+    elif case['input'] == 'raw_video':
+        input_type, input_id = 'raw_video', source_path(case, options)
+        input_config = {'res': (*case['res'], 3), 'fps': case['fps']}
+    elif case['input'] == 'ffmpeg_video':
+        input_type, input_id = 'ffmpeg_video', source_path(case, options)
+        input_config = {'res': case['res'], 'fps': case['fps']}
+    else:
+        input_type, input_id = 'video', options['video']
+        input_config = {}
+
+    output_type, suffix = OUTPUTS[case['output']]
+    tmp_dir = tempfile.mkdtemp(prefix='stream_benchmark')
+    path = str(Path(tmp_dir, f'out{suffix}')) if suffix else tmp_dir
+    output_config = {}
+    if output_type == 'h264_pipe':
+        output_config['callback'] = lambda data: None
+    if case['input'] == 'synthetic' and case['fps'] == 0:
+        # unthrottled, the container still needs a frame rate
+        output_config['fps'] = 30
+
+    # capture timestamps by frame object, frames (or pool slots) are the same object on read and write
+    captured = {}
+    latencies = []
+    counts = {'read': 0, 'written': 0}
+
+    def on_read(data=None, timestamp=None):
+        captured[id(data)] = timestamp
+        counts['read'] += 1
+
+    def on_write(data=None):
+        timestamp = captured.pop(id(data), None)
+        if timestamp is not None:
+            latencies.append(time.time() - timestamp)
+        counts['written'] += 1
+
+    s = Stream(
+        input_type=input_type, input_config=input_config, id=input_id,
+        output_type=output_type, output_config=output_config, path=path,
+        on_read=on_read, on_write=on_write,
+        frame_pool=options['frame_pool'], queue_size=options['queue_size'], overflow=options['overflow'],
+        batch_writes=options['batch_writes'], event_driven=options['event_driven'], pacing=options['pacing'],
+    )
+    try:
+        s.start_reading()
+        time.sleep(options['warmup'])
+
+        cpu, cpu_children, _ = rusage()
+        counts['read'] = counts['written'] = 0
+        latencies.clear()
+        start = time.monotonic()
+        s.start_writing()
+        time.sleep(options['duration'])
+        reads = counts['read']
+        s.stop_reading()
+        s.stop_writing()
+        elapsed = time.monotonic() - start
+        # sampled with elapsed, so teardown below is not counted
+        end_cpu, end_cpu_children, rss = rusage()
+        stats = s.stats()
+    finally:
+        s.stop()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    percentiles = np.percentile(latencies, PERCENTILES) * 1000 if latencies else [None] * len(PERCENTILES)
+    return {
+        'case': case_name(case),
+        **case,
+        'read_fps': reads / options['duration'],
+        'write_fps': counts['written'] / elapsed,
+        'frames_read': counts['read'],
+        'frames_written': counts['written'],
+        'dropped': counts['read'] - counts['written'],
+        **{f'latency_p{p}': value for p, value in zip(PERCENTILES, percentiles)},
+        'cpu': (end_cpu - cpu) / elapsed if cpu is not None else None,
+        'cpu_children': (end_cpu_children - cpu_children) / elapsed if cpu is not None else None,
+        'peak_rss_mb': rss,
+        'queue': stats['queue'],
+        'reader': stats['reader'],
+        'writer': stats['writer'],
+    }
+
+
+def run_isolated(case, options):
+    '''Runs a case in a fresh process.'''
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, case, options).result()
+
+
+def build_cases(args):
+    cases = []
+    for input_type in args.inputs:
+        for output in args.outputs:
+            if input_type == 'video':
+                # resolution and fps come from the video file
+                cases.append({'input': input_type, 'output': output, 'res': None, 'fps': None})
+                continue
+            for res in args.res:
+                for fps in args.fps:
+                    if fps == 0 and input_type in TRANSCODED:
+                        continue
+                    cases.append({'input': input_type, 'output': output, 'res': res, 'fps': fps})
+    return cases
+
+
+def compare(results, baseline, tolerance):
+    '''Prints every compared metric against the baseline. Returns the regressions.'''
+    previous = {result['case']: result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        base = previous.get(result['case'])
+        if base is None:
+            print(f'{result["case"]}: not in baseline')
+            continue
+        for metric, (higher_is_better, floor) in COMPARED.items():
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if old:
+                change = (new - old) / abs(old)
+            else:
+                # anything from nothing, eg: dropped frames
+                change = float('inf') if new > old else 0.0
+            worse = -change if higher_is_better else change
+            # near zero metrics (eg: cpu of a throttled run) change a lot relative to themselves from noise alone
+            regressed = worse > tolerance and abs(new - old) > floor
+            if regressed:
+                regressions.append((result['case'], metric, old, new))
+            print(f'{result["case"]:<36} {metric:<12} {old:>10.2f} -> {new:>10.2f} ({change:+.1%}){"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def parse_res(value):
+    w, h = value.lower().split('x')
+    return (int(w), int(h))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--inputs', nargs='+', choices=INPUTS, default=['synthetic'])
+    parser.add_argument('--video', help='video file read by the video input, and transcoded for raw_video and ffmpeg_video')
+    parser.add_argument('--res', nargs='+', type=parse_res, default=[(640, 480), (1920, 1080)], help='WIDTHxHEIGHT')
+    parser.add_argument('--fps', nargs='+', type=int, default=[30, 60], help='0 reads synthetic frames unthrottled')
+    parser.add_argument('--outputs', nargs='+', choices=OUTPUTS, default=list(OUTPUTS))
+    parser.add_argument('--pixel-format', default='rgb24', help='pixel format of synthetic frames')
+    parser.add_argument('--pattern', default='noise', help='pattern of synthetic frames')
+    parser.add_argument('--duration', type=float, default=5, help='seconds of writing per run')
+    parser.add_argument('--warmup', type=float, default=1, help='seconds of reading before writing starts')
+    parser.add_argument('--frame-pool', type=int, default=None)
+    parser.add_argument('--queue-size', type=int, default=700)
+    parser.add_argument('--overflow', default='drop_newest')
+    parser.add_argument('--batch-writes', action='store_true')
+    parser.add_argument('--event-driven', action='store_true')
+    parser.add_argument('--pacing', default='catch_up')
+    parser.add_argument('--output', help='path to write the results to, as json')
+    parser.add_argument('--baseline', help='results json to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative change counted as a regression')
+    args = parser.parse_args(argv)
+    if set(args.inputs) & {'video', *TRANSCODED} and not args.video:
+        parser.error('the video, raw_video and ffmpeg_video inputs require --video')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = {
+        'video': args.video,
+        'pixel_format': args.pixel_format,
+        'pattern': args.pattern,
+        'duration': args.duration,
+        'warmup': args.warmup,
+        'frame_pool': args.frame_pool,
+        'queue_size': args.queue_size,
+        'overflow': args.overflow,
+        'batch_writes': args.batch_writes,
+        'event_driven': args.event_driven,
+        'pacing': args.pacing,
+        'source_dir': None,
+    }
+
+    results = []
+    cases = build_cases(args)
+    if any(case['input'] in TRANSCODED for case in cases):
+        options['source_dir'] = tempfile.mkdtemp(prefix='stream_benchmark_sources')
+    try:
+        for case in cases:
+            try:
+                if case['input'] in TRANSCODED:
+                    transcode(case, options)
+                result = run_isolated(case, options)
+            except Exception as e:
+                print(f'{case_name(case)} failed: {e}')
+                continue
+            results.append(result)
+            print(
+                f'{result["case"]:<36} read {result["read_fps"]:7.1f} fps  write {result["write_fps"]:7.1f} fps  '
+                f'dropped {result["dropped"]:5d}  p50 {result["latency_p50"] or 0:7.2f} ms  '
+                f'p99 {result["latency_p99"] or 0:7.2f} ms  cpu {result["cpu"] or 0:5.2f}  rss {result["peak_rss_mb"] or 0:7.1f} MB'
+            )
+    finally:
+        if options['source_dir'] is not None:
+            shutil.rmtree(options['source_dir'], ignore_errors=True)
+
+    report = {
+        'created': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {key: value for key, value in options.items() if key != 'source_dir'},
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regressions beyond {args.tolerance:.0%}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
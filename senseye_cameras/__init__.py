@@ -11,3 +11,5 @@ from . input.input_factory import create_input
 from . output.output_factory import create_output
 
 from . stream import Stream
+from . stream_group import StreamGroup
+from . async_stream import AsyncInput, AsyncStream
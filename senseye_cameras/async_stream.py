@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from . safe_queue import SafeQueue
+from . stream import Stream
+from . input.input_factory import create_input
+
+log = logging.getLogger(__name__)
+
+
+class FrameBuffer:
+    '''
+    Bounded buffer handing frames from a reader thread to an asyncio consumer.
+    The event loop is only woken up when the consumer is waiting on an empty buffer.
+
+    Args:
+        loop: the consumer's event loop.
+        maxsize/overflow/timeout: see SafeQueue. The 'block' policy makes the reader wait for the consumer.
+        on_evict (func): called with each (frame, timestamp) the overflow policy drops.
+    '''
+
+    def __init__(self, loop, maxsize=30, overflow='block', timeout=1, on_evict=None):
+        self.loop = loop
+        self.q = SafeQueue(maxsize, module=str(self), overflow=overflow, timeout=timeout, on_evict=on_evict)
+        self.event = asyncio.Event()
+        self.waiting = False
+
+    def put(self, item):
+        '''Adds an item. Called from the reader thread.'''
+        self.q.offer(item)
+        if self.waiting:
+            self.waiting = False
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    async def get(self):
+        '''Waits for the next item.'''
+        while True:
+            item = self.q.get_nowait()
+            if item is not None:
+                return item
+
+            self.event.clear()
+            self.waiting = True
+            # an item may have been added before the reader saw self.waiting
+            item = self.q.get_nowait()
+            if item is not None:
+                self.waiting = False
+                return item
+            await self.event.wait()
+
+    def __str__(self):
+        return f'{self.__class__.__name__}'
+
+
+class AsyncInput:
+    '''
+    Asyncio interface to an Input.
+    Blocking device calls run in a dedicated executor thread, so they never stall the event loop.
+
+    Args:
+        input (Input): the input to wrap, see create_input.
+
+    Example:
+        async with AsyncInput.create(type='usb', id=0) as cam:
+            async for frame, timestamp in cam.frames():
+                ...
+    '''
+
+    def __init__(self, input):
+        self.input = input
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    @classmethod
+    def create(cls, *args, **kwargs):
+        '''Creates an AsyncInput around create_input(*args, **kwargs).'''
+        return cls(create_input(*args, **kwargs))
+
+    async def run(self, fn, *args):
+        return await asyncio.get_event_loop().run_in_executor(self.executor, fn, *args)
+
+    async def open(self):
+        return await self.run(self.input.open)
+
+    async def read(self):
+        '''Returns (frame, timestamp).'''
+        return await self.run(self.input.read)
+
+    async def read_into(self, out):
+        '''Returns (frame, timestamp), see Input.read_into.'''
+        return await self.run(self.input.read_into, out)
+
+    async def close(self):
+        try:
+            return await self.run(self.input.close)
+        finally:
+            self.executor.shutdown(wait=False)
+
+    async def frames(self):
+        '''
+        Yields (frame, timestamp) until the input stops producing frames.
+        Each frame is released (see Input.release) when the next one is requested, so frames that
+        are views into device buffers are only valid until then.
+        '''
+        while True:
+            frame, timestamp = await self.read()
+            if frame is None:
+                return
+            try:
+                yield frame, timestamp
+            finally:
+                self.input.release(frame)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def __str__(self):
+        return f'{self.__class__.__name__}:{str(self.input)}'
+
+
+class AsyncStream:
+    '''
+    Asyncio interface to a Stream.
+    Frames are read by the Stream's reader thread and handed to the event loop through bounded FrameBuffers.
+
+    Args:
+        stream (Stream): the stream to wrap. Use AsyncStream.create to build one without blocking the event loop.
+
+    Example:
+        stream = await AsyncStream.create(input_type='usb', id=0, path='out.mkv', reading=True)
+        await stream.start_writing()
+        async for frame, timestamp in stream.frames():
+            ...
+        await stream.stop()
+    '''
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffers = []
+
+        # frames keep going to the stream's own on_read callback
+        self._on_read = self.stream.reader.on_read
+        self.stream.reader.on_read = self.on_read
+
+    @classmethod
+    async def create(cls, **kwargs):
+        '''Creates a Stream(**kwargs) in an executor thread, as opening a device may block.'''
+        loop = asyncio.get_event_loop()
+        stream = await loop.run_in_executor(None, functools.partial(Stream, **kwargs))
+        return cls(stream)
+
+    def retain(self, data):
+        if self.stream.reader.pool is None:
+            self.stream.reader.input.retain(data)
+
+    def release(self, data):
+        if self.stream.reader.pool is None:
+            self.stream.reader.input.release(data)
+
+    def on_read(self, data=None, timestamp=None):
+        if self._on_read is not None:
+            self._on_read(data=data, timestamp=timestamp)
+        if self.buffers and self.stream.reader.pool is not None:
+            # pool slots are reused once the callback returns
+            data = data.copy()
+        for buffer in list(self.buffers):
+            # each buffer holds a reference until its consumer moves on to the next frame
+            self.retain(data)
+            buffer.put((data, timestamp))
+
+    async def frames(self, maxsize=30, overflow='block', timeout=1):
+        '''
+        Yields (frame, timestamp) for every frame read while iterating.
+        Each frame is released (see Input.release) when the next one is requested, so frames that
+        are views into device buffers are only valid until then.
+        Args:
+            maxsize (int): how many frames can wait for the consumer.
+            overflow (str): what to do when the consumer falls behind, see safe_queue.OVERFLOW_POLICIES.
+                'block' applies backpressure, making the reader wait up to 'timeout' seconds per frame.
+        '''
+        buffer = FrameBuffer(
+            asyncio.get_event_loop(), maxsize=maxsize, overflow=overflow, timeout=timeout,
+            on_evict=lambda item: self.release(item[0]),
+        )
+        self.buffers.append(buffer)
+        try:
+            while True:
+                data, timestamp = await buffer.get()
+                try:
+                    yield data, timestamp
+                finally:
+                    self.release(data)
+        finally:
+            self.buffers.remove(buffer)
+            for data, timestamp in buffer.q.remove_existing() or []:
+                self.release(data)
+
+    async def run(self, fn, *args):
+        return await asyncio.get_event_loop().run_in_executor(None, fn, *args)
+
+    async def start_reading(self):
+        return await self.run(self.stream.start_reading)
+
+    async def stop_reading(self):
+        return await self.run(self.stream.stop_reading)
+
+    async def start_writing(self):
+        '''Starts writing frames. Spawning the output runs in an executor thread.'''
+        return await self.run(self.stream.start_writing)
+
+    async def stop_writing(self):
+        '''Stops writing frames. Draining and closing the output runs in an executor thread.'''
+        return await self.run(self.stream.stop_writing)
+
+    async def stop(self):
+        return await self.run(self.stream.stop)
+
+    def stats(self):
+        return {
+            **self.stream.stats(),
+            'buffers': [buffer.q.stats() for buffer in self.buffers],
+        }
+
+    def __str__(self):
+        return f'{self.__class__.__name__}'
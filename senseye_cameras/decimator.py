@@ -0,0 +1,89 @@
+import threading
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Decimator:
+    '''
+    Decides which frames are recorded, by ratio or by a target frame rate.
+    A ratio keeps every nth frame. A target fps keeps a frame whenever its capture timestamp reaches
+    the next due time, so dropped or late captures do not throw off the recorded rate.
+    Timestamps up to half an input frame early count as due, so capture jitter does not skip frames.
+
+    Args:
+        ratio (int): keep every 'ratio'th frame.
+        fps (float): keep frames at this rate, by capture timestamp.
+        input_fps (float): rate frames are captured at. Used to derive the output fps of a ratio,
+            and the jitter tolerance of a target fps.
+    '''
+
+    def __init__(self, ratio=None, fps=None, input_fps=None):
+        if (ratio is None) == (fps is None):
+            raise ValueError('Decimator takes exactly one of ratio or fps.')
+        if ratio is not None and (int(ratio) != ratio or ratio < 1):
+            raise ValueError(f'Decimation ratio must be a positive integer, got {ratio}.')
+        if fps is not None and fps <= 0:
+            raise ValueError(f'Decimation fps must be positive, got {fps}.')
+
+        self.ratio = int(ratio) if ratio is not None else None
+        self.fps = fps
+        self.input_fps = input_fps
+        self.period = 1 / fps if fps else None
+        self.tolerance = 0.5 / input_fps if input_fps else 0
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''Restarts decimation, so the next frame offered is kept.'''
+        with self._lock:
+            self.count = 0
+            self.due = None
+            self.kept = 0
+            self.skipped = 0
+
+    def keep(self, timestamp=None):
+        '''Returns whether the frame captured at 'timestamp' should be recorded.'''
+        with self._lock:
+            if self.ratio is not None:
+                keep = self.count % self.ratio == 0
+                self.count += 1
+            elif timestamp is None:
+                keep = True
+            elif self.due is None or timestamp >= self.due - self.tolerance:
+                keep = True
+                self.due = timestamp + self.period if self.due is None else self.due + self.period
+                if self.due <= timestamp:
+                    # fell more than a period behind (eg: a capture gap), restart the schedule from this frame
+                    self.due = timestamp + self.period
+            else:
+                keep = False
+
+            if keep:
+                self.kept += 1
+            else:
+                self.skipped += 1
+            return keep
+
+    def output_fps(self):
+        '''Frame rate of the kept frames, None if it can not be known.'''
+        if self.fps is not None:
+            # frames can not be kept faster than they are captured
+            return min(self.fps, self.input_fps) if self.input_fps else self.fps
+        if self.input_fps:
+            return self.input_fps / self.ratio
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'kept': self.kept,
+                'skipped': self.skipped,
+                'output_fps': self.output_fps(),
+            }
+
+    def __str__(self):
+        if self.ratio is not None:
+            return f'{self.__class__.__name__}:1/{self.ratio}'
+        return f'{self.__class__.__name__}:{self.fps}fps'
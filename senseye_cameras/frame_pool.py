@@ -0,0 +1,199 @@
+import queue
+import threading
+import logging
+import multiprocessing
+from collections import deque
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # python < 3.8, only SharedFramePool needs it
+    shared_memory = None
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 64
+
+
+class FramePool:
+    '''
+    Fixed-capacity ring of preallocated frame slots.
+
+    Frames are decoded straight into a slot and passed around by slot index,
+    so a running stream does not allocate a new array per frame.
+    A slot is handed out by acquire() with one reference, which is handed back by release().
+    retain() adds a reference, for slots shared between several consumers.
+    The slot is free again once every reference has been released.
+
+    Args:
+        capacity (int): number of frame slots.
+        shape (tuple): numpy shape of a single frame, eg: (height, width, channels).
+        dtype: numpy dtype of a frame.
+    '''
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, shape=(720, 1280, 3), dtype=np.uint8):
+        if capacity < 1:
+            raise ValueError(f'FramePool capacity must be at least 1, got {capacity}.')
+
+        self.capacity = capacity
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+        self.frames = self.allocate()
+        # one view per slot, created up front so indexing a slot does not allocate
+        self.slots = [self.frames[i] for i in range(self.capacity)]
+
+        self._lock = threading.Lock()
+        self._free = deque(range(self.capacity), maxlen=self.capacity)
+        self._refs = [0] * self.capacity
+
+        # number of acquire() calls that found every slot in use
+        self.exhausted = 0
+
+    def allocate(self):
+        '''Allocates the backing array for every slot.'''
+        frames = np.empty((self.capacity,) + self.shape, dtype=self.dtype)
+        # touch every page now, rather than on the first pass through the ring
+        frames.fill(0)
+        return frames
+
+    @property
+    def frame_size(self):
+        '''Size of a single slot in bytes.'''
+        return self.slots[0].nbytes
+
+    def acquire(self):
+        '''
+        Takes ownership of a free slot.
+        Returns the slot index, or None if every slot is in use.
+        '''
+        with self._lock:
+            if self._free:
+                index = self._free.popleft()
+                self._refs[index] = 1
+                return index
+            self.exhausted += 1
+        return None
+
+    def retain(self, index):
+        '''Adds a reference to slot 'index'.'''
+        with self._lock:
+            self._refs[index] += 1
+
+    def release(self, index):
+        '''Drops a reference to slot 'index', handing it back to the pool once no references are left.'''
+        with self._lock:
+            self._refs[index] -= 1
+            if self._refs[index] == 0:
+                self._free.append(index)
+            elif self._refs[index] < 0:
+                self._refs[index] = 0
+                log.error(f'{str(self)} slot {index} released more often than it was acquired')
+
+    def available(self):
+        '''Number of free slots.'''
+        with self._lock:
+            return len(self._free)
+
+    def close(self):
+        '''Frees the pool's memory.'''
+        pass
+
+    def __len__(self):
+        return self.capacity
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.capacity}x{self.shape}, {self.dtype})'
+
+
+class SharedFramePool(FramePool):
+    '''
+    FramePool backed by multiprocessing shared memory.
+
+    The pool can be passed to a child process, which sees the same slots.
+    Only the process that created the pool hands slots out and keeps reference counts.
+    Slots released in another process are sent back over a multiprocessing queue
+    and picked up by the next acquire().
+
+    Args:
+        see FramePool.
+        context: multiprocessing context used to create the release queue.
+            Must match the context of the processes the pool is shared with. Defaults to 'spawn'.
+    '''
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, shape=(720, 1280, 3), dtype=np.uint8, context=None):
+        if shared_memory is None:
+            raise RuntimeError(f'{self.__class__.__name__} requires multiprocessing.shared_memory (python 3.8 or newer).')
+        self.shm = None
+        self._released = (context or multiprocessing.get_context('spawn')).Queue()
+        FramePool.__init__(self, capacity=capacity, shape=shape, dtype=dtype)
+
+    def allocate(self):
+        '''Allocates the slots in a new shared memory block.'''
+        size = self.capacity * int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self._owner = True
+        frames = np.ndarray((self.capacity,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        frames.fill(0)
+        return frames
+
+    def acquire(self):
+        self.collect()
+        return FramePool.acquire(self)
+
+    def collect(self):
+        '''Returns slots released by other processes to the free list.'''
+        while True:
+            try:
+                index = self._released.get_nowait()
+            except queue.Empty:
+                return
+            FramePool.release(self, index)
+
+    def retain(self, index):
+        if not self._owner:
+            raise RuntimeError(f'{str(self)} slots can only be retained by the process that created the pool.')
+        FramePool.retain(self, index)
+
+    def release(self, index):
+        if self._owner:
+            FramePool.release(self, index)
+        else:
+            self._released.put(index)
+
+    def close(self):
+        '''Detaches from the shared memory, freeing it if this process created it.'''
+        if self.shm is None:
+            return
+        # views into the block must be gone before it can be closed
+        self.frames = self.slots = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+        self.shm = None
+
+    def __getstate__(self):
+        return {
+            'name': self.shm.name,
+            'capacity': self.capacity,
+            'shape': self.shape,
+            'dtype': self.dtype,
+            'released': self._released,
+        }
+
+    def __setstate__(self, state):
+        self.capacity = state['capacity']
+        self.shape = state['shape']
+        self.dtype = state['dtype']
+        self._released = state['released']
+
+        self.shm = shared_memory.SharedMemory(name=state['name'])
+        self._owner = False
+        self.frames = np.ndarray((self.capacity,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self.slots = [self.frames[i] for i in range(self.capacity)]
+
+        self._lock = threading.Lock()
+        self._free = deque(maxlen=self.capacity)
+        self._refs = [0] * self.capacity
+        self.exhausted = 0
@@ -4,7 +4,7 @@ import ffmpeg
 import logging
 import numpy as np
 
-from . input import Input
+from . input import Input, BufferRing, readinto_exact
 
 log = logging.getLogger(__name__)
 
@@ -21,6 +21,11 @@ class CameraFfmpeg(Input):
 
             camera_pixel_format (str): pixel format of the camera (eg: bgr24, uyvy422)
             format (str): desired output pixel format of the camera (eg: rawvideo, h264)
+            reuse_buffer (bool): read rawvideo frames into a few recycled buffers (see BufferRing).
+                A buffer is read into again only once its frame is released (see Input.release),
+                so frames held by a Stream's queues are never overwritten.
+            roi/binning: see Input. Applied by ffmpeg with crop and scale filters, so only the
+                region of interest crosses the pipe.
     '''
 
     def __init__(self, id=0, config={}):
@@ -30,33 +35,52 @@ class CameraFfmpeg(Input):
             'block_size': 16384,
             'camera_pixel_format': 'uyvy422',
             'format': 'rawvideo',
+            'reuse_buffer': False,
         }
         Input.__init__(self, id=id, config=config, defaults=defaults)
 
         self.process = None
+        self.buffers = None
+        self.reset_throughput()
 
     def get_format(self):
         '''Get os specific format.'''
         if 'linux' in sys.platform:
-            return 'v412'
+            return 'v4l2'
         if sys.platform == 'darwin':
             return 'avfoundation'
         return 'dshow'
 
+    def command(self):
+        '''Returns the ffmpeg-python stream that outputs frames to stdout.'''
+        stream = ffmpeg.input(
+            f'{self.id}',
+            format=self.get_format(),
+            pix_fmt=self.config.get('camera_pixel_format'),
+            framerate=self.config.get('fps'),
+            s=f'{self.config.get("res")[0]}x{self.config.get("res")[1]}',
+        )
+        return self.roi_filters(stream).output('pipe:', format=self.config.get('format'))
+
+    def roi_filters(self, stream):
+        '''Applies config roi and binning to 'stream' with ffmpeg filters, producing frames of frame_shape.'''
+        if not self.cropping():
+            return stream
+        shape = Input.frame_shape(self)
+        if self.config.get('roi') is not None:
+            rows, columns = self.roi_slices(shape)
+            stream = stream.filter('crop', columns.stop - columns.start, rows.stop - rows.start, columns.start, rows.start)
+        if (self.config.get('binning') or 1) > 1:
+            height, width = self.frame_shape()[:2]
+            stream = stream.filter('scale', width, height)
+        return stream
+
     def open(self):
         '''
         Opens the ffmpeg subprocess and logs.
         '''
         self.process = (
-            ffmpeg
-            .input(
-                f'{self.id}',
-                format=self.get_format(),
-                pix_fmt=self.config.get('camera_pixel_format'),
-                framerate=self.config.get('fps'),
-                s=f'{self.config.get("res")[0]}x{self.config.get("res")[1]}',
-            )
-            .output('pipe:', format=self.config.get('format'))
+            self.command()
             # hide logging
             .global_args('-loglevel', 'error', '-hide_banner')
             # disable audio
@@ -68,37 +92,109 @@ class CameraFfmpeg(Input):
         time.sleep(0.1)
 
         return_code = self.process.poll()
-        if return_code is not None:
+        if self.failed_to_start(return_code):
             raise Exception(f'Failed to open ffmpeg camera {self.id}. Ffmpeg process exited with return code: {return_code} ')
 
         self.input = self.process.stdout
 
+        self.buffers = None
+        if self.config.get('format') == 'rawvideo' and self.config.get('reuse_buffer'):
+            self.buffers = BufferRing(self.frame_shape())
+        self.reset_throughput()
+
+    def failed_to_start(self, return_code):
+        '''Whether the ffmpeg process having exited with 'return_code' (None if running) on start up is a failure.'''
+        # a camera is never done, any exit is a failure
+        return return_code is not None
+
+    def blocks_on_read(self):
+        '''Reads block on ffmpeg's stdout until the next frame is output.'''
+        return True
+
+    def frame_shape(self):
+        return self.cropped_shape(Input.frame_shape(self))
+
     def read(self):
         '''
         Reads in raw frames.
         '''
+        if self.config.get('format') == 'rawvideo':
+            # rawvideo frames are read straight into a numpy array
+            if self.buffers is None:
+                return self.read_into(np.empty(self.frame_shape(), dtype=np.uint8))
+            out = self.buffers.acquire()
+            frame, timestamp = self.read_into(out)
+            if frame is None:
+                self.buffers.release(out)
+            return frame, timestamp
+
+        frame = None
+
+        try:
+            # directly read in bytes otherwise
+            frame = self.input.read(self.config.get('block_size'))
+        except Exception as e:
+            log.error(f"Ffmpeg camera error: {e}")
+
+        return frame, time.time()
+
+    def read_into(self, out):
+        '''
+        Reads a rawvideo frame straight into 'out'.
+        Short reads from the pipe are resumed until the frame is complete.
+        '''
         frame = None
 
         try:
-            if self.config.get('format') == 'rawvideo':
-                # convert rawvideo frames into a numpy array
-                frame_size = np.prod(np.array(self.config.get('res')))
-                frame_bytes = self.input.read(frame_size)
-                frame_str = np.fromstring(frame_bytes, dtype='uint8')
-                # add shape metadata to the frame
-                # numpy expects (width, height, channels)
-                numpy_res = self.config.get('res')[1::-1] + self.config.get('res')[2:]
-                frame = frame_str.reshape(numpy_res)
-            else:
-                # directly read in bytes otherwise
-                frame = self.input.read(self.config.get('block_size'))
+            start = time.monotonic()
+            n = readinto_exact(self.input, out)
+            self.read_seconds += time.monotonic() - start
+            self.bytes_read += n
+
+            if n == out.nbytes:
+                frame = out
+                self.frames_read += 1
+            elif n:
+                log.error(f'{str(self)} stream ended mid frame, {n} of {out.nbytes} bytes read.')
         except Exception as e:
             log.error(f"Ffmpeg camera error: {e}")
 
         return frame, time.time()
 
+    def retain(self, frame):
+        if self.buffers:
+            self.buffers.retain(frame)
+
+    def release(self, frame):
+        if self.buffers:
+            self.buffers.release(frame)
+
+    def reset_throughput(self):
+        '''Resets the read throughput counters.'''
+        self.opened_at = time.monotonic()
+        self.frames_read = 0
+        self.bytes_read = 0
+        self.read_seconds = 0
+
+    def throughput(self):
+        '''
+        Returns read throughput since the camera was opened:
+            fps/bytes_per_second: sustained frame and byte rate.
+            read_fraction: fraction of the time spent waiting on ffmpeg's pipe.
+        '''
+        elapsed = time.monotonic() - self.opened_at
+        return {
+            'frames': self.frames_read,
+            'bytes': self.bytes_read,
+            'seconds': elapsed,
+            'fps': self.frames_read / elapsed if elapsed > 0 else 0,
+            'bytes_per_second': self.bytes_read / elapsed if elapsed > 0 else 0,
+            'read_fraction': self.read_seconds / elapsed if elapsed > 0 else 0,
+        }
+
     def close(self):
         if self.process:
+            log.info(f'{str(self)} throughput: {self.throughput()}')
             self.process.kill()
         self.process = None
         self.input = None
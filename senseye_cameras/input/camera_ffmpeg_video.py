@@ -0,0 +1,162 @@
+import re
+import logging
+import ffmpeg
+
+from . camera_ffmpeg import CameraFfmpeg
+
+log = logging.getLogger(__name__)
+
+# supported output pixel formats and their channel count
+PIXEL_FORMATS = {
+    'gray': 1,
+    'rgb24': 3,
+    'bgr24': 3,
+    'rgba': 4,
+    'bgra': 4,
+}
+
+
+class CameraFfmpegVideo(CameraFfmpeg):
+    '''
+    Decodes a video file through an ffmpeg subprocess.
+    Decoding is multithreaded, and scaling and pixel format conversion are done by ffmpeg on the way out.
+
+    Args:
+        id (str): path to the video file.
+        config (dict): Configuration dictionary. Accepted keywords:
+            res (tuple): output frame size in the format (width, height). Frames are scaled if it differs from the video.
+                Probed from the file if not set.
+            fps (float): frame rate reads are paced at. Probed from the file if not set.
+            pixel_format (str): output pixel format, one of PIXEL_FORMATS.
+            threads (int): decoder threads, 0 lets ffmpeg pick one per core.
+            start (float): seconds into the video to start decoding at. Seeking is frame accurate.
+            end (float): seconds into the video to stop decoding at.
+            reuse_buffer (bool): see CameraFfmpeg.
+            roi/binning: see Input, in pixels of the 'res' sized frames.
+    '''
+
+    def __init__(self, id=0, config={}):
+        defaults = {
+            'res': None,
+            'fps': None,
+            'pixel_format': 'rgb24',
+            'threads': 0,
+            'start': None,
+            'end': None,
+            'format': 'rawvideo',
+            'reuse_buffer': False,
+        }
+        CameraFfmpeg.__init__(self, id=id, config={**defaults, **config})
+        if self.config.get('pixel_format') not in PIXEL_FORMATS:
+            raise ValueError(f'Pixel format {self.config.get("pixel_format")} not supported. Supported formats: {tuple(PIXEL_FORMATS)}')
+        # frame the decoder was started at, see seek
+        self.start_frame = 0
+        self.count = None
+
+    def probe(self):
+        '''Fills in res and fps from the video's first video stream, if they are not configured. Requires ffprobe.'''
+        if self.config.get('res') is not None and self.config.get('fps'):
+            return
+        try:
+            info = ffmpeg.probe(str(self.id), select_streams='v:0')
+        except (ffmpeg.Error, FileNotFoundError) as e:
+            raise Exception(f'{str(self)} failed to probe video, set res and fps to open it without ffprobe: {e}')
+        stream = info['streams'][0]
+        if self.config.get('res') is None:
+            self.config['res'] = (stream['width'], stream['height'])
+        if not self.config.get('fps'):
+            num, den = stream['avg_frame_rate'].split('/')
+            self.config['fps'] = int(num) / int(den)
+
+    def start_time(self):
+        '''Seconds into the video that decoding starts at.'''
+        return (self.config.get('start') or 0) + self.start_frame / self.config.get('fps')
+
+    def trim(self):
+        '''Returns input and output arguments that limit decoding to start/end.'''
+        input_args, output_args = {}, {}
+        start = self.start_time()
+        if start:
+            # input seeking, decoding from the keyframe before 'start' and discarding frames up to it
+            input_args['ss'] = start
+        if self.config.get('end') is not None:
+            output_args['t'] = max(self.config.get('end') - start, 0)
+        return input_args, output_args
+
+    def command(self):
+        input_args, output_args = self.trim()
+        w, h = self.config.get('res')[:2]
+        stream = ffmpeg.input(str(self.id), threads=self.config.get('threads'), **input_args).filter('scale', w, h)
+        return (
+            self.roi_filters(stream)
+            .output('pipe:', format='rawvideo', pix_fmt=self.config.get('pixel_format'), **output_args)
+        )
+
+    def open(self):
+        self.probe()
+        w, h = self.config.get('res')[:2]
+        self.config['res'] = (w, h, PIXEL_FORMATS[self.config.get('pixel_format')])
+        CameraFfmpeg.open(self)
+
+    def failed_to_start(self, return_code):
+        '''A short video can be decoded completely on start up, its frames then wait in the pipe.'''
+        return bool(return_code)
+
+    def file_backed(self):
+        return True
+
+    def blocks_on_read(self):
+        '''Files decode as fast as they are read, so reads need pacing.'''
+        return False
+
+    def frame_shape(self):
+        w, h, channels = self.config.get('res')
+        shape = (h, w) if channels == 1 else (h, w, channels)
+        return self.cropped_shape(shape)
+
+    def frame_count(self):
+        '''
+        Exact number of frames between start and end.
+        Counted from the packets of an untrimmed video by ffprobe, or by decoding the video to a null output.
+        The count is cached.
+        '''
+        if self.count is not None:
+            return self.count
+
+        start_frame, self.start_frame = self.start_frame, 0
+        try:
+            input_args, output_args = self.trim()
+        finally:
+            self.start_frame = start_frame
+        if not input_args and not output_args:
+            try:
+                # every packet is a frame, so nothing has to be decoded
+                info = ffmpeg.probe(str(self.id), select_streams='v:0', count_packets=None)
+                self.count = int(info['streams'][0]['nb_read_packets'])
+                return self.count
+            except (ffmpeg.Error, FileNotFoundError, KeyError, ValueError) as e:
+                log.debug(f'{str(self)} could not count packets, decoding instead: {e}')
+
+        _, err = (
+            ffmpeg
+            .input(str(self.id), threads=self.config.get('threads'), **input_args)
+            .output('-', format='null', map='0:v:0', **output_args)
+            .global_args('-hide_banner', '-nostdin')
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        frames = re.findall(rb'frame=\s*(\d+)', err)
+        self.count = int(frames[-1]) if frames else 0
+        return self.count
+
+    def seek(self, index):
+        '''Restarts decoding at frame 'index' after start.'''
+        self.close()
+        self.start_frame = max(index, 0)
+        self.open()
+
+    def tell(self):
+        '''Index of the frame the next read returns.'''
+        return self.start_frame + self.frames_read
+
+    def __len__(self):
+        return self.frame_count()
@@ -1,5 +1,9 @@
+import os
 import time
 import logging
+import threading
+from collections import deque
+import numpy as np
 try:
     from pypylon import pylon
 except:
@@ -9,19 +13,99 @@ from . input import Input
 
 log = logging.getLogger(__name__)
 
-# writes the framenumber to the 8-11 bytes of the image as a big-endian set of octets
+# baked metadata layout, in the first row of the image:
+# bytes 0-6 are the timestamp in microseconds, bytes 7-10 the framenumber, both least significant byte first
+TIMESTAMP_SIZE = 7
+FRAMENUMBER_SIZE = 4
+METADATA_SIZE = TIMESTAMP_SIZE + FRAMENUMBER_SIZE
+
+def write_first_row(np_image, start, data):
+    '''Writes 'data' bytes into the first row of the image from pixel 'start', in a single write.'''
+    values = np.frombuffer(data, dtype=np.uint8)
+    # every channel of a pixel gets the same byte
+    values = values.reshape(values.shape + (1,) * (np_image.ndim - 2))
+    np_image[0, start:start + len(data)] = values
+
+# writes the framenumber to the 8-11 bytes of the image
 def encode_framenumber(np_image, n):
-    for i in range(4):
-        np_image[0][i+7] = n & 0xFF
-        n>>=8
+    write_first_row(np_image, TIMESTAMP_SIZE, (n & 0xFFFFFFFF).to_bytes(FRAMENUMBER_SIZE, 'little'))
 
 # converts time from a float in seconds to an int64 in microseconds
-# writes the time to the first 7 bytes of the image as a big-endian set of octets
+# writes the time to the first 7 bytes of the image
 def encode_timestamp(np_image, timestamp):
     t = int(timestamp*1e6)
-    for i in range(7):
-        np_image[0][i] = t & 0xFF
-        t>>=8
+    write_first_row(np_image, 0, (t & 0xFFFFFFFFFFFFFF).to_bytes(TIMESTAMP_SIZE, 'little'))
+
+# writes the timestamp and framenumber with a single write
+def encode_metadata(np_image, timestamp, n):
+    t = int(timestamp*1e6) & 0xFFFFFFFFFFFFFF
+    metadata = ((n & 0xFFFFFFFF) << (8 * TIMESTAMP_SIZE)) | t
+    write_first_row(np_image, 0, metadata.to_bytes(METADATA_SIZE, 'little'))
+
+def metadata_bytes(frames):
+    '''Returns the baked metadata bytes of an array of frames, shaped (frames, METADATA_SIZE).'''
+    metadata = frames[:, 0, :METADATA_SIZE]
+    if metadata.ndim > 2:
+        metadata = metadata[..., 0]
+    return metadata
+
+def decode_timestamps(frames):
+    '''Decodes the baked timestamps of an array of frames, in seconds.'''
+    metadata = metadata_bytes(frames)
+    padded = np.zeros((len(metadata), 8), dtype=np.uint8)
+    padded[:, :TIMESTAMP_SIZE] = metadata[:, :TIMESTAMP_SIZE]
+    return padded.view('<u8')[:, 0] / 1e6
+
+def decode_framenumbers(frames):
+    '''Decodes the baked framenumbers of an array of frames.'''
+    metadata = metadata_bytes(frames)
+    return np.ascontiguousarray(metadata[:, TIMESTAMP_SIZE:]).view('<u4')[:, 0]
+
+def extract_baked_data(path, res):
+    '''
+    Decodes the baked timestamps and framenumbers of every frame in a raw recording.
+    The file is memory mapped, so only the first row of each frame is read.
+
+    Args:
+        path (str): path to a raw video recorded from a CameraPylon with encode_metadata.
+        res (tuple): frame size in the format (width, height[, channels]).
+    Returns:
+        timestamps (np.ndarray): timestamps in seconds.
+        framenumbers (np.ndarray)
+    '''
+    shape = (res[1], res[0]) + tuple(res[2:])
+    frame_size = int(np.prod(shape))
+    count = os.path.getsize(path) // frame_size
+    if count == 0:
+        frames = np.empty((0,) + shape, dtype=np.uint8)
+    else:
+        frames = np.memmap(path, dtype=np.uint8, mode='r', shape=(count,) + shape)
+    return decode_timestamps(frames), decode_framenumbers(frames)
+
+# config['grab_strategy'] to pylon grab strategies
+GRAB_STRATEGIES = {
+    'latest': 'GrabStrategy_LatestImageOnly',
+    'one_by_one': 'GrabStrategy_OneByOne',
+}
+GRAB_MODES = ('poll', 'event')
+
+def set_node(node, value):
+    '''Sets an integer node to 'value', rounded down to the node's increment and clamped to its range.'''
+    value = max(node.Min, min(node.Max, int(value)))
+    value -= (value - node.Min) % node.Inc
+    node.SetValue(value)
+    return node.Value
+
+def image_handler(on_image):
+    '''
+    Creates a pylon ImageEventHandler that calls on_image(grab_result) from pylon's grab thread.
+    The class is built on demand, as pypylon is an optional dependency.
+    '''
+    class ImageHandler(pylon.ImageEventHandler):
+        def OnImageGrabbed(self, camera, grab_result):
+            on_image(grab_result)
+
+    return ImageHandler()
 
 class CameraPylon(Input):
     '''
@@ -32,6 +116,21 @@ class CameraPylon(Input):
         config (dict): Configuration dictionary. Accepted keywords:
             pfs (str): path to a pfs file.
             encode_metadata (bool): whether to bake in timestamps/frame number into the frame.
+            grab_mode (str): 'poll' retrieves results on every read.
+                'event' grabs in pylon's own thread: each image is copied into a reusable ring of
+                max_num_buffer frames by an image event handler, and reads wait on the ring.
+                read() hands out views into the ring, read_into() copies ring frames straight into 'out'.
+                A ring frame is reused once every reference to it is released (see Input.retain/release);
+                if the reader falls behind, the oldest unread frame is recycled and counted as skipped.
+            zero_copy (bool): in event mode, read() returns ring views instead of copies, so callers must
+                release each frame they read (see Input.retain/release).
+                None (the default) copies, unless read by a Stream's Reader, which releases its frames.
+            grab_strategy (str): 'latest' keeps only the newest image, 'one_by_one' queues every image.
+                Defaults to 'latest' when polling, and to 'one_by_one' in event mode, so no image is dropped by pylon.
+            max_num_buffer (int): number of buffers pylon grabs into. Defaults to pylon's own default.
+            grab_timeout (int): milliseconds a read waits for a frame.
+            roi/binning: see Input. Set on the camera as its AOI and binning,
+                rounded to the increments the camera supports.
     '''
 
     def __init__(self, id=0, config={}):
@@ -42,9 +141,33 @@ class CameraPylon(Input):
             'pfs': None,
             'encode_metadata': False,
             'format': 'rawvideo',
+            'grab_mode': 'poll',
+            'grab_strategy': None,
+            'max_num_buffer': None,
+            'grab_timeout': 100,
+            'zero_copy': None,
         }
         Input.__init__(self, id=id, config=config, defaults=defaults)
+        if self.config.get('grab_mode') not in GRAB_MODES:
+            raise ValueError(f'{str(self)} grab_mode must be one of {GRAB_MODES}.')
+        if self.config.get('grab_strategy') is None:
+            self.config['grab_strategy'] = 'one_by_one' if self.config.get('grab_mode') == 'event' else 'latest'
+        if self.config.get('grab_strategy') not in GRAB_STRATEGIES:
+            raise ValueError(f'{str(self)} grab_strategy must be one of {tuple(GRAB_STRATEGIES)}.')
+
         self.read_count = 0
+        self.handler = None
+
+        # event mode ring: frames are filled by pylon's grab thread and emptied by reads
+        self.condition = threading.Condition()
+        self.ring = None
+        self.free = deque()
+        self.filled = deque()
+        # references held to each ring frame handed out by read()
+        self.refs = []
+        self.grabbed = 0
+        self.delivered = 0
+        self.skipped = 0
 
     def configure(self):
         '''
@@ -56,6 +179,7 @@ class CameraPylon(Input):
 
         if self.config.get('pfs', None):
             pylon.FeaturePersistence.Load(self.config.get('pfs'), self.input.GetNodeMap())
+        self.configure_roi()
         self.config['pixel_format'] = self.input.PixelFormat.Value
         self.config['gain'] = self.input.Gain.Value
         self.config['exposure_time'] = self.input.ExposureTime.Value
@@ -63,6 +187,27 @@ class CameraPylon(Input):
         self.config['width'] = self.input.Width.Value
         self.config['height'] = self.input.Height.Value
         self.config['fps'] = self.input.ResultingFrameRate.GetValue()
+        if self.config.get('max_num_buffer'):
+            self.input.MaxNumBuffer.SetValue(self.config.get('max_num_buffer'))
+        self.config['max_num_buffer'] = self.input.MaxNumBuffer.GetValue()
+
+    def configure_roi(self):
+        '''Sets the camera's binning and AOI from config roi/binning. AOI values are in binned pixels.'''
+        binning = self.config.get('binning') or 1
+        if binning > 1:
+            set_node(self.input.BinningHorizontal, binning)
+            set_node(self.input.BinningVertical, binning)
+
+        roi = self.config.get('roi')
+        if roi is not None:
+            x, y, w, h = (value // binning for value in roi)
+            # offsets first go to 0, so any width/height fits
+            set_node(self.input.OffsetX, 0)
+            set_node(self.input.OffsetY, 0)
+            set_node(self.input.Width, w)
+            set_node(self.input.Height, h)
+            set_node(self.input.OffsetX, x)
+            set_node(self.input.OffsetY, y)
 
     def open(self):
         self.read_count = 0
@@ -72,28 +217,168 @@ class CameraPylon(Input):
         self.configure()
 
         self.input.StopGrabbing()
-        self.input.StartGrabbing(pylon.GrabStrategy_LatestImageOnly)
+        strategy = getattr(pylon, GRAB_STRATEGIES[self.config.get('grab_strategy')])
+        if self.config.get('grab_mode') == 'event':
+            self.reset_ring()
+            self.handler = image_handler(self.on_image)
+            self.input.RegisterImageEventHandler(self.handler, pylon.RegistrationMode_ReplaceAll, pylon.Cleanup_None)
+            self.input.StartGrabbing(strategy, pylon.GrabLoop_ProvidedByInstantCamera)
+        else:
+            self.input.StartGrabbing(strategy)
+
+    def blocks_on_read(self):
+        '''RetrieveResult, or the event ring, waits for the next grabbed frame.'''
+        return True
+
+    def reset_ring(self):
+        with self.condition:
+            self.ring = None
+            self.free.clear()
+            self.filled.clear()
+            self.refs = []
+            self.grabbed = 0
+            self.delivered = 0
+            self.skipped = 0
+
+    def on_image(self, grab_result):
+        '''
+        Called from pylon's grab thread for every grabbed image.
+        Copies the image into a free ring slot, recycling the oldest unread frame if the reader fell behind.
+        If every slot is held by readers, the image is dropped and counted as skipped.
+        '''
+        timestamp = time.time()
+        try:
+            if not grab_result.GrabSucceeded():
+                log.warning(f'{str(self)} grab failed.')
+                return
+            with grab_result.GetArrayZeroCopy() as array:
+                with self.condition:
+                    if self.ring is None:
+                        # allocated once the first image tells us its shape
+                        count = self.config.get('max_num_buffer') or 10
+                        self.ring = np.empty((count,) + array.shape, dtype=array.dtype)
+                        self.free.extend(range(count))
+                        self.refs = [0] * count
+                    self.skipped += grab_result.GetNumberOfSkippedImages()
+                    if self.free:
+                        index = self.free.popleft()
+                    elif self.filled:
+                        index, _ = self.filled.popleft()
+                        self.skipped += 1
+                    else:
+                        # every slot is being read or held, eg: max_num_buffer=1 while a read copies
+                        self.grabbed += 1
+                        self.skipped += 1
+                        return
+
+                np.copyto(self.ring[index], array)
+
+            with self.condition:
+                self.filled.append((index, timestamp))
+                self.grabbed += 1
+                self.condition.notify()
+        except Exception as e:
+            log.error(f'{str(self)} image event error: {e}')
+
+    def retrieve(self):
+        '''Waits for the oldest unread ring frame, and returns it as a view holding one reference.'''
+        timeout = self.config.get('grab_timeout') / 1000
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.filled, timeout=timeout):
+                return None, None
+            index, timestamp = self.filled.popleft()
+            self.refs[index] = 1
+            self.delivered += 1
+        return self.ring[index], timestamp
+
+    def ring_index(self, frame):
+        '''Index of the ring slot 'frame' views, or None if it is not a ring frame.'''
+        ring = self.ring
+        if ring is None or frame is None or frame.base is not ring:
+            return None
+        return (frame.ctypes.data - ring.ctypes.data) // ring[0].nbytes
+
+    def retain(self, frame):
+        with self.condition:
+            index = self.ring_index(frame)
+            if index is not None and self.refs[index] > 0:
+                self.refs[index] += 1
+
+    def release(self, frame):
+        with self.condition:
+            index = self.ring_index(frame)
+            if index is None or self.refs[index] == 0:
+                return
+            self.refs[index] -= 1
+            if self.refs[index] == 0:
+                self.free.append(index)
 
     def read(self):
+        if self.handler is not None:
+            frame, timestamp = self.retrieve()
+            if frame is None or self.config.get('zero_copy'):
+                return self.bake(frame, timestamp)
+            return self.copy_out(frame, timestamp, np.empty_like(frame))
+
         frame = None
         now = None
         if self.input:
+            ret = None
             try:
-                ret = self.input.RetrieveResult(100, pylon.TimeoutHandling_ThrowException)
+                ret = self.input.RetrieveResult(self.config.get('grab_timeout'), pylon.TimeoutHandling_ThrowException)
                 if ret.IsValid():
                     frame = ret.GetArray()
                 now = time.time()
-                if self.config.get('encode_metadata'):
-                    encode_timestamp(frame,now)
-                    encode_framenumber(frame,self.read_count)
-                self.read_count+=1
-            except TypeError as e:
+            except Exception as e:
                 log.error(f"{str(self)} read error: {e}")
-            ret.Release()
-        return frame, now
+            finally:
+                if ret is not None:
+                    ret.Release()
+        return self.bake(frame, now)
+
+    def read_into(self, out):
+        '''In event mode, the next ring frame is copied straight into 'out', and its slot freed.'''
+        if self.handler is None:
+            return Input.read_into(self, out)
+        frame, timestamp = self.retrieve()
+        if frame is None:
+            return None, None
+        return self.copy_out(frame, timestamp, out)
+
+    def copy_out(self, frame, timestamp, out):
+        '''Copies a retrieved ring frame into 'out' and releases it.'''
+        try:
+            np.copyto(out, frame.reshape(out.shape))
+        finally:
+            self.release(frame)
+        return self.bake(out, timestamp)
+
+    def bake(self, frame, timestamp):
+        '''Bakes metadata into a read frame if configured, and counts the read.'''
+        if frame is not None:
+            if self.config.get('encode_metadata'):
+                encode_metadata(frame, timestamp, self.read_count)
+            self.read_count += 1
+        return frame, timestamp
+
+    def stats(self):
+        '''Event mode counters: images grabbed by pylon, frames delivered to reads, frames skipped
+        and ring frames still held by readers.'''
+        with self.condition:
+            return {
+                'grabbed': self.grabbed,
+                'delivered': self.delivered,
+                'skipped': self.skipped,
+                'pending': len(self.filled),
+                'held': sum(1 for refs in self.refs if refs),
+            }
 
     def close(self):
         self.read_count = 0
         if self.input and self.input.IsOpen():
+            self.input.StopGrabbing()
+            if self.handler is not None:
+                self.input.DeregisterImageEventHandler(self.handler)
             self.input.Close()
             self.input = None
+        self.handler = None
@@ -1,8 +1,9 @@
+import os
 import time
 import logging
 import numpy as np
 
-from . input import Input
+from . input import Input, readinto_exact
 
 log = logging.getLogger(__name__)
 
@@ -14,17 +15,72 @@ class CameraRawVideo(Input):
         id (str): path to the raw video file.
         config (dict): Configuration dictionary. Accepted keywords:
             res (tuple): frame size in the format (width, height)
+            mmap (bool): memory map the file instead of reading it.
+                Frames are then read-only views into the file, and the recording can be sliced
+                (eg: cam[100:200]) and read in batches with read_batch.
+            roi/binning: see Input. Frames are returned as views of the full frames,
+                with x/width along the second axis of res and y/height along the first.
     '''
 
     def __init__(self, id=0, config={}):
         defaults = {
             'res': (1920, 1080),
+            'mmap': False,
         }
         Input.__init__(self, id=id, config=config, defaults=defaults)
+        self.frames = None
+        self.position = 0
+        # full frame that cropped frames are read into by read_into
+        self.buffer = None
+
+    @property
+    def frame_size(self):
+        '''Length of a frame in bytes.'''
+        return np.uint8().itemsize * int(np.prod(self.config.get('res')))
 
     def open(self):
-        '''Opens raw video as a bytes file.'''
-        self.input = open(self.id, 'rb')
+        '''Opens raw video as a bytes file, or as a memory map.'''
+        self.position = 0
+        if not self.config.get('mmap'):
+            self.input = open(self.id, 'rb')
+            if self.cropping():
+                self.buffer = np.empty(self.source_shape(), dtype=np.uint8)
+            return
+
+        count = os.path.getsize(self.id) // self.frame_size
+        if count == 0:
+            # empty files can not be memory mapped
+            self.input = None
+            self.frames = np.empty((0,) + self.frame_shape(), dtype=np.uint8)
+        else:
+            self.input = np.memmap(self.id, dtype=np.uint8, mode='r', shape=(count * self.frame_size,))
+            self.frames = self.input.reshape((count,) + self.source_shape())
+            if self.cropping():
+                self.frames = self.frames[(slice(None),) + self.roi_slices(self.source_shape())]
+        if os.path.getsize(self.id) % self.frame_size:
+            log.warning(f'{str(self)} ends with a partial frame, which is ignored.')
+
+    def file_backed(self):
+        return True
+
+    def frame_count(self):
+        '''Number of whole frames in the file.'''
+        if self.frames is not None:
+            return len(self.frames)
+        return os.fstat(self.input.fileno()).st_size // self.frame_size
+
+    def seek(self, index):
+        '''Moves to frame 'index', so it is returned by the next read.'''
+        if index < 0:
+            index += self.frame_count()
+        index = min(max(index, 0), self.frame_count())
+        if self.frames is None:
+            self.input.seek(index * self.frame_size)
+        self.position = index
+
+    def tell(self):
+        '''Index of the frame the next read returns.'''
+        return self.position
 
     def read(self):
         '''
@@ -33,20 +89,87 @@ class CameraRawVideo(Input):
         '''
         frame = None
 
+        if self.frames is not None:
+            if self.position < len(self.frames):
+                frame = self.frames[self.position]
+                self.position += 1
+            return frame, time.time()
+
         try:
-            # Length of frame in bytes
-            frame_length = np.uint8().itemsize * np.product(self.config.get('res'))
-            frame_bytes = self.input.read(frame_length)
+            frame_bytes = self.input.read(self.frame_size)
 
             buf = np.frombuffer(frame_bytes, dtype=np.uint8)
-            if buf.size != 0:
-                frame = buf.reshape(self.config.get('res'))
+            if buf.size == self.frame_size:
+                frame = self.crop(buf.reshape(self.source_shape()))
+                self.position += 1
+            elif buf.size != 0:
+                log.error(f'{str(self)} ends with a partial frame of {buf.size} bytes.')
+        except Exception as e:
+            log.error(f'{str(self)} read error: {e}')
+
+        return frame, time.time()
+
+    def read_into(self, out):
+        '''
+        Reads raw video straight into 'out'.
+        A partial frame at the end of the file is treated as no frame.
+        '''
+        frame = None
+
+        try:
+            if self.frames is not None:
+                if self.position < len(self.frames):
+                    np.copyto(out, self.frames[self.position].reshape(out.shape))
+                    frame = out
+                    self.position += 1
+            elif self.buffer is not None:
+                if readinto_exact(self.input, self.buffer) == self.buffer.nbytes:
+                    np.copyto(out, self.crop(self.buffer).reshape(out.shape))
+                    frame = out
+                    self.position += 1
+            elif readinto_exact(self.input, out) == out.nbytes:
+                frame = out
+                self.position += 1
         except Exception as e:
             log.error(f'{str(self)} read error: {e}')
 
         return frame, time.time()
 
+    def read_batch(self, n):
+        '''
+        Reads up to n frames at once.
+        Returns an array of shape (frames,) + frame_shape(), which is a view into the file in mmap mode.
+        '''
+        if self.frames is not None:
+            batch = self.frames[self.position:self.position + n]
+        else:
+            batch = np.empty((n,) + self.source_shape(), dtype=np.uint8)
+            batch = batch[:readinto_exact(self.input, batch) // self.frame_size]
+            if self.cropping():
+                batch = batch[(slice(None),) + self.roi_slices(self.source_shape())]
+        self.position += len(batch)
+        return batch
+
+    def source_shape(self):
+        '''Raw video frames are reshaped to config['res'] as is.'''
+        return tuple(self.config.get('res'))
+
+    def frame_shape(self):
+        return self.cropped_shape(self.source_shape())
+
+    def __len__(self):
+        return self.frame_count()
+
+    def __getitem__(self, key):
+        '''Frames by index or slice, as views into the file. Requires mmap mode.'''
+        if self.frames is None:
+            raise TypeError(f'{str(self)} supports indexing only with the mmap config option.')
+        return self.frames[key]
+
     def close(self):
-        if self.input:
+        if self.input is not None and self.frames is None:
             self.input.close()
         self.input = None
+        self.frames = None
+        self.buffer = None
+        self.position = 0
@@ -0,0 +1,174 @@
+import time
+import logging
+import numpy as np
+
+from . input import Input
+from . camera_pylon import encode_metadata, METADATA_SIZE
+
+log = logging.getLogger(__name__)
+
+# supported pixel formats and their channel count
+PIXEL_FORMATS = {
+    'gray': 1,
+    'rgb24': 3,
+    'bgr24': 3,
+    'rgba': 4,
+    'bgra': 4,
+}
+
+
+def noise(shape, count, rng):
+    return rng.randint(0, 256, size=(count,) + shape, dtype=np.uint8)
+
+
+def gradient(shape, count, rng):
+    '''Diagonal gradient scrolling across the frame, each channel offset from the previous one.'''
+    h, w, c = shape
+    diagonal = (np.add.outer(np.arange(h), np.arange(w)) * 255 // max(h + w - 2, 1)).astype(np.uint8)
+    offset = np.arange(c) * 256 // c
+    frames = np.empty((count,) + shape, dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        # generated a frame at a time in uint8, which wraps around like the % 256 of the pattern
+        np.add(diagonal[:, :, None], ((i * 256 // count + offset) % 256).astype(np.uint8), out=frame)
+    return frames
+
+
+def shapes(shape, count, rng):
+    '''A square crossing the frame and a disc moving down it, on a dark background.'''
+    h, w, c = shape
+    frames = np.full((count,) + shape, 16, dtype=np.uint8)
+    size = max(min(h, w) // 4, 1)
+    ys, xs = np.ogrid[:h, :w]
+    colors = rng.randint(64, 256, size=(2, c), dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        x = (w - size) * i // max(count - 1, 1)
+        frame[(h - size) // 2:(h + size) // 2, x:x + size] = colors[0]
+
+        cy = size // 2 + (h - size) * i // max(count - 1, 1)
+        disc = (ys - cy) ** 2 + (xs - w // 2) ** 2 <= (size // 2) ** 2
+        frame[disc] = colors[1]
+    return frames
+
+
+# frame pool generators, called as fn(shape, count, rng)
+PATTERNS = {
+    'noise': noise,
+    'gradient': gradient,
+    'shapes': shapes,
+}
+
+
+class CameraSynthetic(Input):
+    '''
+    Generates frames, for testing and load generation without a device.
+    Frames are cycled from a pool generated on open, so generating them costs no more than a copy.
+
+    Args:
+        id: unused.
+        config (dict): Configuration dictionary. Accepted keywords:
+            res (tuple): frame size in the format (width, height).
+            pixel_format (str): one of PIXEL_FORMATS. Gray frames are 2d.
+            channels (int): channel count, picks a pixel format if pixel_format is not set.
+            fps (float): frame rate reads are throttled to.
+            throttle (bool): whether reads wait for the next frame time.
+                Unthrottled reads return at once, so a Stream with event_driven set reads as fast as it can.
+            pattern (str): 'noise', 'gradient' or 'shapes'.
+            pool_size (int): number of distinct frames generated.
+            encode_metadata (bool): bake the read timestamp and sequence number into the first row,
+                in CameraPylon's layout (see camera_pylon.extract_baked_data).
+            seed (int): seed of the random patterns.
+            roi/binning: see Input. Only the region of interest is copied out of the pool.
+    '''
+
+    def __init__(self, id=0, config={}):
+        defaults = {
+            'res': (1280, 720),
+            'pixel_format': None,
+            'channels': None,
+            'fps': 30,
+            'throttle': True,
+            'pattern': 'gradient',
+            'pool_size': 60,
+            'encode_metadata': True,
+            'seed': 0,
+            'format': 'rawvideo',
+        }
+        Input.__init__(self, id=id, config=config, defaults=defaults)
+
+        pixel_format = self.config.get('pixel_format')
+        channels = self.config.get('channels')
+        if pixel_format is None:
+            pixel_format = {1: 'gray', 3: 'rgb24', 4: 'rgba'}.get(channels or 3)
+            if pixel_format is None:
+                raise ValueError(f'{str(self)} has no pixel format with {channels} channels.')
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f'Pixel format {pixel_format} not supported. Supported formats: {tuple(PIXEL_FORMATS)}')
+        if channels is not None and channels != PIXEL_FORMATS[pixel_format]:
+            raise ValueError(f'Pixel format {pixel_format} does not have {channels} channels.')
+        self.config['pixel_format'] = pixel_format
+        self.config['channels'] = PIXEL_FORMATS[pixel_format]
+
+        if self.config.get('pattern') not in PATTERNS:
+            raise ValueError(f'Pattern {self.config.get("pattern")} not supported. Supported patterns: {tuple(PATTERNS)}')
+        if self.config.get('encode_metadata') and self.frame_shape()[1] < METADATA_SIZE:
+            raise ValueError(f'{str(self)} frames must be at least {METADATA_SIZE} pixels wide to encode metadata.')
+
+        self.frames = None
+        self.read_count = 0
+        self.start = None
+
+    def open(self):
+        '''Generates the frame pool.'''
+        w, h = self.config.get('res')[:2]
+        shape = (h, w, self.config.get('channels'))
+        pattern = PATTERNS[self.config.get('pattern')]
+        rng = np.random.RandomState(self.config.get('seed'))
+        self.frames = pattern(shape, self.config.get('pool_size'), rng).reshape((-1,) + self.source_shape())
+        self.input = self.frames
+        self.read_count = 0
+        self.start = None
+
+    def blocks_on_read(self):
+        '''Throttled reads wait for the next frame time, unthrottled reads need no pacing.'''
+        return True
+
+    def wait(self):
+        '''Waits until frame read_count is due.'''
+        if not self.config.get('throttle') or not self.config.get('fps'):
+            return
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+        due = self.start + self.read_count / self.config.get('fps')
+        if due > now:
+            time.sleep(due - now)
+
+    def read(self):
+        frame = np.empty(self.frame_shape(), dtype=np.uint8)
+        return self.read_into(frame)
+
+    def read_into(self, out):
+        if self.frames is None:
+            return None, None
+
+        self.wait()
+        np.copyto(out, self.crop(self.frames[self.read_count % len(self.frames)]).reshape(out.shape))
+        timestamp = time.time()
+        if self.config.get('encode_metadata'):
+            encode_metadata(out.reshape(self.frame_shape()), timestamp, self.read_count)
+        self.read_count += 1
+        return out, timestamp
+
+    def source_shape(self):
+        '''Shape of the generated frames.'''
+        w, h = self.config.get('res')[:2]
+        channels = self.config.get('channels')
+        return (h, w) if channels == 1 else (h, w, channels)
+
+    def frame_shape(self):
+        return self.cropped_shape(self.source_shape())
+
+    def close(self):
+        self.frames = None
+        self.input = None
+        self.read_count = 0
@@ -1,6 +1,7 @@
 import time
 import random
 import logging
+import threading
 import numpy as np
 try:
     from pyueye import ueye
@@ -29,6 +30,15 @@ class CameraUeye(Input):
 
             focus for 10 inches is ~780
             focus for 20 inches is ~900
+
+            buffers (int): number of image memories the camera captures into, in sequence.
+                If the reader falls behind and every memory is locked, the camera drops frames.
+            zero_copy (bool): read() returns views into the image memories instead of copies.
+                A memory then stays locked until every reference to its frame is released
+                (see Input.retain/release), so callers must release each frame they read.
+                None (the default) copies, unless read by a Stream's Reader, which releases its frames.
+            timeout (int): milliseconds a read waits for the next frame.
+            roi/binning: see Input. Set on the camera as its AOI and binning.
     '''
 
     def __init__(self, id=0, config={}):
@@ -43,10 +53,40 @@ class CameraUeye(Input):
             'format': 'rawvideo',
             'focus_min': None,
             'focus_max': None,
+            'buffers': 8,
+            'timeout': 1000,
+            'zero_copy': None,
         }
         Input.__init__(self, id=id, config=config, defaults=defaults)
 
         self.input = ueye.HIDS(self.id)
+        # image memories as (mem_image, mem_id)
+        self.memories = []
+        # locked memories by frame address: [references, mem_image, mem_id]
+        self.locked = {}
+        self.lock = threading.Lock()
+        self.is_open = False
+
+    def initialize_roi(self):
+        '''Sets the camera's binning and AOI from config roi/binning. AOI values are in binned pixels.'''
+        binning = self.config.get('binning') or 1
+        if binning > 1:
+            mode = getattr(ueye, f'IS_BINNING_{binning}X_VERTICAL') | getattr(ueye, f'IS_BINNING_{binning}X_HORIZONTAL')
+            nRet = ueye.is_SetBinning(self.input, mode)
+            if nRet != ueye.IS_SUCCESS:
+                log.error("is_SetBinning ERROR")
+
+        roi = self.config.get('roi')
+        if roi is not None:
+            x, y, w, h = (value // binning for value in roi)
+            rectAOI = ueye.IS_RECT()
+            rectAOI.s32X = ueye.int(x)
+            rectAOI.s32Y = ueye.int(y)
+            rectAOI.s32Width = ueye.int(w)
+            rectAOI.s32Height = ueye.int(h)
+            nRet = ueye.is_AOI(self.input, ueye.IS_AOI_IMAGE_SET_AOI, rectAOI, ueye.sizeof(rectAOI))
+            if nRet != ueye.IS_SUCCESS:
+                log.error("is_AOI ERROR")
 
     def initialize_dimensions(self):
         '''
@@ -97,26 +137,29 @@ class CameraUeye(Input):
 
     def initialize_memory(self):
         '''
-        Allocates image memory.
+        Allocates config['buffers'] image memories and adds them to the capture sequence.
         Sets:
+            self.memories
             self.mem_id
             self.mem_image
         '''
-        mem_id = ueye.int()
-        mem_image = ueye.c_mem_p()
-        nRet = ueye.is_AllocImageMem(self.input, self.width, self.height, self.bits_per_pixel, mem_image, mem_id)
-        if nRet != ueye.IS_SUCCESS:
-            log.error("is_AllocImageMem ERROR")
-        else:
-            # Makes the specified image memory the active memory
-            nRet = ueye.is_SetImageMem(self.input, mem_image, mem_id)
+        self.memories = []
+        for i in range(self.config.get('buffers')):
+            mem_id = ueye.int()
+            mem_image = ueye.c_mem_p()
+            nRet = ueye.is_AllocImageMem(self.input, self.width, self.height, self.bits_per_pixel, mem_image, mem_id)
             if nRet != ueye.IS_SUCCESS:
-                log.error("is_SetImageMem ERROR")
-            else:
-                # Set the desired color mode
-                nRet = ueye.is_SetColorMode(self.input, self.m_nColorMode)
-        self.mem_id = mem_id
-        self.mem_image = mem_image
+                log.error("is_AllocImageMem ERROR")
+                continue
+            self.memories.append((mem_image, mem_id))
+            nRet = ueye.is_AddToSequence(self.input, mem_image, mem_id)
+            if nRet != ueye.IS_SUCCESS:
+                log.error("is_AddToSequence ERROR")
+
+        # Set the desired color mode
+        nRet = ueye.is_SetColorMode(self.input, self.m_nColorMode)
+        if self.memories:
+            self.mem_image, self.mem_id = self.memories[0]
 
     def initialize_modes(self):
         '''
@@ -131,6 +174,11 @@ class CameraUeye(Input):
             log.error("is_CaptureVideo ERROR")
 
         # Enables the queue mode for existing image memory sequences
+        nRet = ueye.is_InitImageQueue(self.input, 0)
+        if nRet != ueye.IS_SUCCESS:
+            log.error("is_InitImageQueue ERROR")
+
+        # every memory of the sequence has the same layout
         self.pitch = ueye.INT()
         nRet = ueye.is_InquireImageMem(self.input, self.mem_image, self.mem_id, self.width, self.height, self.bits_per_pixel, self.pitch)
         if nRet != ueye.IS_SUCCESS:
@@ -197,16 +245,89 @@ class CameraUeye(Input):
         if(ueye.is_InitCamera(self.input, None) != ueye.IS_SUCCESS):
             log.error("is_InitCamera ERROR")
         self.initialize_color_mode()
+        self.initialize_roi()
         self.initialize_dimensions()
         self.initialize_memory()
         self.initialize_modes()
         self.initialize_camera_settings()
+        self.is_open = True
+
+    def blocks_on_read(self):
+        '''is_WaitForNextImage waits for the next captured frame.'''
+        return True
+
+    def wait_for_image(self):
+        '''
+        Waits for the next image memory of the queue, which is locked until unlocked with is_UnlockSeqBuf.
+        Returns (frame, mem_image, mem_id), frame being a view into the memory, or (None, None, None).
+        '''
+        mem_image = ueye.c_mem_p()
+        mem_id = ueye.int()
+        nRet = ueye.is_WaitForNextImage(self.input, self.config.get('timeout'), mem_image, mem_id)
+        if nRet != ueye.IS_SUCCESS:
+            log.debug(f'{str(self)} is_WaitForNextImage returned {nRet}')
+            return None, None, None
+
+        array = ueye.get_data(mem_image, self.width, self.height, self.bits_per_pixel, self.pitch, copy=False)
+        frame = np.reshape(array, self.frame_shape())
+        return frame, mem_image, mem_id
 
     def read(self):
-        array = ueye.get_data(self.mem_image, self.width, self.height, self.bits_per_pixel, self.pitch, copy=False)
-        frame = np.reshape(array, (self.height.value, self.width.value, self.bytes_per_pixel))
-        return frame, time.time()
+        '''
+        Returns a copy of the next frame.
+        With zero_copy, returns a view into its memory instead, which is handed back to the camera once the frame is released.
+        '''
+        if not self.config.get('zero_copy'):
+            return self.read_into(np.empty(self.frame_shape(), dtype=np.uint8))
+
+        frame, mem_image, mem_id = self.wait_for_image()
+        timestamp = time.time()
+        if frame is not None:
+            with self.lock:
+                self.locked[frame.ctypes.data] = [1, mem_image, mem_id]
+        return frame, timestamp
+
+    def read_into(self, out):
+        '''Copies the next frame into 'out', handing its memory back to the camera straight away.'''
+        frame, mem_image, mem_id = self.wait_for_image()
+        timestamp = time.time()
+        if frame is None:
+            return None, timestamp
+        try:
+            np.copyto(out, frame.reshape(out.shape))
+        finally:
+            ueye.is_UnlockSeqBuf(self.input, mem_id, mem_image)
+        return out, timestamp
+
+    def retain(self, frame):
+        with self.lock:
+            entry = self.locked.get(frame.ctypes.data)
+            if entry is not None:
+                entry[0] += 1
+
+    def release(self, frame):
+        with self.lock:
+            entry = self.locked.get(frame.ctypes.data)
+            if entry is None:
+                return
+            entry[0] -= 1
+            if entry[0] > 0:
+                return
+            del self.locked[frame.ctypes.data]
+        ueye.is_UnlockSeqBuf(self.input, entry[2], entry[1])
+
+    def frame_shape(self):
+        return (self.height.value, self.width.value, self.bytes_per_pixel)
 
     def close(self):
-        ueye.is_FreeImageMem(self.input, self.mem_image, self.mem_id)
+        if not self.is_open:
+            return
+        self.is_open = False
+        with self.lock:
+            self.locked = {}
+        ueye.is_ExitImageQueue(self.input)
+        ueye.is_ClearSequence(self.input)
+        for mem_image, mem_id in self.memories:
+            ueye.is_FreeImageMem(self.input, mem_image, mem_id)
+        self.memories = []
         ueye.is_ExitCamera(self.input)
@@ -1,11 +1,72 @@
 import cv2
 import time
 import logging
+import threading
+import numpy as np
 
-from . input import Input
+from . input import Input, BufferRing
+from .. loop_thread import LoopThread
 
 log = logging.getLogger(__name__)
 
+PIXEL_FORMATS = ('rgb24', 'bgr24')
+
+
+class Grabber(LoopThread):
+    '''
+    Continuously grabs frames from a VideoCapture, so reads only retrieve (decode) the newest frame.
+    Frames that are grabbed but never retrieved are counted as skipped.
+    '''
+
+    def __init__(self, capture):
+        self.capture = capture
+        self.condition = threading.Condition()
+
+        # number of frames grabbed, and the number of the last frame retrieved
+        self.grabbed = 0
+        self.retrieved = 0
+        self.skipped = 0
+        self.waiting = 0
+        self.ended = False
+
+        LoopThread.__init__(self, frequency=0)
+
+    def loop(self):
+        with self.condition:
+            ok = self.capture.grab()
+            if ok:
+                self.grabbed += 1
+            self.ended = not ok
+            self.condition.notify_all()
+
+            if ok and self.waiting:
+                # let the waiting read retrieve this frame before it is grabbed over
+                self.condition.wait_for(lambda: self.retrieved == self.grabbed, timeout=self.wait_timeout)
+
+        if not ok:
+            time.sleep(self.wait_timeout)
+
+    def retrieve(self, out=None, timeout=1):
+        '''
+        Waits up to 'timeout' seconds for a frame newer than the last one retrieved, and retrieves it.
+        Returns (ret, frame) like VideoCapture.read.
+        '''
+        with self.condition:
+            self.waiting += 1
+            try:
+                if not self.condition.wait_for(lambda: self.grabbed > self.retrieved or self.ended, timeout=timeout):
+                    return False, None
+                if self.grabbed == self.retrieved:
+                    return False, None
+
+                self.skipped += self.grabbed - self.retrieved - 1
+                self.retrieved = self.grabbed
+                ret = self.capture.retrieve(out)
+                self.condition.notify_all()
+                return ret
+            finally:
+                self.waiting -= 1
+
 
 class CameraUsb(Input):
     '''
@@ -17,6 +78,15 @@ class CameraUsb(Input):
             res (tuple): frame size
             codec (str)
             fps (int)
+            pixel_format (str): 'rgb24' or 'bgr24'. OpenCV captures bgr24, rgb24 frames are converted in place.
+                Outputs encode bgr24 directly, so 'bgr24' skips the conversion altogether.
+            reuse_buffer (bool): capture frames into a few recycled buffers (see BufferRing).
+                A buffer is captured into again only once its frame is released (see Input.release),
+                so frames held by a Stream's queues are never overwritten.
+            latest_frame (bool): grab frames continuously in a background thread, so reads always return
+                the newest frame instead of a stale one from OpenCV's buffer. Frames never read are counted in 'skipped'.
+            roi/binning: see Input. Frames are returned as views of the captured frame.
+                res stays the capture size, frame_shape and output_config give the cropped size.
     '''
 
     def __init__(self, id=0, config={}):
@@ -26,9 +96,19 @@ class CameraUsb(Input):
             'use_dshow': 0,
             'channels': 3,
             'format': 'rawvideo',
+            'pixel_format': 'rgb24',
+            'reuse_buffer': False,
+            'latest_frame': False,
         }
         Input.__init__(self, id=id, config=config, defaults=defaults)
 
+        if self.config.get('pixel_format') not in PIXEL_FORMATS:
+            raise ValueError(f'Pixel format {self.config.get("pixel_format")} not supported. Supported formats: {PIXEL_FORMATS}')
+        self.buffers = None
+        # full size frame that cropped frames are captured into by read_into
+        self.capture_buffer = None
+        self.grabber = None
+
     def configure(self):
         '''
         Configures the camera using a config.
@@ -66,29 +146,106 @@ class CameraUsb(Input):
         else:
             self.configure()
 
+        self.buffers = None
+        if self.config.get('reuse_buffer'):
+            self.buffers = BufferRing(Input.frame_shape(self))
+        self.capture_buffer = None
+        if self.cropping():
+            self.capture_buffer = np.empty(Input.frame_shape(self), dtype=np.uint8)
+
         # the first read is usually delayed on linux/windows by ~0.4 seconds
         # prime the opencv object for delayless reads
-        self.input.read()
+        self.input.read(self.capture_buffer)
+
+        if self.config.get('latest_frame'):
+            self.grabber = Grabber(self.input)
+            self.grabber.start()
+
+    @property
+    def skipped(self):
+        '''Frames grabbed from the device but never read, in latest_frame mode.'''
+        return self.grabber.skipped if self.grabber else 0
+
+    def capture(self, out=None):
+        '''Captures the next frame, or the newest grabbed frame in latest_frame mode.'''
+        if self.grabber:
+            return self.grabber.retrieve(out)
+        return self.input.read(out)
+
+    def blocks_on_read(self):
+        '''Cameras block until the next frame is captured, video files decode as fast as they are read.'''
+        return self.grabber is not None or not isinstance(self.id, str)
+
+    def file_backed(self):
+        return isinstance(self.id, str)
+
+    def frame_shape(self):
+        return self.cropped_shape(Input.frame_shape(self))
 
     def read(self):
         '''
         Reads in frames.
-        Converts frames from BGR to the more commonly used RGB format.
+        Converts frames from BGR to the more commonly used RGB format, unless pixel_format is bgr24.
+        '''
+        frame = None
+        buffer = self.buffers.acquire() if self.buffers else None
+
+        try:
+            ret, frame = self.capture(buffer)
+            if not ret:
+                raise Exception(f'Opencv VideoCapture ret error: {ret}')
+            frame = self.crop(self.convert(frame))
+        except Exception as e:
+            log.error(f'{str(self)} read error: {e}')
+            frame = None
+
+        if buffer is not None and (frame is None or not np.shares_memory(frame, buffer)):
+            # nothing was captured into the buffer, hand it back
+            self.buffers.release(buffer)
+        return frame, time.time()
+
+    def retain(self, frame):
+        if self.buffers:
+            self.buffers.retain(frame)
+
+    def release(self, frame):
+        if self.buffers:
+            self.buffers.release(frame)
+
+    def read_into(self, out):
+        '''
+        Reads a frame straight into 'out'.
+        Any color conversion is done in place.
+        Cropped frames are captured into a full size buffer, and only the region of interest is copied.
         '''
         frame = None
 
         try:
-            ret, frame = self.input.read()
+            target = out if self.capture_buffer is None else self.capture_buffer
+            ret, frame = self.capture(target)
             if not ret:
                 raise Exception(f'Opencv VideoCapture ret error: {ret}')
-            # bgr to rgb
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if frame is not target or target is not out:
+                # opencv reallocates when the frame does not match 'out'
+                np.copyto(out, self.crop(frame))
+            frame = self.convert(out)
         except Exception as e:
             log.error(f'{str(self)} read error: {e}')
+            frame = None
 
         return frame, time.time()
 
+    def convert(self, frame):
+        '''Converts a captured bgr24 frame to config['pixel_format'] in place.'''
+        if self.config.get('pixel_format') == 'rgb24':
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+        return frame
+
     def close(self):
+        if self.grabber:
+            self.grabber.stop()
+            log.info(f'{str(self)} skipped {self.grabber.skipped} frames.')
+        self.grabber = None
         if self.input:
             self.input.release()
         self.input = None
@@ -1,11 +1,92 @@
 import logging
 import atexit
+import threading
+import numpy as np
 
 log = logging.getLogger(__name__)
 
 
+def readinto_exact(f, buffer):
+    '''
+    Reads from file object 'f' into 'buffer' until it is full, resuming after short reads.
+    Returns the number of bytes read, which is less than the buffer size only at the end of the stream.
+    '''
+    view = memoryview(buffer).cast('B')
+    size = len(view)
+    total = f.readinto(view) or 0
+    while 0 < total < size:
+        n = f.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+
+class BufferRing:
+    '''
+    Frame buffers that are reused once every reference to them is released (see Input.retain/release).
+    acquire() hands out a free buffer with one reference. Once all 'capacity' buffers are referenced,
+    it returns a new array that is not tracked, so a referenced buffer is never read into again
+    and callers that never release frames only cost an allocation per read.
+
+    Args:
+        shape (tuple): numpy shape of a frame.
+        capacity (int): most buffers reused.
+    '''
+
+    def __init__(self, shape, capacity=4, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.capacity = capacity
+        self.dtype = dtype
+        self.buffers = []
+        self.refs = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            for i, refs in enumerate(self.refs):
+                if refs == 0:
+                    self.refs[i] = 1
+                    return self.buffers[i]
+            buffer = np.empty(self.shape, dtype=self.dtype)
+            if len(self.buffers) < self.capacity:
+                self.buffers.append(buffer)
+                self.refs.append(1)
+            return buffer
+
+    def find(self, frame):
+        '''Index of the buffer 'frame' is (or is a view of), None if it is not one of the buffers.'''
+        if not isinstance(frame, np.ndarray):
+            return None
+        owner = frame if frame.base is None else frame.base
+        for i, buffer in enumerate(self.buffers):
+            if buffer is owner:
+                return i
+        return None
+
+    def retain(self, frame):
+        with self.lock:
+            i = self.find(frame)
+            if i is not None:
+                self.refs[i] += 1
+
+    def release(self, frame):
+        with self.lock:
+            i = self.find(frame)
+            if i is not None and self.refs[i] > 0:
+                self.refs[i] -= 1
+
+
 class Input:
-    '''General interface for cameras/other frame sources.'''
+    '''
+    General interface for cameras/other frame sources.
+
+    Inputs that support it honor these config keywords:
+        roi (tuple): region of interest (x, y, width, height), in pixels of the full frame.
+        binning (int): reduces the region of interest by this factor in both dimensions.
+    Cameras set them in hardware, ffmpeg inputs crop and scale with filters,
+    and other inputs return numpy views (binning then keeps every nth pixel).
+    '''
 
     def __init__(self, id=0, config={}, defaults={}):
         self.id = id
@@ -21,6 +102,93 @@ class Input:
         log.debug(f'Read not implemented for {str(self)}')
         return None, None
 
+    def blocks_on_read(self):
+        '''
+        Whether read() waits for the next frame from the device.
+        Inputs that do not block (eg: files) need to be paced by the caller.
+        '''
+        return False
+
+    def file_backed(self):
+        '''Whether frames are read from a file, which can be read ahead (see PrefetchInput).'''
+        return False
+
+    def read_into(self, out):
+        '''
+        Reads a frame into the preallocated array 'out'.
+        Returns (out, timestamp), or (None, timestamp) if no frame was read.
+
+        Inputs that can decode in place should override this.
+        By default, the frame returned by read() is copied into 'out'.
+        '''
+        frame, timestamp = self.read()
+        if frame is None:
+            return None, timestamp
+
+        try:
+            np.copyto(out, np.reshape(frame, out.shape))
+        except ValueError as e:
+            log.error(f'{str(self)} frame of shape {np.shape(frame)} does not fit into {out.shape}: {e}')
+            return None, timestamp
+        finally:
+            self.release(frame)
+        return out, timestamp
+
+    def retain(self, frame):
+        '''
+        Takes another reference to a frame returned by read().
+        Inputs whose frames are views into device buffers override retain/release,
+        and hand a buffer back to the device once every reference to its frame is released.
+        By default frames belong to the caller, and this does nothing.
+        '''
+
+    def release(self, frame):
+        '''Drops a reference to a frame returned by read(), see retain.'''
+
+    def frame_shape(self):
+        '''
+        Numpy shape of the frames this input produces.
+        Derived from config['res'], which is in the format (width, height[, channels]).
+        '''
+        res = tuple(self.config.get('res'))
+        return (res[1], res[0]) + res[2:]
+
+    def cropping(self):
+        '''Whether roi or binning is configured.'''
+        return self.config.get('roi') is not None or (self.config.get('binning') or 1) > 1
+
+    def roi_slices(self, shape):
+        '''Returns the (row, column) slices selecting config roi and binning from frames of 'shape'.'''
+        height, width = shape[:2]
+        x, y, w, h = self.config.get('roi') or (0, 0, width, height)
+        binning = self.config.get('binning') or 1
+        x = min(max(x, 0), width)
+        y = min(max(y, 0), height)
+        return slice(y, min(y + h, height), binning), slice(x, min(x + w, width), binning)
+
+    def cropped_shape(self, shape):
+        '''Shape of frames of 'shape' once config roi and binning are applied.'''
+        if not self.cropping():
+            return tuple(shape)
+        rows, columns = self.roi_slices(shape)
+        return (len(range(*rows.indices(shape[0]))), len(range(*columns.indices(shape[1])))) + tuple(shape[2:])
+
+    def crop(self, frame):
+        '''Returns a view of 'frame' with config roi and binning applied.'''
+        if frame is None or not self.cropping():
+            return frame
+        return frame[self.roi_slices(frame.shape)]
+
+    def output_config(self):
+        '''
+        Config handed to outputs.
+        If the frames are cropped, res is set to their size, in the format (width, height[, channels]).
+        '''
+        if not self.cropping():
+            return self.config
+        shape = self.frame_shape()
+        return {**self.config, 'res': (shape[1], shape[0]) + tuple(shape[2:])}
+
     def close(self):
         '''Properly disposes of the camera object.'''
         log.warning(f'Close not implemented for {str(self)}.')
@@ -5,6 +5,9 @@ from . camera_pylon import CameraPylon
 from . camera_raw_video import CameraRawVideo
 from . camera_ueye import CameraUeye
 from . camera_ffmpeg import CameraFfmpeg
+from . camera_ffmpeg_video import CameraFfmpegVideo
+from . camera_synthetic import CameraSynthetic
+from . prefetch import PrefetchInput
 
 log = logging.getLogger(__name__)
 
@@ -12,17 +15,34 @@ log = logging.getLogger(__name__)
 def create_input(type='usb', *args, **kwargs):
     '''
     Factory method for creating media input.
-    Supports types: 'ffmpeg', 'pylon', 'raw_video', 'ueye', 'video', and 'usb'
+    Supports types: 'ffmpeg', 'ffmpeg_video', 'pylon', 'raw_video', 'synthetic', 'ueye', 'video', and 'usb'
+
+    File-backed inputs (ffmpeg_video, raw_video, and video/usb with a path as id) are read ahead in a background thread
+    if their config sets:
+        prefetch (int): most frames read ahead.
+        prefetch_bytes (int): most bytes read ahead.
     '''
+    input = None
     if type == 'ffmpeg':
-        return CameraFfmpeg(*args, **kwargs)
-    if type == 'pylon':
-        return CameraPylon(*args, **kwargs)
-    if type == 'raw_video':
-        return CameraRawVideo(*args, **kwargs)
-    if type == 'ueye':
-        return CameraUeye(*args, **kwargs)
-    if type == 'usb' or type == 'video':
-        return CameraUsb(*args, **kwargs)
+        input = CameraFfmpeg(*args, **kwargs)
+    elif type == 'ffmpeg_video':
+        input = CameraFfmpegVideo(*args, **kwargs)
+    elif type == 'pylon':
+        input = CameraPylon(*args, **kwargs)
+    elif type == 'raw_video':
+        input = CameraRawVideo(*args, **kwargs)
+    elif type == 'synthetic':
+        input = CameraSynthetic(*args, **kwargs)
+    elif type == 'ueye':
+        input = CameraUeye(*args, **kwargs)
+    elif type == 'usb' or type == 'video':
+        input = CameraUsb(*args, **kwargs)
+    else:
+        log.warning(f'Input type: {type} not supported.')
+        return None
 
-    log.warning(f'Input type: {type} not supported.')
+    if input.config.get('prefetch'):
+        if input.file_backed():
+            return PrefetchInput(input, depth=input.config.get('prefetch'), max_bytes=input.config.get('prefetch_bytes'))
+        log.warning(f'{str(input)} is not file-backed, prefetch is ignored.')
+    return input
@@ -0,0 +1,168 @@
+import time
+import logging
+import threading
+from collections import deque
+import numpy as np
+
+from . input import Input
+from .. loop_thread import LoopThread
+
+log = logging.getLogger(__name__)
+
+
+class Prefetcher(LoopThread):
+    '''
+    Reads frames of an input ahead, into a bounded buffer.
+    The buffer holds at most 'depth' frames and, if set, 'max_bytes' bytes (but always at least one frame).
+    Frames are read into new arrays with read_into, so buffered frames are never overwritten by the input.
+    get() counts a hit when a frame was already buffered, and a miss when it had to wait for one.
+    '''
+
+    def __init__(self, input, depth=8, max_bytes=None):
+        self.input = input
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.shape = input.frame_shape()
+
+        self.frames = deque()
+        self.bytes = 0
+        self.ended = False
+        self.condition = threading.Condition()
+        # serializes input access between the prefetch thread and seek
+        self.lock = threading.Lock()
+        # bumped on seek, so a frame read before a seek is never buffered after it
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        LoopThread.__init__(self, frequency=0)
+
+    def has_room(self):
+        if not self.frames:
+            return True
+        if len(self.frames) >= self.depth:
+            return False
+        return self.max_bytes is None or self.bytes + self.frames[0].nbytes <= self.max_bytes
+
+    def loop(self):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.has_room() and not self.ended, timeout=self.wait_timeout):
+                return
+            generation = self.generation
+
+        with self.lock:
+            if generation != self.generation:
+                return
+            frame, timestamp = self.input.read_into(np.empty(self.shape, dtype=np.uint8))
+
+        with self.condition:
+            if generation != self.generation:
+                return
+            if frame is None:
+                self.ended = True
+            else:
+                self.frames.append(frame)
+                self.bytes += frame.nbytes
+            self.condition.notify_all()
+
+    def get(self, timeout=1):
+        '''Returns the next frame, waiting up to 'timeout' seconds for it. Returns None at the end of the input.'''
+        with self.condition:
+            if self.frames:
+                self.hits += 1
+            elif not self.ended:
+                self.misses += 1
+                self.condition.wait_for(lambda: self.frames or self.ended, timeout=timeout)
+            if not self.frames:
+                return None
+
+            frame = self.frames.popleft()
+            self.bytes -= frame.nbytes
+            self.condition.notify_all()
+            return frame
+
+    def seek(self, index):
+        '''Seeks the input to frame 'index', discarding every buffered frame.'''
+        with self.lock:
+            self.input.seek(index)
+            with self.condition:
+                self.generation += 1
+                self.frames.clear()
+                self.bytes = 0
+                self.ended = False
+                self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            return {
+                **LoopThread.stats(self),
+                'hits': self.hits,
+                'misses': self.misses,
+                'buffered': len(self.frames),
+                'buffered_bytes': self.bytes,
+            }
+
+
+class PrefetchInput(Input):
+    '''
+    Wraps a file-backed input, reading its frames ahead in a background thread.
+    Disk and decode latency is then absorbed by the buffer instead of delaying reads.
+    Created by create_input when an input's config sets 'prefetch'.
+
+    Args:
+        input (Input): the input to read ahead. Its config is shared with this input.
+        depth (int): most frames read ahead.
+        max_bytes (int): most bytes read ahead, None for no limit.
+        timeout (float): seconds a read waits for a frame that is not buffered yet.
+    '''
+
+    def __init__(self, input, depth=8, max_bytes=None, timeout=1):
+        Input.__init__(self, id=input.id)
+        self.source = input
+        self.config = input.config
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.prefetcher = None
+
+    def open(self):
+        self.source.open()
+        self.input = self.source
+        self.prefetcher = Prefetcher(self.source, depth=self.depth, max_bytes=self.max_bytes)
+        self.prefetcher.start()
+
+    def blocks_on_read(self):
+        return self.source.blocks_on_read()
+
+    def read(self):
+        return self.prefetcher.get(timeout=self.timeout), time.time()
+
+    def read_into(self, out):
+        frame = self.prefetcher.get(timeout=self.timeout)
+        if frame is None:
+            return None, time.time()
+        np.copyto(out, frame.reshape(out.shape))
+        return out, time.time()
+
+    def seek(self, index):
+        '''Seeks the wrapped input, for inputs that support it (eg: CameraRawVideo).'''
+        self.prefetcher.seek(index)
+
+    def stats(self):
+        '''Prefetch hits/misses and the size of the read ahead buffer.'''
+        return self.prefetcher.stats() if self.prefetcher else {}
+
+    def frame_shape(self):
+        return self.source.frame_shape()
+
+    def close(self):
+        if self.prefetcher:
+            self.prefetcher.stop()
+            log.info(f'{str(self)} prefetch hits: {self.prefetcher.hits}, misses: {self.prefetcher.misses}')
+        self.prefetcher = None
+        self.source.close()
+        self.input = None
+
+    def __str__(self):
+        return f'{self.__class__.__name__}:{str(self.source)}'
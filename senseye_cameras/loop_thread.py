@@ -1,17 +1,40 @@
+import math
 import threading
 import time
 from logging import getLogger
 
 log = getLogger(__name__)
 
+# How a paced loop is scheduled:
+#   catch_up - fixed rate. Missed iterations are run back-to-back until the loop is back on schedule.
+#   skip - fixed rate. Missed iterations are skipped, the loop resumes at the next tick.
+#   fixed_delay - each iteration starts one period after the previous one finished.
+PACING_MODES = ('catch_up', 'skip', 'fixed_delay')
+
 
 class LoopThread(threading.Thread):
     '''
     Class to follow common pattern of looping thread
+
+    With a frequency of 0, loop() is called back-to-back without sleeping.
+    In that mode loop() is expected to block until there is work (eg: on a device read or a queue),
+    waiting at most wait_timeout seconds so the thread notices when it should stop.
+
+    Paced loops are scheduled on the monotonic clock according to 'pacing', see PACING_MODES.
+    Setting start_at (a time.monotonic() value) before starting the thread delays the first loop until then,
+    so several threads can be run on a common schedule.
+    stats() reports how well the loop keeps up with its frequency.
     '''
-    def __init__(self, frequency=1000, stop_on_error=False):
+    # longest time a blocking loop should wait before returning
+    wait_timeout = 0.1
+
+    def __init__(self, frequency=1000, stop_on_error=False, pacing='catch_up'):
         super().__init__(daemon=True)
 
+        if pacing not in PACING_MODES:
+            raise ValueError(f'Pacing {pacing} not supported. Supported modes: {PACING_MODES}')
+        self.pacing = pacing
+
         # Flag to inidicate that the thread should stop
         self._should_finish = False
         self._did_finish = False
@@ -22,6 +45,9 @@ class LoopThread(threading.Thread):
         # delay between Loops
         self._frequency = frequency
         self._delay = 1 / frequency if frequency > 0 else 0
+        self.start_at = None
+
+        self.reset_stats()
 
     #######################
     ## Optional Methods
@@ -53,19 +79,31 @@ class LoopThread(threading.Thread):
         self._should_finish = False
         self._did_finish = False
 
-        start_time = time.time()
-        count = 0
+        self.reset_stats()
+        self._run_start = time.monotonic()
+        next_time = self._run_start + self._delay
+        if self.start_at is not None:
+            if self.start_at > self._run_start:
+                time.sleep(self.start_at - self._run_start)
+            self._run_start = time.monotonic()
+            next_time = self.start_at
 
         while not self._should_finish:
             try:
                 # calculate sleep time
-                count += 1
-                sleep_time = start_time + count * self._delay - time.time()
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                if self._delay:
+                    sleep_time = next_time - time.monotonic()
+                    if sleep_time > 0:
+                        time.sleep(sleep_time)
 
                 # call loop function
-                self.loop()
+                start = time.monotonic()
+                try:
+                    self.loop()
+                finally:
+                    end = time.monotonic()
+                    self.update_stats(start, end)
+                    next_time = self.schedule(next_time, end)
 
             except Exception as e:
                 log.exception(f'Uncaught Error in Looping Thread: {e}')
@@ -78,6 +116,72 @@ class LoopThread(threading.Thread):
 
         self._did_finish = True
 
+    def schedule(self, next_time, end):
+        '''Returns when the loop after the one scheduled at 'next_time', which ended at 'end', should start.'''
+        if self.pacing == 'fixed_delay':
+            return end + self._delay
+
+        next_time += self._delay
+        if self.pacing == 'skip' and self._delay and next_time < end:
+            missed = math.ceil((end - next_time) / self._delay)
+            next_time += missed * self._delay
+            self._skipped += missed
+        return next_time
+
+    def reset_stats(self):
+        '''Clears the loop statistics.'''
+        self._run_start = None
+        self._last_start = None
+        self._iterations = 0
+        self._busy = 0
+        self._overruns = 0
+        self._skipped = 0
+        # running mean/variance of the period between loops (Welford)
+        self._periods = 0
+        self._period_mean = 0
+        self._period_m2 = 0
+        self._max_jitter = 0
+
+    def update_stats(self, start, end):
+        '''Accounts for a loop that ran from 'start' to 'end' (monotonic seconds).'''
+        self._iterations += 1
+        self._busy += end - start
+        if self._delay and end - start > self._delay:
+            self._overruns += 1
+
+        if self._last_start is not None:
+            period = start - self._last_start
+            self._periods += 1
+            delta = period - self._period_mean
+            self._period_mean += delta / self._periods
+            self._period_m2 += delta * (period - self._period_mean)
+            if self._delay:
+                self._max_jitter = max(self._max_jitter, abs(period - self._delay))
+        self._last_start = start
+
+    def stats(self):
+        '''
+        Returns loop statistics since the thread started:
+            iterations: number of loops run.
+            period/period_jitter: mean and standard deviation of the time between loop starts, in seconds.
+            max_jitter: largest deviation of a period from 1 / frequency, in seconds.
+            overruns: loops that took longer than 1 / frequency.
+            skipped: ticks dropped by the 'skip' pacing mode.
+            busy_fraction: fraction of the time spent inside loop(). Blocking loops count their waits as busy.
+        '''
+        elapsed = time.monotonic() - self._run_start if self._run_start is not None else 0
+        return {
+            'frequency': self._frequency,
+            'pacing': self.pacing,
+            'iterations': self._iterations,
+            'period': self._period_mean,
+            'period_jitter': math.sqrt(self._period_m2 / self._periods) if self._periods else 0,
+            'max_jitter': self._max_jitter,
+            'overruns': self._overruns,
+            'skipped': self._skipped,
+            'busy_fraction': self._busy / elapsed if elapsed > 0 else 0,
+        }
+
     # called to Stop the thread
     def stop(self, join=True):
         self._should_finish = True
@@ -0,0 +1,183 @@
+import sys
+import time
+import logging
+import threading
+from collections import deque
+import numpy as np
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . output import writev
+from .. loop_thread import LoopThread
+
+log = logging.getLogger(__name__)
+
+# fcntl.F_SETPIPE_SZ/F_GETPIPE_SZ only exist from python 3.10, the values are linux's
+F_SETPIPE_SZ = getattr(fcntl, 'F_SETPIPE_SZ', 1031)
+F_GETPIPE_SZ = getattr(fcntl, 'F_GETPIPE_SZ', 1032)
+PIPE_MAX_SIZE = '/proc/sys/fs/pipe-max-size'
+
+
+def set_pipe_size(fd, size):
+    '''
+    Grows the pipe 'fd' to hold 'size' bytes, capped at the system's limit for unprivileged processes.
+    Returns the new size of the pipe, or None where pipe sizes can not be changed.
+    '''
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return None
+    try:
+        with open(PIPE_MAX_SIZE) as f:
+            size = min(size, int(f.read()))
+    except (OSError, ValueError):
+        pass
+    try:
+        if fcntl.fcntl(fd, F_GETPIPE_SZ) >= size:
+            return fcntl.fcntl(fd, F_GETPIPE_SZ)
+        return fcntl.fcntl(fd, F_SETPIPE_SZ, size)
+    except OSError as e:
+        log.warning(f'Failed to set pipe size to {size} bytes: {e}')
+        return None
+
+
+class Feeder(LoopThread):
+    '''
+    Feeds frames into a file descriptor (eg: an encoder's stdin) from its own thread.
+    put() copies a frame into one of a few preallocated buffers and returns, so the caller only waits
+    on the encoder once every buffer is full. Buffers are written out with vectored writes of memoryviews,
+    and the pipe is grown to hold a whole frame where possible.
+    A write error (eg: BrokenPipeError when the encoder exits) stops feeding, and is raised by the next put().
+
+    Args:
+        fd (int): file descriptor written to.
+        buffers (int): number of frame buffers, 2 or 3 is enough to absorb encoder stalls.
+        pipe_size (int): bytes to grow the pipe to. Defaults to the size of the first frame.
+    '''
+
+    def __init__(self, fd, buffers=3, pipe_size=None):
+        if buffers < 1:
+            raise ValueError(f'Feeder needs at least 1 buffer, got {buffers}.')
+        self.fd = fd
+        self.pipe_size = pipe_size
+
+        self.buffers = [None] * buffers
+        self.free = deque(range(buffers))
+        # (buffer index, byte count) waiting to be written
+        self.filled = deque()
+        self.writing_count = 0
+        self.condition = threading.Condition()
+        self.error = None
+
+        self.bytes_written = 0
+        self.frames_written = 0
+        # seconds the feeder spent in writes, and seconds put() waited for a free buffer
+        self.write_time = 0
+        self.blocked_time = 0
+        self.started = None
+
+        LoopThread.__init__(self, frequency=0)
+
+    def put(self, data):
+        '''Queues 'data' (a numpy array or a bytes-like object) to be written. Raises the feeder's write error, if any.'''
+        with self.condition:
+            if self.error is not None:
+                raise self.error
+            if not self.free:
+                start = time.monotonic()
+                self.condition.wait_for(lambda: self.free or self.error is not None)
+                self.blocked_time += time.monotonic() - start
+                if self.error is not None:
+                    raise self.error
+            index = self.free.popleft()
+
+        if self.started is None:
+            self.started = time.monotonic()
+            pipe_size = set_pipe_size(self.fd, self.pipe_size or self.nbytes(data))
+            log.debug(f'{str(self)} pipe size: {pipe_size}')
+
+        n = self.nbytes(data)
+        buffer = self.buffers[index]
+        if buffer is None or len(buffer) < n:
+            buffer = self.buffers[index] = np.empty(n, dtype=np.uint8)
+        if isinstance(data, np.ndarray):
+            # copies strided views (eg: cropped frames) without an intermediate contiguous copy
+            np.copyto(buffer[:n].view(data.dtype).reshape(data.shape), data)
+        else:
+            buffer[:n] = np.frombuffer(data, dtype=np.uint8)
+
+        with self.condition:
+            self.filled.append((index, n))
+            self.condition.notify_all()
+
+    @staticmethod
+    def nbytes(data):
+        if isinstance(data, np.ndarray):
+            return data.nbytes
+        return memoryview(data).nbytes
+
+    def loop(self):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.filled, timeout=self.wait_timeout):
+                return
+            batch = list(self.filled)
+            self.filled.clear()
+            self.writing_count = len(batch)
+
+        start = time.monotonic()
+        try:
+            writev(self.fd, [memoryview(self.buffers[index])[:n] for index, n in batch])
+        except OSError as e:
+            log.error(f'{str(self)} failed to write to the encoder: {e}')
+            with self.condition:
+                self.error = e
+        end = time.monotonic()
+
+        with self.condition:
+            if self.error is None:
+                self.write_time += end - start
+                self.bytes_written += sum(n for index, n in batch)
+                self.frames_written += len(batch)
+            else:
+                # nothing more will be written, release everything so put() does not wait on it
+                batch += self.filled
+                self.filled.clear()
+            self.free.extend(index for index, n in batch)
+            self.writing_count = 0
+            self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        '''Waits until every queued frame has been written, or writing failed. Returns whether it finished.'''
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: (not self.filled and not self.writing_count) or self.error is not None or not self.is_alive(),
+                timeout=timeout,
+            )
+
+    def close(self, timeout=None):
+        '''Writes out every queued frame and stops the thread. Does not close the file descriptor.'''
+        if not self.flush(timeout=timeout):
+            log.warning(f'{str(self)} timed out writing queued frames.')
+        self.stop()
+
+    def stats(self):
+        '''
+        Returns feeder counters:
+            bytes_per_second: bytes written per second since the first frame.
+            write_time: seconds spent writing to the encoder.
+            blocked_time: seconds put() waited for the encoder to free a buffer.
+        '''
+        with self.condition:
+            elapsed = time.monotonic() - self.started if self.started is not None else 0
+            return {
+                'frames_written': self.frames_written,
+                'bytes_written': self.bytes_written,
+                'bytes_per_second': self.bytes_written / elapsed if elapsed else 0,
+                'write_time': self.write_time,
+                'blocked_time': self.blocked_time,
+                'queued': len(self.filled) + self.writing_count,
+                'error': repr(self.error) if self.error is not None else None,
+            }
+
+    def __str__(self):
+        return f'{self.__class__.__name__}:{self.fd}'
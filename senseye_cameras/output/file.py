@@ -1,9 +1,11 @@
+import os
 import ffmpeg
 import logging
 import tempfile
 from pathlib import Path
 
-from . output import Output
+from . output import Output, writev, contiguous
+from . feeder import Feeder
 
 log = logging.getLogger(__name__)
 
@@ -22,6 +24,11 @@ class File(Output):
             codec (str)
             format (str): defaults to 'rawvideo'
             res (tuple)
+            feeder_buffers (int): frames buffered for the encoder, which is fed from its own thread (see Feeder).
+                0 writes to the encoder on the calling thread.
+            pipe_size (int): bytes to grow the encoder's stdin pipe to. Defaults to the size of a frame.
+
+    Writes that fail (eg: the encoder exited) raise once. Later writes are dropped and counted in stats().
     '''
 
     def __init__(self, path=None, **kwargs):
@@ -31,11 +38,16 @@ class File(Output):
             'pixel_format': 'rgb24',
             'output_pixel_format': 'rgb24',
             'file_codec': {},
-            'res': (1280, 720)
+            'res': (1280, 720),
+            'feeder_buffers': 3,
+            'pipe_size': None,
         }
         Output.__init__(self, defaults=defaults, **kwargs)
 
         self.process = None
+        self.feeder = None
+        self.error = None
+        self.frames_dropped = 0
 
         self.set_path(path=path)
         self.set_tmp_path(path=self.path)
@@ -88,6 +100,12 @@ class File(Output):
         log.info(f'Running command: {" ".join(self.process.args)}')
         self.output = self.process.stdin
 
+        if self.config.get('feeder_buffers') and hasattr(os, 'writev'):
+            self.feeder = Feeder(
+                self.output.fileno(), buffers=self.config.get('feeder_buffers'), pipe_size=self.config.get('pipe_size'),
+            )
+            self.feeder.start()
+
     def set_path(self, path=None):
         '''Setter for self.path.'''
         self.path = Path(path).absolute()
@@ -105,14 +123,57 @@ class File(Output):
 
         log.debug(f'{str(self)} tmp path set to {self.tmp_path}')
 
-    def write(self, data=None):
-        if data is not None and self.output:
-            try:
-                self.output.write(data)
-            except: pass
+    def failed(self, frames=1):
+        '''Returns whether an earlier write failed, counting 'frames' as dropped if so.'''
+        if self.error is None:
+            return False
+        self.frames_dropped += frames
+        return True
+
+    def fail(self, e):
+        '''Records the first write error and raises it.'''
+        self.error = e
+        log.error(f'{str(self)} failed to write to {self.tmp_path}, dropping later frames: {e}')
+        raise e
+
+    def write(self, data=None, timestamp=None):
+        if data is None or not self.output or self.failed():
+            return
+        try:
+            if self.feeder:
+                self.feeder.put(data)
+            else:
+                self.output.write(contiguous(data))
+        except (OSError, ValueError) as e:
+            self.fail(e)
+
+    def write_many(self, frames, timestamps=None):
+        '''Writes a batch of frames, with a single vectored write if the encoder is not fed from a Feeder.'''
+        if not frames or not self.output or self.failed(len(frames)):
+            return
+        if self.feeder or not hasattr(os, 'writev'):
+            return Output.write_many(self, frames, timestamps=timestamps)
+
+        try:
+            # anything still in the file object's buffer goes first
+            self.output.flush()
+            writev(self.output.fileno(), [contiguous(frame) for frame in frames])
+        except (OSError, ValueError) as e:
+            self.fail(e)
+
+    def stats(self):
+        '''Dropped frames and the first write error, and the Feeder's counters if feeding from one.'''
+        return {
+            'frames_dropped': self.frames_dropped,
+            'error': repr(self.error) if self.error is not None else None,
+            **({'feeder': self.feeder.stats()} if self.feeder else {}),
+        }
 
     def close(self):
         if self.output:
+            if self.feeder:
+                self.feeder.close(timeout=5)
+                log.info(f'{str(self.feeder)} stats: {self.feeder.stats()}')
             if self.process and self.process.poll() == None:
                 try:
                     self.process.communicate(timeout=5)
@@ -133,3 +194,22 @@ class File(Output):
                 log.error(f'Recording rename failed: {e}')
             Output.close(self)
         self.output = None
+
+    def abort(self):
+        '''Stops recording without keeping the file: the encoder is killed and the tmp file removed.'''
+        if self.output:
+            if self.feeder:
+                self.feeder.stop()
+            if self.process:
+                self.process.kill()
+                self.process.wait()
+            try:
+                self.output.close()
+            except OSError:
+                pass
+            try:
+                os.remove(self.tmp_path)
+            except FileNotFoundError:
+                pass
+            Output.close(self)
+        self.output = None
@@ -2,7 +2,7 @@ import ffmpeg
 import logging
 from threading import Thread
 
-from . output import Output
+from . output import Output, contiguous
 
 log = logging.getLogger(__name__)
 
@@ -62,11 +62,11 @@ class H264Pipe(Output):
             data = self.decoder.stdout.read(self.config.get('block_size'))
             self.config.get('callback')(data)
 
-    def write(self, data=None):
+    def write(self, data=None, timestamp=None):
         if self.decoder is None:
             self.config['res'] = [data.shape[1], data.shape[0]] + list(data.shape[2:])
             self.initialize_decoder()
-        self.decoder.stdin.write(data.tostring())
+        self.decoder.stdin.write(contiguous(data))
 
     def close(self):
         self.decoder = None
@@ -1,8 +1,37 @@
+import os
 import atexit
 import logging
+import numpy as np
 
 log = logging.getLogger(__name__)
 
+# most buffers a single writev call accepts
+IOV_MAX = os.sysconf('SC_IOV_MAX') if hasattr(os, 'sysconf') else 1024
+
+
+def writev(fd, buffers):
+    '''
+    Writes every buffer to file descriptor 'fd' with as few writev calls as possible.
+    Partial writes (common on pipes) are resumed where they stopped.
+    '''
+    views = [memoryview(buffer).cast('B') for buffer in buffers]
+    i = 0
+    while i < len(views):
+        written = os.writev(fd, views[i:i + IOV_MAX])
+        # skip past every buffer that was written completely
+        while i < len(views) and written >= len(views[i]):
+            written -= len(views[i])
+            i += 1
+        if written:
+            views[i] = views[i][written:]
+
+
+def contiguous(data):
+    '''Returns frames that are numpy views (eg: cropped frames) as contiguous arrays, which can be written out.'''
+    if isinstance(data, np.ndarray):
+        return np.ascontiguousarray(data)
+    return data
+
 
 class Output:
     '''
@@ -19,9 +48,19 @@ class Output:
 
         atexit.register(self.close)
 
-    def write(self, data=None):
+    def write(self, data=None, timestamp=None):
+        '''Writes a frame. timestamp is its capture time, if known.'''
         log.debug('write not implemented.')
 
+    def write_many(self, frames, timestamps=None):
+        '''Writes a batch of frames. Outputs that support vectored writes should override this.'''
+        for data, timestamp in zip(frames, timestamps or [None] * len(frames)):
+            self.write(data, timestamp=timestamp)
+
+    def stats(self):
+        '''Output specific counters.'''
+        return {}
+
     def close(self):
         log.debug('close not implemented.')
 
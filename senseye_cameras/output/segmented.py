@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from pathlib import Path
+
+from . output import Output
+from . file import File
+
+log = logging.getLogger(__name__)
+
+
+class Segmented(Output):
+    '''
+    Records to a sequence of files, rotated by frame count, time or size.
+    Each segment is a File output. The next segment's encoder is spawned ahead of time, so switching happens
+    between two frames without losing any, and every segment starts on a keyframe of its own encoder.
+    Finished segments are closed (encoder flushed, tmp file renamed) in the background.
+
+    Segments are named '<stem>_0000<suffix>', '<stem>_0001<suffix>', ... next to 'path'.
+    A manifest '<stem>.json' lists every finished segment: its path, the range of frames it holds
+    (counted across segments) and the capture times of its first and last frames.
+    Frames written without a capture timestamp are timed when written.
+
+    Args:
+        path (str): Output path, its suffix picks the segments' codec (see File).
+        config (dict): Configuration dictionary. Accepted keywords, on top of File's:
+            segment_frames (int): frames per segment.
+            segment_seconds (float): seconds per segment, by capture time from its first frame.
+            segment_bytes (int): bytes of frames written per segment, before encoding.
+            The segment is switched when the first of the set limits is reached.
+    '''
+
+    def __init__(self, path=None, **kwargs):
+        defaults = {
+            'segment_frames': None,
+            'segment_seconds': None,
+            'segment_bytes': None,
+        }
+        Output.__init__(self, defaults=defaults, **kwargs)
+        if not any(self.config.get(key) for key in defaults):
+            log.warning(f'{str(self)} has no segment limit set, recording a single segment.')
+
+        self.set_path(path)
+        self.index = 0
+        self.frame_count = 0
+        self.segments = []
+        self.finalizers = []
+        self.lock = threading.Lock()
+
+        self.next = None
+        self.spawner = None
+        self.segment = None
+        self.output = self.start_segment(self.spawn(self.segment_path(self.index)))
+        self.prepare_next()
+
+    def set_path(self, path=None):
+        '''Sets the path segments are named after. Applies from the next segment on.'''
+        self.path = Path(path).absolute()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        spawner = getattr(self, 'spawner', None)
+        if spawner is not None:
+            spawner.join()
+            if self.next is not None:
+                self.next.set_path(self.segment_path(self.index + 1))
+
+    def segment_path(self, index):
+        return self.path.with_name(f'{self.path.stem}_{index:04d}{self.path.suffix}')
+
+    def manifest_path(self):
+        return self.path.with_suffix('.json')
+
+    def spawn(self, path):
+        output = File(path=path, config=self.config)
+        # segments are closed by the Segmented, which has its own exit hook
+        atexit.unregister(output.close)
+        return output
+
+    def prepare_next(self):
+        '''Spawns the next segment's encoder in the background.'''
+        def spawn():
+            try:
+                self.next = self.spawn(self.segment_path(self.index + 1))
+            except Exception as e:
+                log.error(f'{str(self)} failed to spawn the next segment: {e}')
+                self.next = None
+
+        self.spawner = threading.Thread(target=spawn, daemon=True)
+        self.spawner.start()
+
+    def start_segment(self, output):
+        self.segment = {
+            'index': self.index,
+            'path': str(output.path),
+            'first_frame': self.frame_count,
+            'frames': 0,
+            'start_time': None,
+            'end_time': None,
+        }
+        self.segment_bytes = 0
+        return output
+
+    def full(self, timestamp):
+        '''Whether the current segment reached one of its limits, given the next frame's timestamp.'''
+        frames = self.segment['frames']
+        if not frames:
+            return False
+        if self.config.get('segment_frames') and frames >= self.config.get('segment_frames'):
+            return True
+        if self.config.get('segment_seconds') and timestamp - self.segment['start_time'] >= self.config.get('segment_seconds'):
+            return True
+        if self.config.get('segment_bytes') and self.segment_bytes >= self.config.get('segment_bytes'):
+            return True
+        return False
+
+    def switch(self):
+        '''Moves writing to the pre-spawned next segment and finalizes the current one in the background.'''
+        self.spawner.join()
+        output = self.next
+        if output is None:
+            # spawning failed, try once more on this thread
+            output = self.spawn(self.segment_path(self.index + 1))
+
+        previous, segment = self.output, self.segment
+        self.index += 1
+        self.output = self.start_segment(output)
+        self.prepare_next()
+
+        finalizer = threading.Thread(target=self.finalize, args=(previous, segment), daemon=True)
+        finalizer.start()
+        self.finalizers.append(finalizer)
+        log.info(f'{str(self)} switched to segment {self.index}: {self.segment["path"]}')
+
+    def finalize(self, output, segment):
+        '''Closes a finished segment and adds it to the manifest.'''
+        output.close()
+        segment['bytes'] = os.stat(segment['path']).st_size if os.path.exists(segment['path']) else None
+        with self.lock:
+            self.segments.append(segment)
+            self.segments.sort(key=lambda segment: segment['index'])
+            self.write_manifest()
+
+    def write_manifest(self):
+        path = self.manifest_path()
+        tmp_path = path.with_name(f'.{path.name}.tmp')
+        manifest = {
+            'path': str(self.path),
+            'frames': sum(segment['frames'] for segment in self.segments),
+            'segments': self.segments,
+        }
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def write(self, data=None, timestamp=None):
+        if data is None or self.output is None:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        if self.full(timestamp):
+            self.switch()
+
+        if self.segment['start_time'] is None:
+            self.segment['start_time'] = timestamp
+        self.output.write(data)
+        self.segment['frames'] += 1
+        self.segment['end_time'] = timestamp
+        self.segment_bytes += data.nbytes if hasattr(data, 'nbytes') else len(data)
+        self.frame_count += 1
+
+    def stats(self):
+        return {
+            'segment': self.index,
+            'frames': self.frame_count,
+            'output': self.output.stats() if self.output is not None else {},
+        }
+
+    def close(self):
+        if self.output is None:
+            return
+        if self.spawner is not None:
+            self.spawner.join()
+        if self.next is not None:
+            self.next.abort()
+            self.next = None
+
+        output, self.output = self.output, None
+        if self.segment['frames']:
+            self.finalize(output, self.segment)
+        else:
+            output.abort()
+        for finalizer in self.finalizers:
+            finalizer.join()
+        self.finalizers = []
+        Output.close(self)
+
+    def __str__(self):
+        return f'{self.__class__.__name__}'
@@ -0,0 +1,94 @@
+import threading
+import logging
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class PreRoll:
+    '''
+    Bounded ring of the most recent frames, kept while a stream is not writing.
+    Holds at most 'seconds' of frames (by capture timestamp), 'max_bytes' bytes and 'max_frames' frames,
+    whichever is reached first. The oldest frames are evicted, and handed to 'release'.
+    Items are whatever the Reader queues (frames, or FramePool slot indices), each holding a reference
+    that the PreRoll gives up through 'release' on eviction or clear(), or hands over on drain().
+
+    Args:
+        seconds (float): longest span of capture timestamps held.
+        max_bytes (int): most bytes of frames held.
+        max_frames (int): most frames held, eg: to leave FramePool slots free for live frames.
+        release (func): called with each evicted item.
+    '''
+
+    def __init__(self, seconds=None, max_bytes=None, max_frames=None, release=None):
+        if seconds is None and max_bytes is None and max_frames is None:
+            raise ValueError('PreRoll needs at least one of seconds, max_bytes or max_frames.')
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.max_frames = max_frames
+        self.release = release
+
+        self._lock = threading.Lock()
+        # (item, timestamp, nbytes), oldest first
+        self._items = deque()
+        self.bytes = 0
+        self.evicted = 0
+        self.flushed = 0
+
+    def push(self, item, timestamp, nbytes=0):
+        '''Adds the newest item, evicting the oldest ones that no longer fit.'''
+        with self._lock:
+            self._items.append((item, timestamp, nbytes))
+            self.bytes += nbytes
+            evicted = []
+            while len(self._items) > 1 and self.over(timestamp):
+                old, _, old_bytes = self._items.popleft()
+                self.bytes -= old_bytes
+                evicted.append(old)
+            self.evicted += len(evicted)
+
+        if self.release is not None:
+            for old in evicted:
+                self.release(old)
+
+    def over(self, newest):
+        '''Whether the held items exceed a limit, given the newest timestamp.'''
+        if self.max_frames is not None and len(self._items) > self.max_frames:
+            return True
+        if self.max_bytes is not None and self.bytes > self.max_bytes:
+            return True
+        oldest = self._items[0][1]
+        return self.seconds is not None and None not in (oldest, newest) and newest - oldest > self.seconds
+
+    def take(self):
+        with self._lock:
+            items = sorted(((item, timestamp) for item, timestamp, _ in self._items), key=lambda x: x[1] or 0)
+            self._items.clear()
+            self.bytes = 0
+            return items
+
+    def drain(self):
+        '''Removes and returns every held (item, timestamp), in timestamp order. Their references go to the caller.'''
+        items = self.take()
+        self.flushed += len(items)
+        return items
+
+    def clear(self):
+        '''Releases every held item.'''
+        for item, timestamp in self.take():
+            if self.release is not None:
+                self.release(item)
+
+    def stats(self):
+        with self._lock:
+            timestamps = [timestamp for _, timestamp, _ in (self._items[0], self._items[-1])] if self._items else [0, 0]
+            return {
+                'frames': len(self._items),
+                'bytes': self.bytes,
+                'seconds': timestamps[1] - timestamps[0] if None not in timestamps else None,
+                'evicted': self.evicted,
+                'flushed': self.flushed,
+            }
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,137 @@
+import logging
+import multiprocessing
+
+from . writer import Writer
+from . output.output_factory import create_output
+
+log = logging.getLogger(__name__)
+
+# seconds to wait on the writer process to finish closing an output
+CLOSE_TIMEOUT = 10
+
+
+def run_writer_process(commands, closed, frames_written, pool, type, config, input_config):
+    '''
+    Main function of the writer process.
+    Creates outputs and writes pool slots to them as commands arrive.
+    Commands are (name, arg) tuples: ('open', path), ('frame', (index, timestamp)), ('frames', [(index, timestamp), ...]),
+    ('set_path', path), ('close', None), ('stop', None)
+    '''
+    output = None
+    while True:
+        name, arg = commands.get()
+        try:
+            if name == 'frame':
+                index, timestamp = arg
+                try:
+                    if output is not None:
+                        output.write(pool.slots[index], timestamp=timestamp)
+                        frames_written.value += 1
+                finally:
+                    pool.release(index)
+            elif name == 'frames':
+                try:
+                    if output is not None:
+                        output.write_many(
+                            [pool.slots[index] for index, timestamp in arg],
+                            timestamps=[timestamp for index, timestamp in arg],
+                        )
+                        frames_written.value += len(arg)
+                finally:
+                    for index, timestamp in arg:
+                        pool.release(index)
+            elif name == 'open':
+                frames_written.value = 0
+                output = create_output(type=type, config=config, path=arg, input_config=input_config)
+                log.info(f'Started {str(output)}. Config: {output.config}')
+            elif name == 'set_path':
+                if output is not None:
+                    output.set_path(arg)
+            elif name == 'close':
+                if output is not None:
+                    output.close()
+                    log.info(f'Stopped {str(output)}.')
+                output = None
+                closed.set()
+            elif name == 'stop':
+                break
+        except Exception as e:
+            log.exception(f'Writer process error on {name}: {e}')
+            if name == 'close':
+                closed.set()
+
+    if output is not None:
+        output.close()
+    pool.close()
+
+
+class ProcessWriter(Writer):
+    '''
+    Writer whose output lives in a child process.
+
+    Frames are exchanged through a SharedFramePool, so only slot indices cross the process boundary.
+    This thread moves indices from the queue to the writer process, which encodes and releases them.
+
+    Args:
+        see Writer. pool must be a SharedFramePool.
+        on_write is not supported, as frames are written in another process.
+    '''
+
+    def __init__(self, q, on_write=None, pool=None, **kwargs):
+        if pool is None:
+            raise ValueError('ProcessWriter requires a SharedFramePool.')
+        if on_write is not None:
+            log.warning(f'{self.__class__.__name__} does not support on_write, it will not be called.')
+        Writer.__init__(self, q, on_write=None, pool=pool, **kwargs)
+
+        context = multiprocessing.get_context('spawn')
+        self.commands = context.Queue()
+        self.closed = context.Event()
+        self._frames_written = context.Value('Q', 0)
+
+        self.process = context.Process(
+            target=run_writer_process,
+            args=(self.commands, self.closed, self._frames_written, self.pool, self.type, self.config, self.input_config),
+            daemon=True,
+        )
+        self.process.start()
+
+    @property
+    def frames_written(self):
+        return self._frames_written.value
+
+    @frames_written.setter
+    def frames_written(self, value):
+        # the count is owned by the writer process
+        pass
+
+    def initialize_writer(self):
+        self.closed.clear()
+        self.commands.put(('open', self.path))
+        log.info(f'{str(self)} started writer process {self.process.pid}.')
+
+    def write(self, entry):
+        self.commands.put(('frame', entry))
+
+    def write_many(self, entries):
+        self.commands.put(('frames', entries))
+
+    def set_path(self, path=None):
+        self.path = path
+        self.commands.put(('set_path', path))
+        log.info(f'{str(self)} path set to {path}')
+
+    def drain(self):
+        purge = self.q.remove_existing()
+        if purge:
+            self.write_many(purge)
+        self.commands.put(('close', None))
+        if not self.closed.wait(timeout=CLOSE_TIMEOUT):
+            log.error(f'{str(self)} writer process did not close its output within {CLOSE_TIMEOUT}s.')
+
+    def stop(self, join=True):
+        Writer.stop(self, join=join)
+        if self.process.is_alive():
+            self.commands.put(('stop', None))
+            if join:
+                self.process.join(timeout=CLOSE_TIMEOUT)
@@ -1,5 +1,9 @@
+import time
 import logging
+import threading
 from . loop_thread import LoopThread
+from . frame_pool import FramePool, SharedFramePool
+from . preroll import PreRoll
 
 from . input.input_factory import create_input
 
@@ -7,33 +11,161 @@ log = logging.getLogger(__name__)
 
 
 class Reader(LoopThread):
-    '''Reads data into a queue.'''
-    def __init__(self, q, on_read=None, type='usb', config={}, id=0, frequency=None, reading=False, writing=False):
-        self.q = q
+    '''
+    Reads data into a queue, or into each queue of a list of queues.
+    If pool_size is set, frames are read into a FramePool and slot indices are queued instead of frames.
+    shared_pool places the FramePool in shared memory, so it can be written from another process.
+    Frames are queued with SafeQueue.offer, so the queue's overflow policy decides which frames are lost.
+    Without a pool, each queue takes a reference to the frame with input.retain,
+    which is released by the Writer once written, or by the queue if the frame is dropped.
+    Items are queued with their capture timestamps, as (item, timestamp).
+    If event_driven is set and the input's read blocks until a frame arrives, the Reader is not paced
+    and runs off the device's reads instead. An unpaced Reader waits wait_timeout after each read
+    that produced no frame (eg: a read error, a closed device or the end of a file), instead of spinning.
+    If a Decimator is passed, only the frames it keeps are queued. on_read still sees every frame.
+    As every frame read is released once written or dropped, inputs whose zero_copy config is left
+    at None (eg: CameraUeye, CameraPylon) hand the Reader views into their device buffers instead of copies.
+    If preroll_seconds or preroll_bytes is set, frames read while not writing are held in a PreRoll,
+    and queued ahead of the first frame read once writing starts. With a pool, the PreRoll holds
+    at most half its slots, so live frames can still be read while it is written out.
+    '''
+    def __init__(self, q, on_read=None, type='usb', config={}, id=0, frequency=None, reading=False, writing=False, pool_size=None, shared_pool=False, event_driven=False, pacing='catch_up', decimator=None, preroll_seconds=None, preroll_bytes=None):
+        self.queues = list(q) if isinstance(q, (list, tuple)) else [q]
+        self.q = self.queues[0]
         self.on_read = on_read
+        self.decimator = decimator
 
         self.type = type
+        self.event_driven = event_driven
+        self._reading = threading.Event()
 
         self.input = create_input(type=type, config=config, id=id)
+        if self.input.config.get('zero_copy', False) is None:
+            self.input.config['zero_copy'] = True
         self.input.open()
         self.reading = reading
         self.writing = writing
         log.info(f'Started {str(self.input)}. Config: {self.input.config}')
 
+        self.pool = None
+        if pool_size:
+            pool_class = SharedFramePool if shared_pool else FramePool
+            self.pool = pool_class(capacity=pool_size, shape=self.input.frame_shape())
+            log.info(f'{str(self.input)} reading into {str(self.pool)}')
+            # slots the queues drop or evict go straight back to the pool
+            for q in self.queues:
+                q.on_evict = lambda entry: self.pool.release(entry[0])
+        else:
+            for q in self.queues:
+                q.on_evict = lambda entry: self.input.release(entry[0])
+
+        self.preroll = None
+        if preroll_seconds is not None or preroll_bytes is not None:
+            self.preroll = PreRoll(
+                seconds=preroll_seconds, max_bytes=preroll_bytes,
+                max_frames=max(self.pool.capacity // 2, 1) if self.pool is not None else None,
+                release=self.pool.release if self.pool is not None else self.input.release,
+            )
+
         self.frequency = frequency
         if self.frequency is None:
             self.frequency = self.input.config.get('fps', 100)
-        LoopThread.__init__(self, frequency=self.frequency)
+            if self.event_driven and self.input.blocks_on_read():
+                self.frequency = 0
+        LoopThread.__init__(self, frequency=self.frequency, pacing=pacing)
+
+    @property
+    def reading(self):
+        return self._reading.is_set()
+
+    @reading.setter
+    def reading(self, reading):
+        if reading:
+            self._reading.set()
+        else:
+            self._reading.clear()
 
     def loop(self):
-        if self.reading:
+        if not self.reading:
+            if self.frequency == 0:
+                # unpaced, sleep until reading starts
+                self._reading.wait(self.wait_timeout)
+            return
+
+        if self.pool is not None:
+            read = self.read_into_pool()
+        else:
+            read = self.read()
+        if not read and self.frequency == 0:
+            time.sleep(self.wait_timeout)
+
+    def read(self):
+        '''Reads a frame and queues it. Returns whether a frame was read.'''
+        data, timestamp = self.input.read()
+        if data is None:
+            return False
+
+        try:
+            if self.on_read is not None:
+                self.on_read(data=data, timestamp=timestamp)
+            self.queue(data, timestamp, self.input.retain, nbytes=getattr(data, 'nbytes', 0))
+        finally:
+            self.input.release(data)
+        return True
+
+    def queue(self, item, timestamp, retain, nbytes=0):
+        '''
+        Queues a frame (or pool slot) while writing, after flushing the pre-roll.
+        Holds it in the pre-roll otherwise. References are taken with 'retain', the caller keeps its own.
+        '''
+        if self.writing:
+            if self.preroll is not None and len(self.preroll):
+                held = self.preroll.drain()
+                log.info(f'{str(self.input)} writing {len(held)} pre-roll frames')
+                for held_item, held_timestamp in held:
+                    self.offer(held_item, held_timestamp, retain)
+                    # the pre-roll's own reference
+                    self.preroll.release(held_item)
+            self.offer(item, timestamp, retain)
+        elif self.preroll is not None:
+            retain(item)
+            self.preroll.push(item, timestamp, nbytes)
+
+    def offer(self, item, timestamp, retain):
+        '''Offers an item to every queue, each holding its own reference, unless the decimator skips it.'''
+        if self.decimator is not None and not self.decimator.keep(timestamp):
+            return
+        for q in self.queues:
+            retain(item)
+            q.offer((item, timestamp))
+
+    def read_into_pool(self):
+        '''Reads a frame into a free pool slot and queues the slot index. Returns whether a frame was read.'''
+        index = self.pool.acquire()
+        if index is None:
+            # every slot is waiting to be written, this frame will not be queued
             data, timestamp = self.input.read()
             if data is not None:
                 if self.on_read is not None:
                     self.on_read(data=data, timestamp=timestamp)
-                if self.writing:
-                    self.q.put_nowait(data)
+                self.input.release(data)
+            log.debug(f'{str(self.pool)} exhausted, frame not queued')
+            return data is not None
+
+        data, timestamp = self.input.read_into(self.pool.slots[index])
+        if data is None:
+            self.pool.release(index)
+            return False
+
+        if self.on_read is not None:
+            self.on_read(data=data, timestamp=timestamp)
+        # each queue holds its own reference, released once written or dropped
+        self.queue(index, timestamp, self.pool.retain, nbytes=self.pool.frame_size)
+        self.pool.release(index)
+        return True
 
     def on_stop(self):
+        if self.preroll is not None:
+            self.preroll.clear()
         self.input.close()
         log.info(f'Stopped {str(self.input)}.')
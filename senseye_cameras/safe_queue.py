@@ -1,20 +1,51 @@
+import time
 import queue
 import logging
 
 log = logging.getLogger(__name__)
 
+# Policies offer() applies when the queue is full:
+#   drop_newest - the offered item is dropped.
+#   drop_oldest - the oldest queued item is evicted to make room.
+#   block - wait up to 'timeout' seconds for room, then drop the offered item.
+#   keep_nth - once full, only every nth offered item is kept (evicting the oldest if needed)
+#       until the queue drains to half its size.
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'block', 'keep_nth')
+
 class SafeQueue(queue.Queue):
     """
     Class that extends Python Queue to safely handle exceptions from Queue
     accessor methods.
+
+    offer() applies an overflow policy (see OVERFLOW_POLICIES) and keeps exact
+    counts of the items that were dropped, forced out or had to wait.
+    Items that offer() drops or evicts are passed to on_evict, if set.
     """
 
-    def __init__(self, maxsize=0, module='Generic'):
+    def __init__(self, maxsize=0, module='Generic', overflow='drop_newest', timeout=1, nth=2, on_evict=None):
         super().__init__(maxsize=maxsize)
 
         # Information on where the queue is being used for debug information
         self.module = module
 
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Overflow policy {overflow} not supported. Supported policies: {OVERFLOW_POLICIES}')
+        if nth < 1:
+            raise ValueError(f'nth must be at least 1, got {nth}.')
+        self.overflow = overflow
+        self.timeout = timeout
+        self.nth = nth
+        self.on_evict = on_evict
+
+        # items enqueued, items never enqueued, queued items evicted, and puts that waited for room
+        self.accepted = 0
+        self.dropped = 0
+        self.forced = 0
+        self.blocked = 0
+        # keep_nth state
+        self._thinning = False
+        self._offered = 0
+
     def put(self, item, block=True, timeout=None, force=False):
         """
         Attempt to insert an item into the queue, handling the Full exception if
@@ -26,11 +57,17 @@ class SafeQueue(queue.Queue):
             if self.full() and force:
                 # When force is enabled, do a blocking dequeue
                 ret = self.get()
+                with self.mutex:
+                    self.forced += 1
 
             super().put(item=item, block=block, timeout=timeout)
         except queue.Full:
             log.debug(f'Queue module {self.module} is full. {item} not inserted')
+            with self.mutex:
+                self.dropped += 1
             return False
+        with self.mutex:
+            self.accepted += 1
         return ret
 
     def put_nowait(self, item, force=False):
@@ -39,6 +76,77 @@ class SafeQueue(queue.Queue):
         """
         return self.put(item, block=False, force=force)
 
+    def offer(self, item):
+        """
+        Insert an item, applying the queue's overflow policy if it is full.
+        Returns True if the item was enqueued.
+        The offered item (if dropped) or the oldest item (if evicted) is passed to on_evict.
+        """
+        evicted = None
+        with self.not_full:
+            accept = True
+            full = 0 < self.maxsize <= self._qsize()
+
+            if self.overflow == 'keep_nth':
+                if full:
+                    self._thinning = True
+                elif self._qsize() <= self.maxsize // 2:
+                    self._thinning = False
+                if self._thinning:
+                    self._offered += 1
+                    accept = self._offered % self.nth == 0
+
+            if accept and full:
+                if self.overflow in ('drop_oldest', 'keep_nth'):
+                    evicted = self._get()
+                    self.forced += 1
+                elif self.overflow == 'block':
+                    self.blocked += 1
+                    accept = self._wait_for_room()
+                else:
+                    accept = False
+
+            if accept:
+                self._put(item)
+                self.unfinished_tasks += 1
+                self.accepted += 1
+                self.not_empty.notify()
+            else:
+                evicted = item
+                self.dropped += 1
+
+        if evicted is not None and self.on_evict is not None:
+            self.on_evict(evicted)
+        return accept
+
+    def _wait_for_room(self):
+        """Waits on not_full for up to self.timeout seconds. Must be called with not_full held."""
+        if self.timeout is None:
+            while self._qsize() >= self.maxsize:
+                self.not_full.wait()
+            return True
+
+        end = time.monotonic() + self.timeout
+        while self._qsize() >= self.maxsize:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.not_full.wait(remaining)
+        return True
+
+    def stats(self):
+        """Returns the queue's size and overflow counters."""
+        with self.mutex:
+            return {
+                'size': self._qsize(),
+                'maxsize': self.maxsize,
+                'overflow': self.overflow,
+                'accepted': self.accepted,
+                'dropped': self.dropped,
+                'forced': self.forced,
+                'blocked': self.blocked,
+            }
+
     def get(self, block=True, timeout=None):
         """
         Attempt to retrieve an element from the queue, handling the Empty
@@ -70,34 +178,42 @@ class SafeQueue(queue.Queue):
             ret_list = list(self.queue)
         return ret_list
 
+    def get_many(self, max_items=None, block=False, timeout=None):
+        """
+        Dequeue up to max_items items (all items by default) under a single
+        lock acquisition.
+        If block is set, wait up to timeout seconds for at least one item.
+        Returns a list, which is empty if no item was available.
+        """
+        with self.not_empty:
+            if block:
+                if timeout is None:
+                    while not self._qsize():
+                        self.not_empty.wait()
+                else:
+                    end = time.monotonic() + timeout
+                    while not self._qsize():
+                        remaining = end - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.not_empty.wait(remaining)
+
+            size = self._qsize()
+            if max_items is not None and max_items < size:
+                size = max_items
+
+            outgoing = [self._get() for _ in range(size)]
+            if outgoing:
+                self.not_full.notify(len(outgoing))
+        return outgoing
+
     def remove_existing(self, num_elements=None):
         """
         Pops items from self queue and appends to a list.
-        Mutates self queue by removing qsize elements.
-
-        Note: If you force an item to be input into the queue during this
-        operation, you may clobber data. For example:
-        - SafeQueue size is 10 when remove_existing() is called
-        - SafeQueue maxsize is 10
-        - SafeQueue.put_nowait(an_item, force=True)
-        - The first item is forced off, and may not have been grabbed into the
-        list.
-        - Using a mutex here may cause a deadlock.
-        """
-        outgoing = []
-        # Attempt to remove passed number of elements, with all elements
-        # being the default.
-        #
-        # If number requested is more than number of elements, remove all
-        # elements
-        size = num_elements
-        if not num_elements or size > self.qsize():
-            size = self.qsize()
-
-        for i in range(0,size):
-            outgoing.append(self.get_nowait())
-
-        return outgoing
+        Mutates self queue by removing up to num_elements elements, with all
+        elements being the default.
+        """
+        return self.get_many(max_items=num_elements or None)
 
     def __str__(self):
         """
@@ -5,30 +5,62 @@ from . safe_queue import SafeQueue
 
 from . reader import Reader
 from . writer import Writer
+from . process_writer import ProcessWriter
+from . decimator import Decimator
+from . frame_pool import DEFAULT_CAPACITY
 
 log = logging.getLogger(__name__)
 
 
 class Stream:
     '''
-    Links an Input with an Output.
+    Links an Input with one or more Outputs.
     Args:
         input_type/input_config/id: see create_input.
         output_type/output_config/path: see create_output
+        outputs (list): output specs, for writing the same frames to several outputs.
+            Each spec is a dict with the keys 'type', 'config', 'path' and optionally 'on_write'.
+            Every output gets its own queue and Writer, so a slow output does not hold up the others.
+            Frames are shared between outputs and must not be modified in on_write.
+            Overrides output_type/output_config/path.
         reading/writing (bool): whether to read/write on start.
         on_read (func): called on frame read. Function should take fn(data=None, timestamp=None) as args.
         on_read/on_write (func): called on frame write. Function should take fn(data=None)
+        frame_pool (int): if set, frames are read into this many preallocated slots instead of new arrays.
+            Frames passed to on_read/on_write are then only valid for the duration of the callback.
+        writer_process (bool): run the output in a child process, fed through a shared memory frame pool. Requires python 3.8.
+            Uses a frame pool of DEFAULT_CAPACITY slots if frame_pool is not set. on_write is not supported.
+        queue_size (int): how many frames can wait to be written.
+        overflow (str): what to do with frames when the queue is full, see safe_queue.OVERFLOW_POLICIES.
+        overflow_timeout (float): seconds to wait for room under the 'block' policy. None waits indefinitely.
+        overflow_nth (int): keep every nth frame under the 'keep_nth' policy.
+        batch_writes (bool): write every queued frame on each writer loop, as one vectored write where supported.
+        event_driven (bool): wake the writer when frames are queued instead of polling at the input's fps,
+            and run the reader off the device's blocking reads for inputs that support it.
+        pacing (str): how the reader and writer loops are scheduled, see loop_thread.PACING_MODES.
+        decimate (int): only write every nth frame read.
+        decimate_fps (float): only write frames at this rate, picked by capture timestamp.
+            With either, on_read still sees every frame, and outputs are configured with the decimated fps
+            unless their config sets one.
+        preroll_seconds (float): while reading but not writing, hold this many seconds of the latest frames,
+            and write them ahead of live frames when writing starts.
+        preroll_bytes (int): most bytes of frames held for the pre-roll.
+            With a frame pool, the pre-roll also holds at most half of the pool's slots.
     '''
 
     def __init__(self,
         input_type='usb', input_config={}, id=0,
         output_type='ffmpeg', output_config={}, path='.',
+        outputs=None,
         input_frequency=None, output_frequency=None,
         reading=False, writing=False,
         on_read=None, on_write=None,
+        frame_pool=None, writer_process=False,
+        queue_size=700, overflow='drop_newest', overflow_timeout=1, overflow_nth=2,
+        batch_writes=False, event_driven=False, pacing='catch_up',
+        decimate=None, decimate_fps=None,
+        preroll_seconds=None, preroll_bytes=None,
     ):
-        self.q = SafeQueue(700)
-
         self.input_type = input_type
         self.input_config = input_config
         self.id = id
@@ -36,6 +68,7 @@ class Stream:
         self.output_type = output_type
         self.output_config = output_config
         self.path = path
+        self.outputs = outputs or [{'type': output_type, 'config': output_config, 'path': path}]
 
         self.input_frequency = input_frequency
         self.output_frequency = output_frequency
@@ -43,31 +76,67 @@ class Stream:
         self.on_read = on_read
         self.on_write = on_write
 
+        self.batch_writes = batch_writes
+        self.event_driven = event_driven
+        self.pacing = pacing
+
+        self.frame_pool = frame_pool
+        self.writer_process = writer_process
+        if self.writer_process and not self.frame_pool:
+            self.frame_pool = DEFAULT_CAPACITY
+
+        self.queues = [
+            SafeQueue(queue_size, module=f'{str(self)}:{i}', overflow=overflow, timeout=overflow_timeout, nth=overflow_nth)
+            for i in range(len(self.outputs))
+        ]
+        self.q = self.queues[0]
+
         self.writer = self.reader = None
+        self.writers = []
         atexit.register(self.stop)
 
         self.reader = Reader(
-            self.q, on_read=self.on_read, type=self.input_type, config=self.input_config, frequency=self.input_frequency,
-            id=self.id,
+            self.queues, on_read=self.on_read, type=self.input_type, config=self.input_config, frequency=self.input_frequency,
+            id=self.id, pool_size=self.frame_pool, shared_pool=self.writer_process,
+            event_driven=self.event_driven, pacing=self.pacing,
+            preroll_seconds=preroll_seconds, preroll_bytes=preroll_bytes,
         )
         self.reader.start()
 
-        self.writer = Writer(
-            self.q, on_write=self.on_write, type=self.output_type, config=self.output_config, frequency=self.reader.frequency,
-            input_config=self.reader.input.config, path=self.path,
-        )
-        self.writer.start()
+        input_config = self.reader.input.output_config()
+        self.decimator = None
+        if decimate is not None or decimate_fps is not None:
+            self.decimator = Decimator(ratio=decimate, fps=decimate_fps, input_fps=input_config.get('fps'))
+            self.reader.decimator = self.decimator
+            if self.decimator.output_fps():
+                input_config = {**input_config, 'fps': self.decimator.output_fps()}
+            log.info(f'{str(self)} recording through {str(self.decimator)}')
+
+        writer_class = ProcessWriter if self.writer_process else Writer
+        for q, output in zip(self.queues, self.outputs):
+            writer = writer_class(
+                q, on_write=output.get('on_write', self.on_write), type=output.get('type', 'ffmpeg'),
+                config=output.get('config', {}), frequency=self.reader.frequency,
+                input_config=input_config, path=output.get('path', '.'), pool=self.reader.pool,
+                release=self.reader.input.release,
+                batch=self.batch_writes, event_driven=self.event_driven, pacing=self.pacing,
+            )
+            writer.start()
+            self.writers.append(writer)
+        self.writer = self.writers[0]
 
         if reading:
             self.start_reading()
         if writing:
             self.start_writing()
 
-    def set_path(self, path=None):
-        '''Sets the writers' path.'''
-        self.path = path
-        if self.writer:
-            self.writer.set_path(path)
+    def set_path(self, path=None, index=0):
+        '''Sets the path of the writer of output 'index'.'''
+        self.outputs[index]['path'] = path
+        if index == 0:
+            self.path = path
+        if self.writers:
+            self.writers[index].set_path(path)
 
     ####################
     # READER FUNCTIONS
@@ -87,23 +156,55 @@ class Stream:
     ####################
     def start_writing(self):
         '''Starts writing frames.'''
-        self.writer.initialize_writer()
-        self.writer.writing = True
+        for writer in self.writers:
+            writer.initialize_writer()
+            writer.writing = True
+        if self.decimator is not None:
+            self.decimator.reset()
         self.reader.writing = True
         log.info(f'{str(self)} writing started - {time.time()}')
 
     def stop_writing(self):
         '''Stops writing frames.'''
-        self.writer.on_stop()
-        self.writer.writing = False
+        # stop queueing first, so each writer drains everything that was queued
         self.reader.writing = False
+        for writer in self.writers:
+            writer.stop_writing()
         log.info(f'{str(self)} writing stopped - {time.time()}')
 
+    def stats(self):
+        '''
+        Returns the stream's queue counters and reader/writer loop statistics.
+        'queue' and 'writer' describe the first output, 'outputs' has the same for every output.
+        'decimator' counts the frames kept and skipped, when decimating.
+        'preroll' describes the frames held for the pre-roll, when set.
+        '''
+        outputs = [
+            {'queue': q.stats(), 'writer': writer.stats(), 'frames_written': getattr(writer, 'frames_written', 0)}
+            for q, writer in zip(self.queues, self.writers)
+        ]
+        stats = {
+            'queue': outputs[0]['queue'],
+            'reader': self.reader.stats(),
+            'writer': outputs[0]['writer'],
+            'outputs': outputs,
+        }
+        if self.decimator is not None:
+            stats['decimator'] = self.decimator.stats()
+        if self.reader.preroll is not None:
+            stats['preroll'] = self.reader.preroll.stats()
+        return stats
+
     def stop(self):
+        if self.reader is None:
+            return
         self.stop_reading()
         self.stop_writing()
         self.reader.stop()
-        self.writer.stop()
+        for writer in self.writers:
+            writer.stop()
+        if self.reader.pool is not None:
+            self.reader.pool.close()
 
     def __str__(self):
         return f'{self.__class__.__name__}'
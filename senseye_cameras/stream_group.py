@@ -0,0 +1,274 @@
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+
+from . safe_queue import SafeQueue
+from . loop_thread import LoopThread
+from . reader import Reader
+from . writer import Writer
+
+log = logging.getLogger(__name__)
+
+# seconds between creating the readers and their first, common, read
+START_DELAY = 0.1
+
+
+class Aligner(LoopThread):
+    '''
+    Matches frames from several inputs into sets by nearest timestamp.
+
+    Frames are pushed per input with push(). A set is emitted once every input has a frame
+    within 'tolerance' seconds of the others. Frames that cannot be part of a set are counted as unmatched,
+    frames older than the last emitted set are counted as late.
+    Pending frames hold a reference taken with retain, which is released once the frame
+    is dropped, or once on_set returns (see Input.retain/release).
+
+    Args:
+        count (int): number of inputs.
+        tolerance (float): largest timestamp difference, in seconds, within a set.
+        on_set (func): called with each set as fn(data=[...], timestamps=[...]).
+        buffer_size (int): frames kept per input while waiting for a match.
+        retain/release (func): called as fn(index, data) to take/drop a reference to a frame of input 'index'.
+    '''
+
+    def __init__(self, count, tolerance=0.005, on_set=None, buffer_size=30, retain=None, release=None):
+        self.count = count
+        self.tolerance = tolerance
+        self.on_set = on_set
+        self.buffer_size = buffer_size
+        self.retain = retain
+        self.release = release
+
+        self.pending = [deque() for _ in range(count)]
+        self.condition = threading.Condition()
+        self.last_timestamp = None
+
+        self.sets = 0
+        self.unmatched = [0] * count
+        self.late = [0] * count
+
+        LoopThread.__init__(self, frequency=0)
+
+    def push(self, index, data, timestamp):
+        '''Adds a frame read from input 'index'.'''
+        dropped = None
+        with self.condition:
+            if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+                self.late[index] += 1
+                return
+            if self.retain is not None:
+                self.retain(index, data)
+            pending = self.pending[index]
+            if len(pending) >= self.buffer_size:
+                dropped = pending.popleft()
+                self.unmatched[index] += 1
+            pending.append((timestamp, data))
+            self.condition.notify()
+        if dropped is not None:
+            self.drop(index, dropped)
+
+    def drop(self, index, frame):
+        '''Releases a (timestamp, data) frame of input 'index' that left the pending frames.'''
+        if self.release is not None:
+            self.release(index, frame[1])
+
+    def match(self):
+        '''
+        Pops the next set of frames out of the pending frames.
+        Returns a list of (timestamp, data), or None if there is no set yet.
+        Must be called with self.condition held.
+        '''
+        while all(self.pending):
+            latest = max(pending[0][0] for pending in self.pending)
+
+            for i, pending in enumerate(self.pending):
+                # drop frames that a later frame is at least as close to 'latest' as
+                while len(pending) > 1 and abs(pending[1][0] - latest) <= abs(pending[0][0] - latest):
+                    self.drop(i, pending.popleft())
+                    self.unmatched[i] += 1
+
+            heads = [pending[0][0] for pending in self.pending]
+            if max(heads) - min(heads) <= self.tolerance:
+                return [pending.popleft() for pending in self.pending]
+
+            # the oldest frame has nothing close enough to it
+            oldest = heads.index(min(heads))
+            self.drop(oldest, self.pending[oldest].popleft())
+            self.unmatched[oldest] += 1
+        return None
+
+    def loop(self):
+        with self.condition:
+            frames = self.match()
+            if frames is None:
+                self.condition.wait(self.wait_timeout)
+                return
+            self.last_timestamp = max(timestamp for timestamp, data in frames)
+            self.sets += 1
+
+        try:
+            if self.on_set is not None:
+                self.on_set(data=[data for timestamp, data in frames], timestamps=[timestamp for timestamp, data in frames])
+        finally:
+            for i, frame in enumerate(frames):
+                self.drop(i, frame)
+
+    def on_stop(self):
+        with self.condition:
+            pending = [(i, frame) for i, frames in enumerate(self.pending) for frame in frames]
+            for frames in self.pending:
+                frames.clear()
+        for i, frame in pending:
+            self.drop(i, frame)
+
+    def stats(self):
+        with self.condition:
+            return {
+                **LoopThread.stats(self),
+                'sets': self.sets,
+                'unmatched': list(self.unmatched),
+                'late': list(self.late),
+                'pending': [len(pending) for pending in self.pending],
+            }
+
+
+class StreamGroup:
+    '''
+    Reads several inputs on a common clock and emits frame sets aligned by timestamp.
+
+    Args:
+        inputs (list): input specs. Each spec is a dict with the keys 'type', 'config' and 'id', see create_input.
+        tolerance (float): largest timestamp difference, in seconds, between frames of a set.
+        on_frames (func): called with each aligned set. Function should take fn(data=[...], timestamps=[...]).
+        outputs (list): optional output specs, one per input, each a dict with the keys 'type', 'config' and 'path'.
+            Each input's frames of the aligned sets are written to its output, so the recordings stay in step.
+        frequency (int): frequency of every reader. Defaults to the fps of the first input.
+        buffer_size (int): frames kept per input while waiting for a match.
+        reading/writing (bool): whether to read/write on start.
+    '''
+
+    def __init__(self,
+        inputs=[], tolerance=0.005, on_frames=None, outputs=None,
+        frequency=None, buffer_size=30,
+        reading=False, writing=False,
+    ):
+        if not inputs:
+            raise ValueError('StreamGroup requires at least one input.')
+        if outputs is not None and len(outputs) != len(inputs):
+            raise ValueError(f'StreamGroup got {len(outputs)} outputs for {len(inputs)} inputs.')
+
+        self.inputs = inputs
+        self.outputs = outputs
+        self.on_frames = on_frames
+        self.writing = False
+
+        self.readers = []
+        self.writers = []
+        self.queues = [SafeQueue(700, module=f'{str(self)}:{i}') for i in range(len(inputs))]
+        atexit.register(self.stop)
+
+        self.aligner = Aligner(
+            len(inputs), tolerance=tolerance, on_set=self.on_set, buffer_size=buffer_size,
+            retain=self.retain, release=self.release,
+        )
+
+        for i, (spec, q) in enumerate(zip(self.inputs, self.queues)):
+            reader = Reader(
+                q, on_read=self.on_read_callback(i), type=spec.get('type', 'usb'), config=spec.get('config', {}),
+                id=spec.get('id', 0), frequency=frequency,
+            )
+            self.readers.append(reader)
+            if frequency is None:
+                frequency = reader.frequency
+
+        # start every reader on the same schedule
+        start_at = time.monotonic() + START_DELAY
+        for reader in self.readers:
+            reader.start_at = start_at
+            reader.start()
+        self.aligner.start()
+
+        if self.outputs is not None:
+            for reader, q, spec in zip(self.readers, self.queues, self.outputs):
+                writer = Writer(
+                    q, type=spec.get('type', 'ffmpeg'), config=spec.get('config', {}), path=spec.get('path', '.'),
+                    frequency=reader.frequency, input_config=reader.input.output_config(),
+                    release=reader.input.release,
+                )
+                writer.start()
+                self.writers.append(writer)
+
+        if reading:
+            self.start_reading()
+        if writing:
+            self.start_writing()
+
+    def on_read_callback(self, index):
+        '''Returns an on_read callback that hands frames of input 'index' to the aligner.'''
+        def on_read(data=None, timestamp=None):
+            self.aligner.push(index, data, timestamp)
+        return on_read
+
+    def retain(self, index, data):
+        self.readers[index].input.retain(data)
+
+    def release(self, index, data):
+        self.readers[index].input.release(data)
+
+    def on_set(self, data=None, timestamps=None):
+        if self.on_frames is not None:
+            self.on_frames(data=data, timestamps=timestamps)
+        if self.writing:
+            for i, (q, frame, timestamp) in enumerate(zip(self.queues, data, timestamps)):
+                # the queue's reference, released by the writer or when the queue drops it
+                self.retain(i, frame)
+                q.offer((frame, timestamp))
+
+    def start_reading(self):
+        '''Starts reading in frames.'''
+        for reader in self.readers:
+            reader.reading = True
+        log.info(f'{str(self)} reading started - {time.time()}')
+
+    def stop_reading(self):
+        '''Stops reading in frames.'''
+        for reader in self.readers:
+            reader.reading = False
+        log.info(f'{str(self)} reading stopped - {time.time()}')
+
+    def start_writing(self):
+        '''Starts writing aligned frames to the outputs.'''
+        for writer in self.writers:
+            writer.initialize_writer()
+            writer.writing = True
+        self.writing = bool(self.writers)
+        log.info(f'{str(self)} writing started - {time.time()}')
+
+    def stop_writing(self):
+        '''Stops writing frames.'''
+        self.writing = False
+        for writer in self.writers:
+            writer.stop_writing()
+        log.info(f'{str(self)} writing stopped - {time.time()}')
+
+    def stats(self):
+        '''Returns the aligner's set/unmatched/late counters and each reader's loop statistics.'''
+        return {
+            'aligner': self.aligner.stats(),
+            'readers': [reader.stats() for reader in self.readers],
+            'queues': [q.stats() for q in self.queues],
+        }
+
+    def stop(self):
+        self.stop_reading()
+        self.stop_writing()
+        for reader in self.readers:
+            reader.stop()
+        self.aligner.stop()
+        for writer in self.writers:
+            writer.stop()
+
+    def __str__(self):
+        return f'{self.__class__.__name__}'
@@ -1,4 +1,5 @@
 import logging
+import threading
 from . loop_thread import LoopThread
 from . output.output_factory import create_output
 
@@ -6,21 +7,52 @@ log = logging.getLogger(__name__)
 
 
 class Writer(LoopThread):
-    '''Writes data from a queue into an output file.'''
-    def __init__(self, q, on_write=None, type='ffmpeg', config={}, path=0, frequency=None, writing=False, input_config={}):
+    '''
+    Writes data from a queue into an output file.
+    The queue holds (item, timestamp) entries, the timestamp being the frame's capture time,
+    which is passed on to the output.
+    If a FramePool is passed, items are slot indices, which are released once written.
+    Otherwise, release (eg: Input.release) is called with each frame once written.
+    If batch is set, every queued frame is dequeued on each loop and handed to the output as one batch.
+    If event_driven is set, the Writer is not paced and wakes up when frames are queued.
+    stop_writing() has the writer thread itself write out the queue and close the output,
+    so frames it already dequeued are never written after the output is closed.
+    '''
+    def __init__(self, q, on_write=None, type='ffmpeg', config={}, path=0, frequency=None, writing=False, input_config={}, pool=None, release=None, batch=False, event_driven=False, pacing='catch_up'):
         self.q = q
+        self.pool = pool
+        self.release = pool.release if pool is not None else release
+        self.batch = batch
         self.on_write = on_write
+        self._writing = threading.Event()
         self.writing = writing
+        # set by stop_writing, cleared by the writer thread once the output is closed
+        self._stop_requested = threading.Event()
+        self._writing_stopped = threading.Event()
         self.frequency = frequency
+        self.event_driven = event_driven
 
         self.type = type
         self.config = config
         self.path = path
         self.input_config = input_config
 
+        if self.event_driven:
+            self.frequency = 0
         if self.frequency is None:
             self.frequency = self.config.get('fps', 100)
-        LoopThread.__init__(self, frequency=self.frequency)
+        LoopThread.__init__(self, frequency=self.frequency, pacing=pacing)
+
+    @property
+    def writing(self):
+        return self._writing.is_set()
+
+    @writing.setter
+    def writing(self, writing):
+        if writing:
+            self._writing.set()
+        else:
+            self._writing.clear()
 
     def initialize_writer(self):
         self.output = create_output(type=self.type, config=self.config, path=self.path, input_config=self.input_config)
@@ -28,24 +60,114 @@ class Writer(LoopThread):
         self.frames_written = 0
 
     def loop(self):
-        if self.writing:
-            data = self.q.get_nowait()
-            if data is not None:
-                self.output.write(data)
-                self.frames_written += 1
-                if self.on_write is not None:
+        if self._stop_requested.is_set():
+            self.finish_writing()
+            return
+
+        if not self.writing:
+            if self.event_driven:
+                self._writing.wait(self.wait_timeout)
+            return
+
+        if self.batch:
+            entries = self.q.get_many(block=self.event_driven, timeout=self.wait_timeout)
+            if entries:
+                self.write_many(entries)
+            return
+
+        if self.event_driven:
+            entry = self.q.get(timeout=self.wait_timeout)
+        else:
+            entry = self.q.get_nowait()
+        if entry is not None:
+            self.write(entry)
+
+    def write(self, entry):
+        '''Writes a queued (item, timestamp), releasing the item afterwards.'''
+        item, timestamp = entry
+        if self.pool is None:
+            data = item
+        else:
+            data = self.pool.slots[item]
+
+        try:
+            self.output.write(data, timestamp=timestamp)
+            self.frames_written += 1
+            if self.on_write is not None:
+                self.on_write(data=data)
+        finally:
+            if self.release is not None:
+                self.release(item)
+
+    def write_many(self, entries):
+        '''Writes a batch of queued (item, timestamp), releasing the items afterwards.'''
+        items = [item for item, timestamp in entries]
+        if self.pool is None:
+            frames = items
+        else:
+            frames = [self.pool.slots[item] for item in items]
+
+        try:
+            self.output.write_many(frames, timestamps=[timestamp for item, timestamp in entries])
+            self.frames_written += len(frames)
+            if self.on_write is not None:
+                for data in frames:
                     self.on_write(data=data)
+        finally:
+            if self.release is not None:
+                for item in items:
+                    self.release(item)
+
+    def stats(self):
+        '''Loop statistics, with the output's counters under 'output' once writing has started.'''
+        output = getattr(self, 'output', None)
+        return {**LoopThread.stats(self), 'output': output.stats() if output is not None else {}}
 
     def set_path(self, path=None):
         self.output.set_path(path)
         log.info(f'{str(self)} path set to {path}')
 
-    def on_stop(self):
-        # clear out the current q
-        if self.writing:
-            purge = self.q.to_list()
-            for data in purge:
-                self.output.write(data)
+    def stop_writing(self):
+        '''
+        Stops writing, and blocks until every queued frame is written and the output is closed.
+        That happens on the writer thread, or on the calling thread if the writer thread is not running.
+        '''
+        if not self.writing:
+            return
+        if threading.current_thread() is self or not self.is_alive():
+            self.finish_writing()
+            return
+
+        self._writing_stopped.clear()
+        self._stop_requested.set()
+        while not self._writing_stopped.wait(self.wait_timeout):
+            if not self.is_alive():
+                break
+        if self._stop_requested.is_set():
+            # the thread exited before seeing the request
+            self.finish_writing()
+
+    def finish_writing(self):
+        '''Writes out the queue and closes the output, if writing.'''
+        self._stop_requested.clear()
+        try:
+            if self.writing:
+                self.writing = False
+                self.drain()
+        finally:
+            self._writing_stopped.set()
+
+    def drain(self):
+        '''Writes every queued frame and closes the output.'''
+        purge = self.q.remove_existing()
+        try:
+            if purge:
+                self.write_many(purge)
+        finally:
             self.output.close()
             log.info(f'Stopped {str(self.output)}.')
             self.frames_written = 0
+
+    def on_stop(self):
+        # clear out the current q
+        self.finish_writing()
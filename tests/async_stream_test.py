@@ -0,0 +1,79 @@
+import os
+import asyncio
+import numpy as np
+from utils import SAMPLE_VIDEO, get_tmp_file, rm_tmp_dir
+from senseye_cameras import AsyncInput, AsyncStream
+
+
+def run_until_complete(coroutine):
+    '''asyncio.run needs python 3.7.'''
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_input_frames():
+    async def read():
+        count = 0
+        async with AsyncInput.create(type='usb', id=SAMPLE_VIDEO) as cam:
+            async for frame, timestamp in cam.frames():
+                assert frame is not None
+                count += 1
+                if count == 5:
+                    break
+        return count
+
+    assert run_until_complete(read()) == 5
+
+
+def test_stream_frames():
+    TMP_FILE = get_tmp_file(extension='.raw')
+
+    async def run():
+        stream = await AsyncStream.create(
+            input_type='usb', id=SAMPLE_VIDEO,
+            output_type='raw', path=TMP_FILE,
+            reading=True, frame_pool=8,
+        )
+        await stream.start_writing()
+        timestamps = []
+        async for frame, timestamp in stream.frames(maxsize=4):
+            assert frame.shape == (1080, 1920, 3)
+            timestamps.append(timestamp)
+            if len(timestamps) == 10:
+                break
+        await stream.stop_writing()
+        await stream.stop()
+        return timestamps, stream
+
+    timestamps, stream = run_until_complete(run())
+
+    assert timestamps == sorted(timestamps)
+    assert stream.buffers == []
+    assert os.stat(TMP_FILE).st_size > 0
+    rm_tmp_dir()
+
+
+def test_stream_frames_held():
+    '''Frames handed to the consumer are not read into again until it moves on.'''
+    async def run():
+        stream = await AsyncStream.create(
+            input_type='usb', id=SAMPLE_VIDEO, input_config={'reuse_buffer': True},
+            reading=True,
+        )
+        count = 0
+        async for frame, timestamp in stream.frames(maxsize=4, overflow='drop_oldest'):
+            copy = frame.copy()
+            await asyncio.sleep(0.05)
+            assert np.array_equal(frame, copy)
+            count += 1
+            if count == 10:
+                break
+        await stream.stop()
+        return stream
+
+    stream = run_until_complete(run())
+    assert stream.buffers == []
+    assert not any(stream.stream.reader.input.buffers.refs)
@@ -1,8 +1,13 @@
+import io
 import os
 import time
 import logging
+import ffmpeg
+import pytest
+import numpy as np
 from utils import get_tmp_file, rm_tmp_dir
 from senseye_cameras import create_input, Stream
+from senseye_cameras.input.input import BufferRing
 
 log = logging.getLogger(__name__)
 
@@ -49,3 +54,51 @@ def test_stream():
 
     assert os.stat(get_tmp_file()).st_size > 0
     rm_tmp_dir()
+
+
+class ChunkedPipe(io.RawIOBase):
+    '''Pipe stand-in that returns at most 'chunk' bytes per read, like a busy pipe.'''
+    def __init__(self, data, chunk=1000):
+        self.data = memoryview(data)
+        self.chunk = chunk
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self.chunk, len(self.data))
+        b[:n] = self.data[:n]
+        self.data = self.data[n:]
+        return n
+
+
+def test_short_reads():
+    '''Frames are assembled from short pipe reads, and a partial last frame is not returned.'''
+    res = (32, 16, 3)
+    frames = np.arange(2 * 16 * 32 * 3, dtype=np.uint32).astype(np.uint8).reshape(2, 16, 32, 3)
+    data = frames.tobytes() + b'partial'
+
+    cam = create_input(type='ffmpeg', id=0, config={'res': res, 'reuse_buffer': True})
+    cam.input = io.BufferedReader(ChunkedPipe(data), buffer_size=64)
+    cam.buffers = BufferRing(cam.frame_shape())
+
+    first, timestamp = cam.read()
+    assert np.array_equal(first, frames[0])
+    cam.release(first)
+    frame, timestamp = cam.read()
+    assert np.array_equal(frame, frames[1])
+    # released buffers are read into again
+    assert frame is first
+
+    frame, timestamp = cam.read()
+    assert frame is None
+    assert cam.throughput()['frames'] == 2
+
+
+@pytest.mark.parametrize('source', ['testsrc=size=8x4:duration=0.04', 'nosuchfilter'])
+def test_open_exited(monkeypatch, source):
+    '''An ffmpeg camera that exits on start up fails to open, even if it exited cleanly.'''
+    cam = create_input(type='ffmpeg', id=0, config={'res': (8, 4, 3)})
+    monkeypatch.setattr(cam, 'command', lambda: ffmpeg.input(source, f='lavfi').output('pipe:', format='rawvideo', pix_fmt='rgb24'))
+    with pytest.raises(Exception, match='Failed to open ffmpeg camera'):
+        cam.open()
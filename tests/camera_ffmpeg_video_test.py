@@ -0,0 +1,79 @@
+import os
+import time
+import numpy as np
+from utils import SAMPLE_VIDEO, get_tmp_file, rm_tmp_dir
+from senseye_cameras import create_input, Stream
+
+# res and fps are set so the tests do not need ffprobe
+CONFIG = {'res': (64, 36), 'fps': 30}
+
+
+def read_all(cam):
+    frames = []
+    while True:
+        frame, timestamp = cam.read()
+        if frame is None:
+            return frames
+        frames.append(frame)
+
+
+def test_read():
+    cam = create_input(type='ffmpeg_video', id=SAMPLE_VIDEO, config={**CONFIG, 'threads': 2})
+    cam.open()
+    frames = read_all(cam)
+    assert len(frames) == cam.frame_count() > 0
+    assert frames[0].shape == cam.frame_shape() == (36, 64, 3)
+    cam.close()
+
+
+def test_trim():
+    cam = create_input(type='ffmpeg_video', id=SAMPLE_VIDEO, config={**CONFIG, 'start': 1, 'end': 2, 'pixel_format': 'gray'})
+    cam.open()
+    frames = read_all(cam)
+    assert len(frames) == cam.frame_count() == 30
+    assert frames[0].shape == (36, 64)
+    cam.close()
+
+
+def test_seek():
+    cam = create_input(type='ffmpeg_video', id=SAMPLE_VIDEO, config=CONFIG)
+    cam.open()
+    frames = [cam.read()[0] for i in range(20)]
+    cam.seek(10)
+    assert cam.tell() == 10
+    frame, timestamp = cam.read()
+    assert np.array_equal(frame, frames[10])
+    assert cam.tell() == 11
+    cam.close()
+
+
+def test_stream():
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='ffmpeg_video', id=SAMPLE_VIDEO, input_config=CONFIG,
+        output_type='raw', path=TMP_FILE,
+        reading=True, writing=True,
+    )
+    time.sleep(1)
+    s.stop()
+
+    assert os.stat(TMP_FILE).st_size > 0
+    assert os.stat(TMP_FILE).st_size % (64 * 36 * 3) == 0
+    rm_tmp_dir()
+
+
+def test_roi():
+    '''ffmpeg crops to the region of interest, and scales it down by the binning factor.'''
+    full = create_input(type='ffmpeg_video', id=SAMPLE_VIDEO, config=CONFIG)
+    cropped = create_input(type='ffmpeg_video', id=SAMPLE_VIDEO, config={**CONFIG, 'roi': (8, 4, 32, 16)})
+    binned = create_input(type='ffmpeg_video', id=SAMPLE_VIDEO, config={**CONFIG, 'roi': (8, 4, 32, 16), 'binning': 2})
+    for cam in (full, cropped, binned):
+        cam.open()
+
+    frame, timestamp = full.read()
+    assert np.array_equal(cropped.read()[0], frame[4:20, 8:40])
+    assert binned.read()[0].shape == binned.frame_shape() == (8, 16, 3)
+    assert binned.output_config()['res'] == (16, 8, 3)
+
+    for cam in (full, cropped, binned):
+        cam.close()
@@ -1,5 +1,18 @@
+import os
+import time
+import types
 import logging
-from senseye_cameras import create_input
+import threading
+import contextlib
+import pytest
+import numpy as np
+from pathlib import Path
+from utils import get_tmp_file, rm_tmp_dir
+from senseye_cameras import create_input, Stream
+from senseye_cameras.input import camera_pylon
+from senseye_cameras.input.camera_pylon import (
+    encode_metadata, encode_timestamp, encode_framenumber, extract_baked_data,
+)
 
 log = logging.getLogger(__name__)
 
@@ -25,3 +38,239 @@ def test_read():
     assert frame is not None
 
     cam.close()
+
+
+def encode_bytewise(np_image, timestamp, n):
+    '''The original, byte by byte, metadata encoding.'''
+    t = int(timestamp*1e6)
+    for i in range(7):
+        np_image[0][i] = t & 0xFF
+        t >>= 8
+    for i in range(4):
+        np_image[0][i+7] = n & 0xFF
+        n >>= 8
+
+
+@pytest.mark.parametrize('shape', [(4, 16), (4, 16, 3)])
+def test_encode_metadata(shape):
+    '''The vectorized encoding matches the byte by byte encoding.'''
+    timestamp = 1571234567.123456
+    expected = np.zeros(shape, dtype=np.uint8)
+    encode_bytewise(expected, timestamp, 123456789)
+
+    frame = np.zeros(shape, dtype=np.uint8)
+    encode_metadata(frame, timestamp, 123456789)
+    assert np.array_equal(frame, expected)
+
+    frame = np.zeros(shape, dtype=np.uint8)
+    encode_timestamp(frame, timestamp)
+    encode_framenumber(frame, 123456789)
+    assert np.array_equal(frame, expected)
+
+
+def test_extract_baked_data():
+    res = (16, 4)
+    timestamps = 1571234567 + np.arange(50) / 60
+    frames = np.zeros((50, res[1], res[0]), dtype=np.uint8)
+    for n, (frame, timestamp) in enumerate(zip(frames, timestamps)):
+        encode_metadata(frame, timestamp, n)
+
+    TMP_FILE = get_tmp_file(extension='.raw')
+    Path(TMP_FILE).parent.mkdir(parents=True, exist_ok=True)
+    frames.tofile(TMP_FILE)
+
+    decoded_timestamps, framenumbers = extract_baked_data(TMP_FILE, res)
+    assert np.array_equal(framenumbers, np.arange(50))
+    assert np.allclose(decoded_timestamps, timestamps, atol=1e-6)
+    rm_tmp_dir()
+
+
+class Value:
+    def __init__(self, value):
+        self.Value = value
+
+    def GetValue(self):
+        return self.Value
+
+    def SetValue(self, value):
+        self.Value = value
+
+
+class FakeGrabResult:
+    def __init__(self, array, skipped=0):
+        self.array = array
+        self.skipped = skipped
+
+    def GrabSucceeded(self):
+        return True
+
+    @contextlib.contextmanager
+    def GetArrayZeroCopy(self):
+        yield self.array
+
+    def GetNumberOfSkippedImages(self):
+        return self.skipped
+
+
+class FakeInstantCamera:
+    '''Stand-in for pylon.InstantCamera, grabbing numbered 4x8 images at a fixed rate in its own thread.'''
+
+    def __init__(self, device=None):
+        self.is_open = False
+        self.handler = None
+        self.grabbing = threading.Event()
+        self.PixelFormat = Value('Mono8')
+        self.Gain = Value(0)
+        self.ExposureTime = Value(1000)
+        self.Width = Value(8)
+        self.Height = Value(4)
+        self.ResultingFrameRate = Value(500)
+        self.MaxNumBuffer = Value(10)
+
+    def Open(self):
+        self.is_open = True
+
+    def IsOpen(self):
+        return self.is_open
+
+    def Close(self):
+        self.is_open = False
+
+    def RegisterImageEventHandler(self, handler, mode, cleanup):
+        self.handler = handler
+
+    def DeregisterImageEventHandler(self, handler):
+        self.handler = None
+
+    def StartGrabbing(self, strategy, loop=None):
+        self.strategy = strategy
+        self.grabbing.set()
+        self.thread = threading.Thread(target=self.grab_loop, daemon=True)
+        self.thread.start()
+
+    def StopGrabbing(self):
+        # like pylon, returns once the grab thread is done
+        if self.grabbing.is_set():
+            self.grabbing.clear()
+            self.thread.join()
+
+    def grab_loop(self):
+        n = 0
+        while self.grabbing.is_set():
+            self.handler.OnImageGrabbed(self, FakeGrabResult(np.full((4, 8), n % 256, dtype=np.uint8)))
+            n += 1
+            time.sleep(1 / self.ResultingFrameRate.Value)
+
+
+def fake_pylon():
+    factory = types.SimpleNamespace(EnumerateDevices=lambda: [None], CreateDevice=lambda device: device)
+    return types.SimpleNamespace(
+        TlFactory=types.SimpleNamespace(GetInstance=lambda: factory),
+        InstantCamera=FakeInstantCamera,
+        ImageEventHandler=object,
+        GrabStrategy_LatestImageOnly='latest',
+        GrabStrategy_OneByOne='one_by_one',
+        GrabLoop_ProvidedByInstantCamera='provided',
+        RegistrationMode_ReplaceAll='replace_all',
+        Cleanup_None='none',
+    )
+
+
+def test_event_grabbing(monkeypatch):
+    monkeypatch.setattr(camera_pylon, 'pylon', fake_pylon())
+    cam = create_input(type='pylon', id=0, config={'grab_mode': 'event', 'max_num_buffer': 4})
+    cam.open()
+    assert cam.input.MaxNumBuffer.Value == 4
+    # event mode queues every image by default
+    assert cam.input.strategy == 'one_by_one'
+
+    frames = [cam.read()[0] for i in range(20)]
+    assert all(frame is not None and frame.shape == (4, 8) for frame in frames)
+    # frames are copies, and arrive in grab order
+    assert not any(np.shares_memory(frame, cam.ring) for frame in frames)
+    values = [int(frame[0, 0]) for frame in frames]
+    assert values == sorted(values)
+
+    out = np.zeros((4, 8), dtype=np.uint8)
+    frame, timestamp = cam.read_into(out)
+    assert frame is out and timestamp is not None
+
+    cam.close()
+    stats = cam.stats()
+    assert stats['delivered'] == 21
+    assert stats['grabbed'] == stats['delivered'] + stats['skipped'] + stats['pending']
+
+
+def test_event_grabbing_skips(monkeypatch):
+    '''A reader that falls behind gets the newest frames, and the recycled ones are counted as skipped.'''
+    monkeypatch.setattr(camera_pylon, 'pylon', fake_pylon())
+    cam = create_input(type='pylon', id=0, config={'grab_mode': 'event', 'max_num_buffer': 2})
+    cam.open()
+    time.sleep(0.1)
+    cam.read()
+    cam.close()
+    assert cam.stats()['skipped'] > 0
+
+
+def test_event_grabbing_zero_copy(monkeypatch):
+    '''Read frames are ring views, which are not recycled while held.'''
+    monkeypatch.setattr(camera_pylon, 'pylon', fake_pylon())
+    cam = create_input(type='pylon', id=0, config={'grab_mode': 'event', 'max_num_buffer': 3, 'zero_copy': True})
+    cam.open()
+
+    frame, timestamp = cam.read()
+    assert np.shares_memory(frame, cam.ring)
+    cam.retain(frame)
+    value = frame.copy()
+    cam.release(frame)
+    time.sleep(0.05)
+    # still held by the retained reference
+    assert np.array_equal(frame, value)
+    assert cam.stats()['held'] == 1
+
+    cam.release(frame)
+    assert cam.stats()['held'] == 0
+    for i in range(10):
+        frame, timestamp = cam.read()
+        assert frame is not None
+        cam.release(frame)
+    cam.close()
+
+
+def test_event_grabbing_ring_held(monkeypatch):
+    '''With every ring frame held, grabbed images are dropped and counted as skipped.'''
+    monkeypatch.setattr(camera_pylon, 'pylon', fake_pylon())
+    cam = create_input(type='pylon', id=0, config={'grab_mode': 'event', 'max_num_buffer': 1, 'zero_copy': True})
+    cam.open()
+
+    frame, timestamp = cam.read()
+    value = frame.copy()
+    time.sleep(0.05)
+    assert np.array_equal(frame, value)
+    assert cam.read() == (None, None)
+
+    cam.release(frame)
+    assert cam.read()[0] is not None
+    cam.close()
+    stats = cam.stats()
+    assert stats['skipped'] > 0
+    assert stats['grabbed'] == stats['delivered'] + stats['skipped'] + stats['pending']
+
+
+def test_event_grabbing_stream(monkeypatch):
+    '''Streams read ring views, and release every one of them.'''
+    monkeypatch.setattr(camera_pylon, 'pylon', fake_pylon())
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='pylon', input_config={'grab_mode': 'event', 'max_num_buffer': 4},
+        output_type='raw', path=TMP_FILE,
+        reading=True, writing=True, event_driven=True,
+    )
+    assert s.reader.input.config.get('zero_copy') is True
+    time.sleep(0.5)
+    s.stop()
+
+    assert os.stat(TMP_FILE).st_size > 0
+    assert os.stat(TMP_FILE).st_size % (4 * 8) == 0
+    assert s.reader.input.stats()['held'] == 0
+    rm_tmp_dir()
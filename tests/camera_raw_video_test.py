@@ -1,5 +1,8 @@
 import os
 import time
+import pytest
+import numpy as np
+from pathlib import Path
 from senseye_cameras import create_input, Stream
 from utils import SAMPLE_RAW_VIDEO, get_tmp_file, rm_tmp_dir
 
@@ -39,3 +42,79 @@ def test_stream():
 
     assert os.stat(TMP_FILE).st_size > 0
     rm_tmp_dir()
+
+
+def write_raw_video(path, count=10, res=(4, 6, 3)):
+    '''Writes 'count' frames, each filled with its index.'''
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    frames = np.repeat(np.arange(count, dtype=np.uint8), int(np.prod(res))).reshape((count,) + res)
+    frames.tofile(path)
+    return frames
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_seek(mmap):
+    TMP_FILE = get_tmp_file(extension='.raw')
+    frames = write_raw_video(TMP_FILE)
+
+    cam = create_input(type='raw_video', id=TMP_FILE, config={'res': (4, 6, 3), 'mmap': mmap})
+    cam.open()
+
+    assert cam.frame_count() == len(cam) == 10
+    cam.seek(7)
+    assert cam.tell() == 7
+    frame, timestamp = cam.read()
+    assert np.array_equal(frame, frames[7])
+
+    cam.seek(2)
+    batch = cam.read_batch(3)
+    assert batch.shape == (3, 4, 6, 3)
+    assert np.array_equal(batch, frames[2:5])
+    assert cam.tell() == 5
+
+    cam.seek(8)
+    assert len(cam.read_batch(5)) == 2
+    assert cam.read()[0] is None
+
+    cam.close()
+    rm_tmp_dir()
+
+
+def test_mmap_slicing():
+    TMP_FILE = get_tmp_file(extension='.raw')
+    frames = write_raw_video(TMP_FILE)
+
+    cam = create_input(type='raw_video', id=TMP_FILE, config={'res': (4, 6, 3), 'mmap': True})
+    cam.open()
+
+    assert np.array_equal(cam[3:6], frames[3:6])
+    # frames are views into the file, not copies
+    assert np.shares_memory(cam[3:6], cam.input)
+    assert np.array_equal(cam[-1], frames[-1])
+
+    cam.close()
+    rm_tmp_dir()
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_roi(mmap):
+    '''Cropped frames are the region of interest of the full frames, with every 2nd pixel kept.'''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    Path(TMP_FILE).parent.mkdir(parents=True, exist_ok=True)
+    frames = np.random.RandomState(0).randint(0, 256, size=(5, 8, 10), dtype=np.uint8)
+    frames.tofile(TMP_FILE)
+
+    cam = create_input(type='raw_video', id=TMP_FILE, config={'res': (8, 10), 'mmap': mmap, 'roi': (2, 1, 6, 5), 'binning': 2})
+    cam.open()
+    assert cam.frame_shape() == (3, 3)
+    assert cam.output_config()['res'] == (3, 3)
+
+    frame, timestamp = cam.read()
+    assert np.array_equal(frame, frames[0, 1:6:2, 2:8:2])
+    out = np.zeros(cam.frame_shape(), dtype=np.uint8)
+    frame, timestamp = cam.read_into(out)
+    assert frame is out and np.array_equal(out, frames[1, 1:6:2, 2:8:2])
+    assert np.array_equal(cam.read_batch(3), frames[2:5, 1:6:2, 2:8:2])
+
+    cam.close()
+    rm_tmp_dir()
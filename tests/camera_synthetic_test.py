@@ -0,0 +1,60 @@
+import time
+import pytest
+import numpy as np
+from utils import get_tmp_file, rm_tmp_dir
+from senseye_cameras import create_input, Stream
+from senseye_cameras.input.camera_pylon import decode_framenumbers, extract_baked_data
+
+
+@pytest.mark.parametrize('pattern', ['noise', 'gradient', 'shapes'])
+@pytest.mark.parametrize('pixel_format, shape', [('gray', (48, 64)), ('rgb24', (48, 64, 3)), ('bgra', (48, 64, 4))])
+def test_read(pattern, pixel_format, shape):
+    cam = create_input(type='synthetic', config={'res': (64, 48), 'pixel_format': pixel_format, 'pattern': pattern, 'throttle': False})
+    cam.open()
+    assert cam.frame_shape() == shape
+
+    frames = np.stack([cam.read()[0] for i in range(5)])
+    assert frames.shape == (5,) + shape
+    assert np.array_equal(decode_framenumbers(frames), np.arange(5))
+
+    out = np.zeros(shape, dtype=np.uint8)
+    frame, timestamp = cam.read_into(out)
+    assert frame is out
+    cam.close()
+
+
+def test_channels():
+    cam = create_input(type='synthetic', config={'channels': 1})
+    assert cam.config['pixel_format'] == 'gray'
+    with pytest.raises(ValueError):
+        create_input(type='synthetic', config={'channels': 2})
+    with pytest.raises(ValueError):
+        create_input(type='synthetic', config={'pixel_format': 'rgb24', 'channels': 4})
+
+
+def test_throttle():
+    cam = create_input(type='synthetic', config={'res': (32, 8), 'fps': 100})
+    cam.open()
+    start = time.monotonic()
+    for i in range(21):
+        cam.read()
+    assert time.monotonic() - start >= 0.2
+    cam.close()
+
+
+def test_stream():
+    '''Unthrottled frames are recorded in order. Frames read while the pool is exhausted are not recorded.'''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='synthetic', input_config={'res': (64, 48), 'pixel_format': 'gray', 'throttle': False},
+        output_type='raw', path=TMP_FILE,
+        reading=True, writing=True,
+        frame_pool=32, event_driven=True, overflow='block',
+    )
+    time.sleep(1)
+    s.stop()
+
+    timestamps, framenumbers = extract_baked_data(TMP_FILE, (64, 48))
+    assert len(framenumbers) > 0
+    assert np.all(np.diff(framenumbers.astype(np.int64)) >= 1)
+    rm_tmp_dir()
@@ -1,5 +1,12 @@
+import os
+import time
+import ctypes
 import logging
-from senseye_cameras import create_input
+import numpy as np
+import pytest
+from utils import get_tmp_file, rm_tmp_dir
+from senseye_cameras import create_input, Stream
+from senseye_cameras.input import camera_ueye
 
 log = logging.getLogger(__name__)
 
@@ -25,3 +32,159 @@ def test_read():
     assert frame is not None
 
     cam.close()
+
+
+class INT(ctypes.c_int):
+    def __truediv__(self, other):
+        return self.value / other
+
+
+class FakeUeye:
+    '''
+    Stand-in for pyueye.ueye, capturing numbered 8x4 mono frames.
+    Each wait captures into the next unlocked image memory of the sequence.
+    '''
+    IS_SUCCESS = 0
+    IS_TIMED_OUT = 122
+    IS_COLORMODE_BAYER = 2
+    IS_COLORMODE_CBYCRY = 4
+    IS_CM_MONO8 = 6
+    IS_CM_BGRA8_PACKED = 0
+
+    INT = INT
+    int = INT
+    UINT = ctypes.c_uint
+    c_uint = ctypes.c_uint
+    c_int = ctypes.c_int
+    double = ctypes.c_double
+    c_mem_p = ctypes.c_void_p
+    sizeof = staticmethod(ctypes.sizeof)
+
+    def __init__(self):
+        self.memories = {}
+        self.sequence = []
+        self.locked = set()
+        self.count = 0
+
+    def __getattr__(self, name):
+        # remaining constants and setters are not needed by these tests
+        if name.isupper() or '_CMD_' in name:
+            return 0
+        return lambda *args: self.IS_SUCCESS
+
+    def HIDS(self, id):
+        return id
+
+    def IS_RECT(self):
+        return ctypes.c_int()
+
+    def is_AOI(self, hcam, command, rect, size):
+        rect.s32Width, rect.s32Height = INT(8), INT(4)
+        return self.IS_SUCCESS
+
+    def SENSORINFO(self):
+        class SensorInfo:
+            nColorMode = ctypes.c_char(b'\x01')
+        return SensorInfo()
+
+    def is_AllocImageMem(self, hcam, width, height, bits, mem_image, mem_id):
+        memory = np.zeros(width.value * height.value * bits.value // 8, dtype=np.uint8)
+        mem_id.value = len(self.memories) + 1
+        mem_image.value = memory.ctypes.data
+        self.memories[mem_id.value] = memory
+        return self.IS_SUCCESS
+
+    def is_AddToSequence(self, hcam, mem_image, mem_id):
+        self.sequence.append(mem_id.value)
+        return self.IS_SUCCESS
+
+    def is_WaitForNextImage(self, hcam, timeout, mem_image, mem_id):
+        for i in range(len(self.sequence)):
+            id = self.sequence[(self.count + i) % len(self.sequence)]
+            if id not in self.locked:
+                break
+        else:
+            return self.IS_TIMED_OUT
+        self.memories[id][:] = self.count % 256
+        self.count += 1
+        self.locked.add(id)
+        mem_id.value = id
+        mem_image.value = self.memories[id].ctypes.data
+        return self.IS_SUCCESS
+
+    def is_UnlockSeqBuf(self, hcam, mem_id, mem_image):
+        self.locked.discard(mem_id.value)
+        return self.IS_SUCCESS
+
+    def get_data(self, mem_image, width, height, bits, pitch, copy=True):
+        memory = next(memory for memory in self.memories.values() if memory.ctypes.data == mem_image.value)
+        return memory.copy() if copy else memory
+
+
+def test_ueye_sequence(monkeypatch):
+    '''Frames are views into locked image memories, which go back to the camera once released.'''
+    ueye = FakeUeye()
+    monkeypatch.setattr(camera_ueye, 'ueye', ueye)
+    cam = create_input(type='ueye', id=0, config={'buffers': 4, 'zero_copy': True})
+    cam.open()
+    assert len(ueye.sequence) == 4
+
+    held, timestamp = cam.read()
+    assert held.shape == cam.frame_shape() == (4, 8, 1)
+    value = held[0, 0, 0]
+
+    # two queues take a reference
+    cam.retain(held)
+    cam.retain(held)
+    cam.release(held)
+    for i in range(10):
+        frame, timestamp = cam.read()
+        cam.release(frame)
+    # the held frame's memory is not captured into
+    assert held[0, 0, 0] == value
+    assert len(ueye.locked) == 1
+
+    cam.release(held)
+    assert len(ueye.locked) == 1
+    cam.release(held)
+    assert len(ueye.locked) == 0
+
+    out = np.zeros(cam.frame_shape(), dtype=np.uint8)
+    frame, timestamp = cam.read_into(out)
+    assert frame is out and len(ueye.locked) == 0
+    cam.close()
+
+
+def test_ueye_copy(monkeypatch):
+    '''Frames are copied by default, so reads never wait on memories held by the caller.'''
+    ueye = FakeUeye()
+    monkeypatch.setattr(camera_ueye, 'ueye', ueye)
+    cam = create_input(type='ueye', id=0, config={'buffers': 4})
+    cam.open()
+
+    frames = [cam.read()[0] for i in range(6)]
+    assert all(frame is not None for frame in frames)
+    assert [frame[0, 0, 0] for frame in frames] == list(range(6))
+    assert len(ueye.locked) == 0
+    cam.close()
+
+
+@pytest.mark.parametrize('zero_copy', [None, False, True])
+def test_ueye_stream(monkeypatch, zero_copy):
+    '''Every memory is handed back once its frames are written or dropped. Streams read zero copy by default.'''
+    ueye = FakeUeye()
+    monkeypatch.setattr(camera_ueye, 'ueye', ueye)
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='ueye', input_config={'buffers': 4, 'fps': 100, 'zero_copy': zero_copy},
+        output_type='raw', path=TMP_FILE,
+        reading=True, writing=True,
+    )
+    assert s.reader.input.config.get('zero_copy') == (zero_copy is not False)
+    time.sleep(1)
+    s.stop()
+
+    assert os.stat(TMP_FILE).st_size > 0
+    assert os.stat(TMP_FILE).st_size % (4 * 8) == 0
+    assert len(ueye.locked) == 0
+    rm_tmp_dir()
@@ -1,5 +1,6 @@
 import os
 import time
+import numpy as np
 from senseye_cameras import create_input, Stream
 from utils import SAMPLE_VIDEO, get_tmp_file, rm_tmp_dir
 
@@ -41,3 +42,107 @@ def test_stream():
 
     assert os.stat(TMP_FILE).st_size > 0
     rm_tmp_dir()
+
+
+def test_pixel_format():
+    '''bgr24 frames skip the conversion, and are the channel swapped rgb24 frames.'''
+    rgb = create_input(type='usb', id=SAMPLE_VIDEO)
+    bgr = create_input(type='usb', id=SAMPLE_VIDEO, config={'pixel_format': 'bgr24'})
+    rgb.open()
+    bgr.open()
+
+    assert rgb.config['pixel_format'] == 'rgb24'
+    assert bgr.config['pixel_format'] == 'bgr24'
+    rgb_frame, timestamp = rgb.read()
+    bgr_frame, timestamp = bgr.read()
+    assert np.array_equal(rgb_frame, bgr_frame[..., ::-1])
+
+    rgb.close()
+    bgr.close()
+
+
+def test_reuse_buffer():
+    cam = create_input(type='usb', id=SAMPLE_VIDEO, config={'reuse_buffer': True})
+    cam.open()
+
+    first, timestamp = cam.read()
+    second, timestamp = cam.read()
+    # a frame that is still referenced is never captured into
+    assert second is not first
+    cam.release(first)
+    third, timestamp = cam.read()
+    assert third is first
+
+    cam.close()
+
+
+def test_reuse_buffer_stream():
+    '''Frames waiting in the queue are not overwritten by later reads.'''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='usb', id=SAMPLE_VIDEO, input_config={'reuse_buffer': True},
+        output_type='raw', path=TMP_FILE,
+        on_write=lambda data=None: time.sleep(0.02),
+        reading=True, writing=True,
+    )
+    time.sleep(1.5)
+    s.stop()
+
+    frames = np.fromfile(TMP_FILE, dtype=np.uint8).reshape((-1,) + s.reader.input.frame_shape())
+    assert len(frames) > 10
+    assert len({frame.tobytes() for frame in frames}) == len(frames)
+    rm_tmp_dir()
+
+
+def test_latest_frame():
+    '''Reads return the newest grabbed frame, and count the frames grabbed in between.'''
+    cam = create_input(type='usb', id=SAMPLE_VIDEO, config={'latest_frame': True})
+    cam.open()
+
+    frame, timestamp = cam.read()
+    assert frame is not None
+    time.sleep(0.2)
+    frame, timestamp = cam.read()
+    assert frame is not None
+    assert cam.skipped > 0
+
+    cam.close()
+    assert cam.grabber is None
+
+
+def test_roi():
+    '''Cropped frames are views of the captured frame, and outputs are sized to them.'''
+    full = create_input(type='usb', id=SAMPLE_VIDEO)
+    cam = create_input(type='usb', id=SAMPLE_VIDEO, config={'roi': (100, 50, 640, 360), 'binning': 2})
+    full.open()
+    cam.open()
+    assert cam.frame_shape() == (180, 320, 3)
+    assert cam.output_config()['res'] == (320, 180, 3)
+
+    full_frame, timestamp = full.read()
+    frame, timestamp = cam.read()
+    assert np.array_equal(frame, full_frame[50:410:2, 100:740:2])
+
+    full_frame, timestamp = full.read()
+    out = np.zeros(cam.frame_shape(), dtype=np.uint8)
+    frame, timestamp = cam.read_into(out)
+    assert frame is out and np.array_equal(out, full_frame[50:410:2, 100:740:2])
+
+    full.close()
+    cam.close()
+
+
+def test_roi_stream():
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='usb', id=SAMPLE_VIDEO, input_config={'roi': (0, 0, 64, 32)},
+        output_type='raw', path=TMP_FILE,
+        reading=True, writing=True,
+    )
+    time.sleep(1)
+    s.stop()
+
+    assert s.writer.output.config['res'] == (64, 32, 3)
+    assert os.stat(TMP_FILE).st_size > 0
+    assert os.stat(TMP_FILE).st_size % (64 * 32 * 3) == 0
+    rm_tmp_dir()
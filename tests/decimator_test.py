@@ -0,0 +1,39 @@
+import pytest
+from senseye_cameras.decimator import Decimator
+
+
+def test_ratio():
+    d = Decimator(ratio=3, input_fps=60)
+    assert [d.keep() for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert d.output_fps() == 20
+    assert d.stats()['kept'] == 3 and d.stats()['skipped'] == 4
+
+    d.reset()
+    assert d.keep()
+
+
+def test_fps():
+    '''Frames are kept by capture timestamp, tolerating jitter and gaps.'''
+    d = Decimator(fps=20, input_fps=60)
+    timestamps = [i / 60 for i in range(12)]
+    # a capture a little early still counts as due
+    timestamps[3] -= 0.004
+    kept = [t for t in timestamps if d.keep(t)]
+    assert kept == [timestamps[0], timestamps[3], timestamps[6], timestamps[9]]
+
+    # after a capture gap, the schedule restarts from the next frame
+    assert d.keep(10.0)
+    assert not d.keep(10.0 + 1 / 60)
+    assert d.keep(10.0 + 3 / 60)
+
+
+def test_output_fps():
+    assert Decimator(fps=5, input_fps=60).output_fps() == 5
+    assert Decimator(fps=120, input_fps=60).output_fps() == 60
+    assert Decimator(ratio=2).output_fps() is None
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'ratio': 2, 'fps': 10}, {'ratio': 0}, {'ratio': 1.5}, {'fps': 0}])
+def test_invalid(kwargs):
+    with pytest.raises(ValueError):
+        Decimator(**kwargs)
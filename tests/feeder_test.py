@@ -0,0 +1,66 @@
+import os
+import sys
+import threading
+import numpy as np
+import pytest
+from senseye_cameras.output.feeder import Feeder, set_pipe_size
+
+
+def drain(fd, received):
+    while True:
+        chunk = os.read(fd, 1 << 16)
+        if not chunk:
+            break
+        received += chunk
+
+
+def test_feeder():
+    '''Frames, including strided views and bytes, reach the pipe whole and in order.'''
+    frames = [np.full((256, 1024, 3), i, dtype=np.uint8) for i in range(6)]
+    frames.append(frames[0][::2, ::2])
+    frames.append(b'end')
+
+    r, w = os.pipe()
+    received = bytearray()
+    reader = threading.Thread(target=drain, args=(r, received))
+    reader.start()
+
+    feeder = Feeder(w, buffers=2)
+    feeder.start()
+    for frame in frames:
+        feeder.put(frame)
+    feeder.close()
+    os.close(w)
+    reader.join()
+    os.close(r)
+
+    expected = b''.join(frame.tobytes() if isinstance(frame, np.ndarray) else frame for frame in frames)
+    assert bytes(received) == expected
+    stats = feeder.stats()
+    assert stats['frames_written'] == len(frames)
+    assert stats['bytes_written'] == len(expected)
+    assert stats['queued'] == 0 and stats['error'] is None
+
+
+def test_feeder_broken_pipe():
+    '''A closed reader surfaces as BrokenPipeError from put().'''
+    r, w = os.pipe()
+    os.close(r)
+    feeder = Feeder(w, buffers=2)
+    feeder.start()
+
+    frame = np.zeros((64, 64), dtype=np.uint8)
+    with pytest.raises(BrokenPipeError):
+        for _ in range(10):
+            feeder.put(frame)
+    assert feeder.stats()['error'] is not None
+    feeder.close()
+    os.close(w)
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='pipe sizes are linux only')
+def test_set_pipe_size():
+    r, w = os.pipe()
+    assert set_pipe_size(w, 1 << 20) >= min(1 << 20, int(open('/proc/sys/fs/pipe-max-size').read()))
+    os.close(r)
+    os.close(w)
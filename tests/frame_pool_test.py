@@ -0,0 +1,85 @@
+import os
+import time
+import numpy as np
+from utils import SAMPLE_VIDEO, get_tmp_file, rm_tmp_dir
+from senseye_cameras import Stream
+from senseye_cameras.frame_pool import FramePool
+
+
+def test_acquire_release():
+    pool = FramePool(capacity=2, shape=(4, 4, 3))
+
+    a = pool.acquire()
+    b = pool.acquire()
+    assert {a, b} == {0, 1}
+    assert pool.acquire() is None
+    assert pool.exhausted == 1
+
+    pool.release(a)
+    assert pool.available() == 1
+    assert pool.acquire() == a
+
+
+def test_slots_share_memory():
+    pool = FramePool(capacity=3, shape=(2, 2))
+
+    pool.slots[1][:] = 7
+    assert pool.frames[1].sum() == 28
+    assert np.shares_memory(pool.slots[1], pool.frames)
+
+
+def test_stream():
+    '''
+    Test an usb stream reading into a frame pool: usb -> file
+    '''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='usb', id=SAMPLE_VIDEO,
+        output_type='file', path=TMP_FILE,
+        reading=True, writing=True,
+        frame_pool=8,
+    )
+
+    time.sleep(2)
+
+    s.stop()
+
+    frame_size = s.reader.pool.frame_size
+    assert os.stat(TMP_FILE).st_size > 0
+    assert os.stat(TMP_FILE).st_size % frame_size == 0
+    # every slot is handed back once writing stops
+    assert s.reader.pool.available() == s.reader.pool.capacity
+    rm_tmp_dir()
+
+
+def test_writer_process():
+    '''
+    Test an usb stream written from a child process: usb -> shared memory -> file
+    '''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='usb', id=SAMPLE_VIDEO,
+        output_type='file', path=TMP_FILE,
+        reading=True, writing=True,
+        frame_pool=8, writer_process=True,
+    )
+
+    time.sleep(2)
+
+    s.stop()
+
+    assert s.writer.frames_written > 0
+    assert os.stat(TMP_FILE).st_size == s.writer.frames_written * 1920 * 1080 * 3
+    assert not s.writer.process.is_alive()
+    rm_tmp_dir()
+
+
+def test_retain():
+    pool = FramePool(capacity=1, shape=(2, 2))
+
+    index = pool.acquire()
+    pool.retain(index)
+    pool.release(index)
+    assert pool.available() == 0
+    pool.release(index)
+    assert pool.available() == 1
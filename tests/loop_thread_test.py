@@ -0,0 +1,70 @@
+import time
+import pytest
+from senseye_cameras.loop_thread import LoopThread
+
+
+class SlowLoop(LoopThread):
+    '''Loop that stalls once, on its 'stall_on'th iteration.'''
+    def __init__(self, stall=0.2, stall_on=5, **kwargs):
+        LoopThread.__init__(self, **kwargs)
+        self.stall = stall
+        self.stall_on = stall_on
+        self.starts = []
+
+    def loop(self):
+        self.starts.append(time.monotonic())
+        if len(self.starts) == self.stall_on:
+            time.sleep(self.stall)
+
+
+def run_for(thread, seconds):
+    thread.start()
+    time.sleep(seconds)
+    thread.stop()
+    return thread.stats()
+
+
+def burst(starts, period):
+    '''Number of loops that started less than half a period after the previous one.'''
+    return sum(1 for a, b in zip(starts, starts[1:]) if b - a < period / 2)
+
+
+def test_catch_up():
+    t = SlowLoop(frequency=50, pacing='catch_up')
+    stats = run_for(t, 0.6)
+
+    # the stall is followed by the missed loops, run back-to-back
+    assert burst(t.starts, 0.02) >= 5
+    assert stats['overruns'] == 1
+    assert stats['skipped'] == 0
+
+
+def test_skip():
+    t = SlowLoop(frequency=50, pacing='skip')
+    stats = run_for(t, 0.6)
+
+    assert burst(t.starts, 0.02) == 0
+    assert stats['skipped'] >= 5
+
+
+def test_fixed_delay():
+    t = SlowLoop(frequency=50, pacing='fixed_delay')
+    stats = run_for(t, 0.6)
+
+    assert burst(t.starts, 0.02) == 0
+    assert stats['skipped'] == 0
+    assert stats['max_jitter'] >= 0.2
+
+
+def test_stats():
+    t = SlowLoop(frequency=100, stall=0)
+    stats = run_for(t, 0.3)
+
+    assert stats['iterations'] > 10
+    assert stats['period'] == pytest.approx(0.01, abs=0.005)
+    assert 0 <= stats['busy_fraction'] < 0.5
+
+
+def test_invalid_pacing():
+    with pytest.raises(ValueError):
+        LoopThread(pacing='bad')
@@ -0,0 +1,72 @@
+import os
+import numpy as np
+import pytest
+from utils import get_tmp_file, rm_tmp_dir
+from senseye_cameras import create_output
+from senseye_cameras.output.output import writev
+
+
+def test_writev_pipe():
+    '''Vectored writes larger than the pipe buffer are resumed until complete.'''
+    frames = [np.full((256, 1024), i, dtype=np.uint8) for i in range(4)]
+    expected = b''.join(frame.tobytes() for frame in frames)
+
+    r, w = os.pipe()
+    received = bytearray()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        writev(w, frames)
+        os._exit(0)
+
+    os.close(w)
+    while True:
+        chunk = os.read(r, 1 << 16)
+        if not chunk:
+            break
+        received += chunk
+    os.close(r)
+    os.waitpid(pid, 0)
+
+    assert bytes(received) == expected
+
+
+def test_file_feeder():
+    '''Encoded files are fed from a Feeder, and a dead encoder fails the first write and drops the rest.'''
+    TMP_FILE = get_tmp_file(extension='.avi')
+    output = create_output(type='file', path=TMP_FILE, input_config={'res': (64, 48), 'fps': 30})
+    assert output.feeder is not None
+
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    for _ in range(10):
+        output.write(frame)
+    output.close()
+    assert output.feeder.stats()['frames_written'] == 10
+    assert os.stat(TMP_FILE).st_size > 0
+
+    output = create_output(type='file', path=get_tmp_file(extension='.avi'), input_config={'res': (64, 48), 'fps': 30})
+    output.process.kill()
+    output.process.wait()
+    with pytest.raises(BrokenPipeError):
+        for _ in range(10):
+            output.write(frame)
+    output.write(frame)
+    assert output.stats()['frames_dropped'] >= 1
+    output.close()
+    rm_tmp_dir()
+
+
+@pytest.mark.parametrize('extension', ['.avi', '.raw'])
+def test_file_abort(extension):
+    '''Aborting a recording leaves neither the file nor its tmp file behind.'''
+    TMP_FILE = get_tmp_file(extension=extension)
+    output = create_output(type='file', path=TMP_FILE, input_config={'res': (64, 48), 'fps': 30})
+    output.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    tmp_path = output.tmp_path
+    output.abort()
+
+    assert not os.path.exists(tmp_path)
+    assert not os.path.exists(TMP_FILE)
+    assert output.process is None or output.process.poll() is not None
+    output.close()
+    rm_tmp_dir()
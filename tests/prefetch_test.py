@@ -0,0 +1,67 @@
+import time
+import numpy as np
+from pathlib import Path
+from utils import SAMPLE_VIDEO, get_tmp_file, rm_tmp_dir
+from senseye_cameras import create_input
+from senseye_cameras.input.prefetch import PrefetchInput
+
+RES = (8, 4)
+
+
+def write_raw_video(count):
+    '''Writes 'count' frames, each filled with its index.'''
+    path = get_tmp_file(extension='.raw')
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    frames = np.repeat(np.arange(count, dtype=np.uint8), RES[0] * RES[1]).reshape((count, RES[1], RES[0]))
+    frames.tofile(path)
+    return path
+
+
+def test_prefetch_raw_video():
+    path = write_raw_video(20)
+    cam = create_input(type='raw_video', id=path, config={'res': RES, 'prefetch': 4})
+    assert isinstance(cam, PrefetchInput)
+    cam.open()
+    time.sleep(0.1)
+    assert cam.stats()['buffered'] == 4
+
+    values = []
+    while True:
+        frame, timestamp = cam.read()
+        if frame is None:
+            break
+        values.append(int(frame[0, 0]))
+    assert values == list(range(20))
+    assert cam.stats()['hits'] > 0
+
+    cam.seek(15)
+    out = np.zeros(cam.frame_shape(), dtype=np.uint8)
+    frame, timestamp = cam.read_into(out)
+    assert frame is out and out[0, 0] == 15
+
+    cam.close()
+    rm_tmp_dir()
+
+
+def test_prefetch_max_bytes():
+    path = write_raw_video(20)
+    cam = create_input(type='raw_video', id=path, config={'res': RES, 'prefetch': 10, 'prefetch_bytes': 3 * RES[0] * RES[1]})
+    cam.open()
+    time.sleep(0.1)
+    assert cam.stats()['buffered'] == 3
+    cam.close()
+    rm_tmp_dir()
+
+
+def test_prefetch_video():
+    cam = create_input(type='video', id=SAMPLE_VIDEO, config={'prefetch': 4})
+    assert isinstance(cam, PrefetchInput)
+    cam.open()
+    frame, timestamp = cam.read()
+    assert frame is not None and frame.shape == cam.frame_shape()
+    cam.close()
+
+
+def test_prefetch_device_ignored():
+    cam = create_input(type='synthetic', config={'prefetch': 4})
+    assert not isinstance(cam, PrefetchInput)
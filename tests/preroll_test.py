@@ -0,0 +1,35 @@
+from senseye_cameras.preroll import PreRoll
+
+
+def test_preroll_seconds():
+    released = []
+    preroll = PreRoll(seconds=0.95, release=released.append)
+    for i in range(30):
+        preroll.push(i, i * 0.1)
+
+    # frames more than 0.95s older than the newest are evicted
+    assert released == list(range(20))
+    items = preroll.drain()
+    assert [item for item, timestamp in items] == list(range(20, 30))
+    assert len(preroll) == 0 and preroll.stats()['flushed'] == 10
+
+
+def test_preroll_limits():
+    released = []
+    preroll = PreRoll(max_bytes=250, max_frames=3, release=released.append)
+    for i in range(4):
+        preroll.push(i, i, nbytes=100)
+    assert released == [0, 1]
+    preroll.push('a', 10, nbytes=100)
+    assert released == [0, 1, 2]
+    preroll.push('b', 5, nbytes=10)
+    preroll.push('c', 6, nbytes=10)
+    assert released == [0, 1, 2, 3]
+
+    # drained in timestamp order
+    assert preroll.drain() == [('b', 5), ('c', 6), ('a', 10)]
+
+    preroll.push('d', 11)
+    preroll.clear()
+    assert released[-1] == 'd'
+    assert preroll.stats()['evicted'] == 4
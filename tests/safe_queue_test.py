@@ -0,0 +1,92 @@
+import time
+import threading
+import pytest
+from senseye_cameras.safe_queue import SafeQueue
+
+
+def fill(q, items):
+    return [q.offer(item) for item in items]
+
+
+def test_drop_newest():
+    evicted = []
+    q = SafeQueue(2, overflow='drop_newest', on_evict=evicted.append)
+
+    assert fill(q, range(4)) == [True, True, False, False]
+    assert q.to_list() == [0, 1]
+    assert evicted == [2, 3]
+    assert q.stats()['dropped'] == 2
+    assert q.stats()['forced'] == 0
+
+
+def test_drop_oldest():
+    evicted = []
+    q = SafeQueue(2, overflow='drop_oldest', on_evict=evicted.append)
+
+    assert all(fill(q, range(4)))
+    assert q.to_list() == [2, 3]
+    assert evicted == [0, 1]
+    assert q.stats()['forced'] == 2
+    assert q.stats()['dropped'] == 0
+
+
+def test_block_timeout():
+    q = SafeQueue(1, overflow='block', timeout=0.05)
+    q.offer(0)
+
+    start = time.monotonic()
+    assert not q.offer(1)
+    assert time.monotonic() - start >= 0.05
+    assert q.stats()['blocked'] == 1
+    assert q.stats()['dropped'] == 1
+
+
+def test_block_until_room():
+    q = SafeQueue(1, overflow='block', timeout=2)
+    q.offer(0)
+
+    threading.Timer(0.05, q.get).start()
+    assert q.offer(1)
+    assert q.to_list() == [1]
+    assert q.stats()['blocked'] == 1
+    assert q.stats()['dropped'] == 0
+
+
+def test_keep_nth():
+    q = SafeQueue(4, overflow='keep_nth', nth=3)
+
+    fill(q, range(4))
+    # full: only every 3rd offered item is kept, evicting the oldest
+    fill(q, range(4, 10))
+    assert q.to_list() == [2, 3, 6, 9]
+    stats = q.stats()
+    assert stats['dropped'] == 4
+    assert stats['forced'] == 2
+    assert stats['accepted'] == 6
+
+    # once drained to half, every item is kept again
+    q.remove_existing(2)
+    fill(q, [10, 11])
+    assert q.to_list() == [6, 9, 10, 11]
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        SafeQueue(1, overflow='bad')
+
+
+def test_get_many():
+    q = SafeQueue(10)
+    fill(q, range(5))
+
+    assert q.get_many(max_items=2) == [0, 1]
+    assert q.get_many() == [2, 3, 4]
+    assert q.get_many() == []
+
+
+def test_get_many_block():
+    q = SafeQueue(10)
+
+    threading.Timer(0.05, q.offer, args=(1,)).start()
+    assert q.get_many(block=True, timeout=2) == [1]
+    assert q.get_many(block=True, timeout=0.01) == []
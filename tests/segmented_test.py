@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import atexit
+import numpy as np
+import pytest
+from pathlib import Path
+from utils import get_tmp_file, rm_tmp_dir
+from senseye_cameras import Stream, create_output
+
+RES = (64, 48)
+
+
+def frame(i):
+    return np.full((RES[1], RES[0], 3), i, dtype=np.uint8)
+
+
+@pytest.mark.parametrize('suffix', ['.raw', '.avi'])
+def test_segment_frames(suffix):
+    '''Segments switch on exact frame counts, and the manifest lists their frame ranges.'''
+    path = Path(get_tmp_file(extension=suffix))
+    output = create_output(type='segmented', path=path, config={'segment_frames': 4}, input_config={'res': RES, 'fps': 30})
+    for i in range(10):
+        output.write(frame(i))
+    output.close()
+
+    manifest = json.loads(path.with_suffix('.json').read_text())
+    assert manifest['frames'] == 10
+    assert [(s['first_frame'], s['frames']) for s in manifest['segments']] == [(0, 4), (4, 4), (8, 2)]
+    for segment in manifest['segments']:
+        assert os.stat(segment['path']).st_size == segment['bytes'] > 0
+        assert segment['start_time'] <= segment['end_time']
+    # the pre-spawned segment that was never written to is not left behind
+    assert not path.with_name(f'{path.stem}_0003{suffix}').exists()
+
+    if suffix == '.raw':
+        first = np.fromfile(manifest['segments'][1]['path'], dtype=np.uint8)
+        assert np.array_equal(first.reshape(4, RES[1], RES[0], 3)[:, 0, 0, 0], [4, 5, 6, 7])
+    rm_tmp_dir()
+
+
+def test_segment_bytes():
+    path = Path(get_tmp_file(extension='.raw'))
+    frame_size = RES[0] * RES[1] * 3
+    output = create_output(type='segmented', path=path, config={'segment_bytes': 3 * frame_size}, input_config={'res': RES})
+    for i in range(7):
+        output.write(frame(i))
+    output.close()
+
+    manifest = json.loads(path.with_suffix('.json').read_text())
+    assert [s['frames'] for s in manifest['segments']] == [3, 3, 1]
+    rm_tmp_dir()
+
+
+def test_segment_timestamps(monkeypatch):
+    '''Segments are timed, and rotated, by the frames' capture timestamps. Segments add no exit hooks.'''
+    hooks = []
+    monkeypatch.setattr(atexit, 'register', hooks.append)
+    monkeypatch.setattr(atexit, 'unregister', lambda fn: hooks.remove(fn) if fn in hooks else None)
+    path = Path(get_tmp_file(extension='.raw'))
+    output = create_output(type='segmented', path=path, config={'segment_seconds': 0.09}, input_config={'res': RES})
+    # captured at 30 fps, written all at once as if from a backlog
+    output.write_many([frame(i) for i in range(9)], timestamps=[100 + i / 30 for i in range(9)])
+    output.close()
+
+    manifest = json.loads(path.with_suffix('.json').read_text())
+    assert [s['frames'] for s in manifest['segments']] == [3, 3, 3]
+    assert [s['start_time'] for s in manifest['segments']] == [100 + i / 30 for i in (0, 3, 6)]
+    assert [s['end_time'] for s in manifest['segments']] == [100 + i / 30 for i in (2, 5, 8)]
+    # only the Segmented's own
+    assert len(hooks) == 1
+    rm_tmp_dir()
+
+
+def test_segmented_stream():
+    '''No frames are lost across segment boundaries.'''
+    path = Path(get_tmp_file(extension='.raw'))
+    s = Stream(
+        input_type='synthetic', input_config={'res': RES, 'fps': 60},
+        output_type='segmented', output_config={'segment_seconds': 0.3}, path=path,
+        reading=True, writing=True,
+    )
+    time.sleep(1.2)
+    s.stop()
+
+    manifest = json.loads(path.with_suffix('.json').read_text())
+    assert len(manifest['segments']) >= 3
+    assert manifest['frames'] == s.stats()['queue']['accepted']
+    ranges = [(segment['first_frame'], segment['frames']) for segment in manifest['segments']]
+    assert all(first + frames == next_first for (first, frames), (next_first, _) in zip(ranges, ranges[1:]))
+    rm_tmp_dir()
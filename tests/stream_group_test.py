@@ -0,0 +1,70 @@
+import os
+import time
+from utils import SAMPLE_VIDEO, get_tmp_file, rm_tmp_dir
+from senseye_cameras import StreamGroup
+from senseye_cameras.stream_group import Aligner
+
+
+def test_aligner():
+    sets = []
+    aligner = Aligner(2, tolerance=0.004, on_set=lambda data, timestamps: sets.append(data))
+
+    for timestamp, data in [(1.000, 'a0'), (1.010, 'a1'), (1.020, 'a2')]:
+        aligner.push(0, data, timestamp)
+    for timestamp, data in [(1.009, 'b0'), (1.021, 'b1')]:
+        aligner.push(1, data, timestamp)
+
+    aligner.start()
+    time.sleep(0.3)
+    aligner.stop()
+
+    assert sets == [['a1', 'b0'], ['a2', 'b1']]
+    stats = aligner.stats()
+    assert stats['sets'] == 2
+    assert stats['unmatched'] == [1, 0]
+
+    # frames older than the last set are late
+    aligner.push(1, 'b2', 1.015)
+    assert aligner.stats()['late'] == [0, 1]
+
+
+def test_aligner_references():
+    '''Pending frames hold a reference, released once dropped or emitted.'''
+    refs = {}
+    aligner = Aligner(
+        2, tolerance=0.004, buffer_size=2,
+        retain=lambda i, data: refs.__setitem__(data, refs.get(data, 0) + 1),
+        release=lambda i, data: refs.__setitem__(data, refs[data] - 1),
+    )
+    for timestamp, data in [(1.000, 'a0'), (1.010, 'a1'), (1.020, 'a2')]:
+        aligner.push(0, data, timestamp)
+    aligner.push(1, 'b0', 1.009)
+    # a0 fell out of the buffer
+    assert refs == {'a0': 0, 'a1': 1, 'a2': 1, 'b0': 1}
+
+    aligner.start()
+    time.sleep(0.3)
+    aligner.stop()
+    assert refs == {'a0': 0, 'a1': 0, 'a2': 0, 'b0': 0}
+
+
+def test_stream_group():
+    sets = []
+    paths = [get_tmp_file(extension='_0.raw'), get_tmp_file(extension='_1.raw')]
+    g = StreamGroup(
+        inputs=[
+            {'type': 'usb', 'id': SAMPLE_VIDEO},
+            {'type': 'usb', 'id': SAMPLE_VIDEO},
+        ],
+        outputs=[{'type': 'raw', 'path': path} for path in paths],
+        tolerance=0.01,
+        on_frames=lambda data, timestamps: sets.append(timestamps),
+        reading=True, writing=True,
+    )
+    time.sleep(2)
+    g.stop()
+
+    assert len(sets) > 0
+    assert all(max(timestamps) - min(timestamps) <= 0.01 for timestamps in sets)
+    assert os.stat(paths[0]).st_size == os.stat(paths[1]).st_size > 0
+    rm_tmp_dir()
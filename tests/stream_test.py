@@ -1,7 +1,11 @@
 import os
 import time
+import pytest
 from utils import SAMPLE_VIDEO, get_tmp_file, rm_tmp_dir
 from senseye_cameras import Stream
+from senseye_cameras.reader import Reader
+from senseye_cameras.safe_queue import SafeQueue
+from senseye_cameras.input.camera_pylon import extract_baked_data
 
 
 def test_stream_video_override():
@@ -32,3 +36,156 @@ def test_stream_video_override():
     assert os.stat(TMP_FILE).st_size > 0
     assert os.stat(tmp_path).st_size > 0
     rm_tmp_dir()
+
+
+def test_stream_batch_writes():
+    '''Batched writes record whole frames.'''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='usb', id=SAMPLE_VIDEO,
+        output_type='raw', path=TMP_FILE,
+        reading=True, writing=True,
+        frame_pool=16, batch_writes=True,
+    )
+    time.sleep(2)
+    s.stop()
+
+    assert s.stats()['queue']['accepted'] > 0
+    assert os.stat(TMP_FILE).st_size > 0
+    assert os.stat(TMP_FILE).st_size % s.reader.pool.frame_size == 0
+    rm_tmp_dir()
+
+
+def test_stream_stop_writing_batch_in_flight():
+    '''Stopping while a batch is being written waits for it, and writes it before closing the output.'''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    written = []
+
+    def on_write(data=None):
+        written.append(data)
+        time.sleep(0.02)
+
+    s = Stream(
+        input_type='usb', id=SAMPLE_VIDEO,
+        output_type='raw', path=TMP_FILE,
+        reading=True, writing=True, on_write=on_write,
+        frame_pool=16, batch_writes=True,
+    )
+    time.sleep(1)
+    s.stop_reading()
+    s.stop_writing()
+    assert os.stat(TMP_FILE).st_size == len(written) * s.reader.pool.frame_size
+    time.sleep(0.1)
+    assert s.reader.pool.available() == len(s.reader.pool)
+    s.stop()
+    rm_tmp_dir()
+
+
+def test_stream_event_driven():
+    '''Event driven writers wake up on queued frames.'''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    s = Stream(
+        input_type='usb', id=SAMPLE_VIDEO,
+        output_type='raw', path=TMP_FILE,
+        reading=True, writing=True,
+        event_driven=True,
+    )
+    assert s.writer.frequency == 0
+    time.sleep(2)
+    s.stop()
+
+    assert s.writer.q.qsize() == 0
+    assert os.stat(TMP_FILE).st_size > 0
+    rm_tmp_dir()
+
+
+def test_reader_unpaced_end_of_file():
+    '''An unpaced reader waits between reads that produce no frame, instead of spinning.'''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    os.makedirs(os.path.dirname(TMP_FILE), exist_ok=True)
+    with open(TMP_FILE, 'wb') as f:
+        f.write(bytes(3 * 4 * 8 * 3))
+
+    reader = Reader(SafeQueue(10), type='raw_video', config={'res': (8, 4, 3)}, id=TMP_FILE, frequency=0, reading=True)
+    reader.start()
+    time.sleep(0.5)
+    reader.stop()
+    assert reader.stats()['iterations'] < 3 + 0.5 / reader.wait_timeout + 2
+    rm_tmp_dir()
+
+
+def test_stream_outputs():
+    '''One reader writes to several outputs.'''
+    raw_file = get_tmp_file(extension='.raw')
+    avi_file = get_tmp_file(extension='.avi')
+    s = Stream(
+        input_type='usb', id=SAMPLE_VIDEO,
+        outputs=[
+            {'type': 'raw', 'path': raw_file},
+            {'type': 'file', 'path': avi_file},
+        ],
+        reading=True, writing=True,
+        frame_pool=16,
+    )
+    time.sleep(2)
+    s.stop()
+
+    outputs = s.stats()['outputs']
+    assert len(outputs) == 2
+    assert all(output['queue']['accepted'] > 0 for output in outputs)
+    assert os.stat(raw_file).st_size > 0
+    assert os.stat(avi_file).st_size > 0
+    assert s.reader.pool.available() == s.reader.pool.capacity
+    rm_tmp_dir()
+
+
+def test_stream_decimate():
+    '''Decimated streams write a fraction of the frames read, at a matching output fps.'''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    reads = []
+    s = Stream(
+        input_type='synthetic', input_config={'res': (64, 48), 'fps': 60},
+        output_type='raw', path=TMP_FILE,
+        on_read=lambda data=None, timestamp=None: reads.append(timestamp),
+        reading=True, writing=True,
+        frame_pool=32, decimate=3,
+    )
+    time.sleep(1)
+    s.stop()
+
+    stats = s.stats()['decimator']
+    assert s.writer.output.config['fps'] == 20
+    assert stats['kept'] > 0 and stats['skipped'] >= 2 * (stats['kept'] - 1)
+    assert len(reads) >= stats['kept'] + stats['skipped']
+    assert os.stat(TMP_FILE).st_size == stats['kept'] * 64 * 48 * 3
+    rm_tmp_dir()
+
+
+@pytest.mark.parametrize('frame_pool', [None, 32])
+def test_stream_preroll(frame_pool):
+    '''Frames from before start_writing are written ahead of live frames, in order.'''
+    TMP_FILE = get_tmp_file(extension='.raw')
+    reads = []
+    s = Stream(
+        input_type='synthetic', input_config={'res': (64, 48), 'fps': 60},
+        output_type='raw', path=TMP_FILE,
+        on_read=lambda data=None, timestamp=None: reads.append(timestamp),
+        reading=True, frame_pool=frame_pool, preroll_seconds=0.25,
+    )
+    time.sleep(0.5)
+    held = s.stats()['preroll']
+    assert 0 < held['frames'] <= 16
+    assert held['seconds'] <= 0.25
+
+    read_before = len(reads)
+    s.start_writing()
+    time.sleep(0.5)
+    s.stop()
+
+    frame_numbers = extract_baked_data(TMP_FILE, (64, 48, 3))[1]
+    flushed = s.stats()['preroll']['flushed']
+    assert flushed > 0
+    assert all(frame_numbers[1:] > frame_numbers[:-1])
+    # the recording starts with the held frames, read before writing started
+    assert (frame_numbers < read_before).sum() >= flushed - 1
+    rm_tmp_dir()